@@ -1,4 +1,22 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ProblemAggregate, ProblemResult, ReportFingerprint
 
+
+@admin.register(ProblemAggregate)
+class ProblemAggregateAdmin(admin.ModelAdmin):
+    list_display = ('block_id', 'course_id', 'answered', 'modified')
+    search_fields = ('block_id', 'course_id')
+
+
+@admin.register(ProblemResult)
+class ProblemResultAdmin(admin.ModelAdmin):
+    list_display = ('block_id', 'user', 'score', 'modified')
+    search_fields = ('block_id', 'user__username')
+    raw_id_fields = ('user',)
+
+
+@admin.register(ReportFingerprint)
+class ReportFingerprintAdmin(admin.ModelAdmin):
+    list_display = ('report_name', 'block_id', 'created')
+    search_fields = ('block_id', 'report_name')
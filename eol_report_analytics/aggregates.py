@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Installed packages (via pip)
+from celery import task
+from django.db import transaction
+
+# Edx dependencies
+from common.djangoapps.student.models import CourseEnrollment
+from lms.djangoapps.courseware.models import StudentModule
+from opaque_keys.edx.keys import CourseKey, UsageKey
+
+# Internal project dependencies
+from .models import ProblemAggregate, ProblemResult
+from .states import decode_state
+from .views import EolReportAnalyticsView, get_enrollment_modes, get_problem_result
+
+
+@task(queue='edx.lms.core.low')
+def update_problem_aggregate(block_id, user_id):
+    """
+        Update the aggregate of the problem with the current state of the
+        student, queued when the state is saved or deleted
+    """
+    update_problem_result(UsageKey.from_string(block_id), user_id)
+
+
+@task(queue='edx.lms.core.low')
+def update_enrollment_results(course_id, user_id):
+    """
+        Update the results of the student in every aggregate of the course,
+        queued when the enrollment of the student changes
+    """
+    course_key = CourseKey.from_string(course_id)
+    block_ids = ProblemAggregate.objects.filter(course_id=course_key).values('block_id')
+    usage_keys = set(StudentModule.objects.filter(
+        course_id=course_key,
+        student_id=user_id,
+        module_state_key__in=block_ids
+    ).values_list('module_state_key', flat=True))
+    usage_keys.update(ProblemResult.objects.filter(course_id=course_key, user_id=user_id).values_list('block_id', flat=True))
+    for usage_key in usage_keys:
+        update_problem_result(usage_key, user_id)
+
+
+def update_problem_result(usage_key, user_id):
+    """
+        Replace the result of the student in the aggregate of the problem with
+        the one of its current state and enrollment, only problems already
+        backfilled have an aggregate to update. The state is read once the
+        aggregate is locked, so the last update applied is always the one of
+        the last state saved.
+    """
+    with transaction.atomic():
+        aggregate = ProblemAggregate.objects.select_for_update().filter(block_id=usage_key).first()
+        if aggregate is None:
+            return
+        enrolled = CourseEnrollment.objects.filter(
+            user_id=user_id,
+            course_id=usage_key.course_key,
+            is_active=True,
+            mode__in=aggregate.enrollment_modes
+        ).exists()
+        student_module = StudentModule.objects.filter(module_state_key=usage_key, student_id=user_id).first()
+        state = None
+        result = None
+        if enrolled and student_module is not None:
+            state = decode_state(None, student_module.state, user_id)
+            result = get_problem_result(usage_key, state)
+        previous = ProblemResult.objects.filter(block_id=usage_key, user_id=user_id).first()
+        if previous is None and result is None:
+            return
+        if previous is not None:
+            aggregate.remove(previous)
+            if result is None:
+                previous.delete()
+            else:
+                result.pk = previous.pk
+        if result is not None:
+            result.save()
+            aggregate.add(result)
+            if not aggregate.headers:
+                aggregate.headers = state.input_keys or []
+        aggregate.save()
+
+
+def rebuild_aggregate(block_id, chunk_size=None):
+    """
+        Compute again the results and the aggregate of a problem from its student states
+    """
+    usage_key = UsageKey.from_string(str(block_id))
+    with transaction.atomic():
+        ProblemResult.objects.filter(block_id=usage_key).delete()
+        ProblemAggregate.objects.filter(block_id=usage_key).delete()
+        aggregate = ProblemAggregate(block_id=usage_key, course_id=usage_key.course_key, enrollment_modes=sorted(get_enrollment_modes()))
+        for student_states in EolReportAnalyticsView().get_all_states(str(usage_key), chunk_size):
+            results = []
+            for state in student_states:
+                # Same columns the report takes, from the first state with attempts
+                if not aggregate.headers and state.has_attempts:
+                    aggregate.headers = state.input_keys or []
+                result = get_problem_result(usage_key, state)
+                if result is not None:
+                    aggregate.add(result)
+                    results.append(result)
+            ProblemResult.objects.bulk_create(results)
+        aggregate.save()
+    return aggregate
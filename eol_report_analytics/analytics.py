@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+from collections import Counter
+from fractions import Fraction
+from math import isqrt
+from sys import intern
+
+# Internal project dependencies
+from .psychometrics import Psychometrics
+from .quartiles import QuartileTracker
+
+# Questions with more distinct text answers are free text, not options, and are not counted
+MAX_OPTIONS = 20
+
+
+def sqrt_fraction(value):
+    """
+        Correctly rounded square root of a non negative Fraction,
+        the same rounding used by statistics.pstdev
+    """
+    n, m = value.numerator, value.denominator
+    if n == 0:
+        return 0.0
+    # Scale so the integer root has more bits than a float mantissa, then
+    # round to odd so the final int -> float division rounds correctly
+    k = 58 - (n.bit_length() - m.bit_length()) // 2
+    if k >= 0:
+        q, r = divmod(n << (2 * k), m)
+    else:
+        q, r = divmod(n, m << (-2 * k))
+    root = isqrt(q)
+    if r or root * root != q:
+        root |= 1
+    return root / (1 << k) if k >= 0 else float(root << -k)
+
+
+class ProblemAnalytics(object):
+    """
+        Analytics of a problem accumulated one student at a time, memory
+        does not grow with the number of students besides the quartiles
+    """
+    def __init__(self, quartile_size):
+        self.users = 0
+        self.correct = Counter()
+        self.incorrect = Counter()
+        # Exact sums, so mean and standard deviation match the statistics module
+        self.score_sum = Fraction(0)
+        self.score_sum_squares = Fraction(0)
+        self.quartiles = QuartileTracker(quartile_size)
+        self.psychometrics = Psychometrics()
+        # Count of each answer by question, None once the question has too many distinct answers.
+        # Choice answers are counted by choice name, their text is kept in option_texts
+        self.options = {}
+        self.option_texts = {}
+
+    def add(self, score, correct, incorrect, order=None, answers=None):
+        """
+            Add the result of a student, order breaks the ties of the quartiles,
+            answers maps each question to the answer text of the student or,
+            for choice answers, to the [[name, text], ...] of the chosen choices
+        """
+        self.users += 1
+        exact_score = Fraction(score)
+        self.score_sum += exact_score
+        self.score_sum_squares += exact_score * exact_score
+        self.correct.update(correct)
+        self.incorrect.update(incorrect)
+        if answers is not None:
+            # Interned, so the answers kept by the quartiles share the same strings
+            answers = {x: self.add_answer(x, answer) for x, answer in answers.items()}
+        self.quartiles.add(score, correct, order, answers)
+        self.psychometrics.add(score, correct, incorrect)
+
+    def mean(self):
+        return float(self.score_sum / self.users)
+
+    def pstdev(self):
+        sum_squared_deviations = self.score_sum_squares - self.score_sum * self.score_sum / self.users
+        return sqrt_fraction(sum_squared_deviations / self.users)
+
+    def add_answer(self, answer_id, answer):
+        """
+            Count the answer of a student, return what the quartiles keep of it:
+            the text or the list of choice names
+        """
+        if not isinstance(answer, list):
+            answer = intern(answer)
+            self.count_option(answer_id, answer, 1)
+            return answer
+        texts = self.option_texts.setdefault(answer_id, {})
+        names = []
+        for name, text in answer:
+            name = intern(name)
+            if name not in texts:
+                texts[name] = text
+            self.count_option(answer_id, name, 1, False)
+            names.append(name)
+        return names
+
+    def count_option(self, answer_id, answer, count, limited=True):
+        """
+            Add count to the answer, text answers stop being counted when the
+            question has more than MAX_OPTIONS of them, choices are never too many
+        """
+        options = self.options.setdefault(answer_id, Counter())
+        if options is None:
+            return
+        options[answer] += count
+        if limited and len(options) > MAX_OPTIONS:
+            self.options[answer_id] = None
+
+    def get_option_text(self, answer_id, answer):
+        return self.option_texts.get(answer_id, {}).get(answer, answer)
+
+    def get_quartile_size(self):
+        return self.quartiles.get_quartile_size(self.users)
+
+    def get_discriminatory_index(self):
+        return self.quartiles.get_discriminatory_index(self.users)
+
+    def get_distractors(self):
+        """
+            Return the count of each answer by question, of all the students and
+            of the best and worst quartile as (question, answer) pairs. Choice
+            answers are counted by choice name, see get_option_text.
+        """
+        best, worst = self.quartiles.get_answer_counts(self.users)
+        options = {x: counts for x, counts in self.options.items() if counts is not None}
+        return options, best, worst
+
+    def merge(self, other):
+        """
+            Add the analytics of other part of the students of the same problem
+        """
+        self.users += other.users
+        self.correct.update(other.correct)
+        self.incorrect.update(other.incorrect)
+        self.score_sum += other.score_sum
+        self.score_sum_squares += other.score_sum_squares
+        self.quartiles.merge(other.quartiles)
+        self.psychometrics.merge(other.psychometrics)
+        for x, texts in other.option_texts.items():
+            for name, text in texts.items():
+                self.option_texts.setdefault(x, {}).setdefault(name, text)
+        for x, options in other.options.items():
+            if options is None:
+                self.options[x] = None
+                continue
+            for answer, count in options.items():
+                self.count_option(x, answer, count, not other.option_texts.get(x))
+
+    def to_dict(self):
+        """
+            Serializable partial aggregate, sent between celery tasks
+        """
+        return {
+            'users': self.users,
+            'correct': dict(self.correct),
+            'incorrect': dict(self.incorrect),
+            'score_sum': [self.score_sum.numerator, self.score_sum.denominator],
+            'score_sum_squares': [self.score_sum_squares.numerator, self.score_sum_squares.denominator],
+            'quartiles': self.quartiles.to_dict(),
+            'psychometrics': self.psychometrics.to_dict(),
+            'options': {x: dict(options) if options is not None else None for x, options in self.options.items()},
+            'option_texts': self.option_texts,
+        }
+
+    @classmethod
+    def from_dict(cls, value):
+        analytics = cls(0)
+        analytics.users = value['users']
+        analytics.correct = Counter(value['correct'])
+        analytics.incorrect = Counter(value['incorrect'])
+        analytics.score_sum = Fraction(*value['score_sum'])
+        analytics.score_sum_squares = Fraction(*value['score_sum_squares'])
+        analytics.quartiles = QuartileTracker.from_dict(value['quartiles'])
+        analytics.psychometrics = Psychometrics.from_dict(value['psychometrics'])
+        analytics.options = {x: Counter(options) if options is not None else None for x, options in value['options'].items()}
+        analytics.option_texts = value['option_texts']
+        return analytics
+
+
+class ClusterAnalytics(ProblemAnalytics):
+    """
+        ProblemAnalytics that also counts the users, score sum and correct
+        answers of each cluster of a cluster sample, clusters maps the order
+        key of each student to the cluster of the student
+    """
+    def __init__(self, quartile_size, clusters):
+        super(ClusterAnalytics, self).__init__(quartile_size)
+        self.clusters = clusters
+        self.cluster_users = Counter()
+        self.cluster_scores = Counter()
+        self.cluster_correct = {}
+
+    def add(self, score, correct, incorrect, order=None, answers=None):
+        super(ClusterAnalytics, self).add(score, correct, incorrect, order, answers)
+        cluster = self.clusters[order]
+        self.cluster_users[cluster] += 1
+        self.cluster_scores[cluster] += score
+        self.cluster_correct.setdefault(cluster, Counter()).update(correct)
+
+    def get_cluster_discrimination(self):
+        """
+            Return the count of correct answers by question of the best quartile
+            minus the count of the worst quartile, by cluster
+        """
+        best, worst = self.quartiles.get_quartiles(self.users)
+        differences = {}
+        for entries, sign in ((best, 1), (worst, -1)):
+            for score, order, correct, answers in entries:
+                counts = differences.setdefault(self.clusters[order.value], Counter())
+                for x in correct:
+                    counts[x] += sign
+        return differences
+
+
+def first_read(current, other):
+    """
+        Return the (order, value) pair read first, orders are StudentModule ids
+    """
+    if current is None or (other is not None and other[0] < current[0]):
+        return other
+    return current
+
+
+class ProblemPartial(object):
+    """
+        Result of a problem over a part of its students, partials of the same
+        problem merge into the result of all the students
+    """
+    def __init__(self, analytics, headers=None, questions=None, rows=None):
+        self.analytics = analytics
+        # (order, value) pairs, the value read from the lowest StudentModule id is kept,
+        # the same one the single worker report finds first
+        self.headers = headers
+        self.questions = questions
+        # [path, headers] of the files holding the sorted csv rows of each part
+        self.rows = rows or []
+
+    @property
+    def aux_headers(self):
+        return self.headers[1] if self.headers else None
+
+    @property
+    def question_data(self):
+        return self.questions[1] if self.questions else {}
+
+    def merge(self, other):
+        self.analytics.merge(other.analytics)
+        self.headers = first_read(self.headers, other.headers)
+        self.questions = first_read(self.questions, other.questions)
+        self.rows.extend(other.rows)
+
+    def to_dict(self):
+        return {
+            'analytics': self.analytics.to_dict(),
+            'headers': self.headers,
+            'questions': self.questions,
+            'rows': self.rows,
+        }
+
+    @classmethod
+    def from_dict(cls, value):
+        return cls(
+            ProblemAnalytics.from_dict(value['analytics']),
+            value['headers'],
+            value['questions'],
+            value['rows'])
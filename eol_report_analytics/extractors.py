@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Installed packages (via pip)
+from lxml import etree
+
+# Same parser configuration used by capa to read problem xml
+PROBLEM_XML_PARSER = etree.XMLParser(
+    dtd_validation=False,
+    load_dtd=False,
+    remove_comments=True,
+    remove_blank_text=True,
+    encoding='utf-8')
+
+SUPPORTED_RESPONSES = (
+    'multiplechoiceresponse',
+    'choiceresponse',
+    'optionresponse',
+    'stringresponse',
+    'numericalresponse',
+)
+SUPPORTED_INPUTS = ('choicegroup', 'checkboxgroup', 'optioninput', 'textline', 'formulaequationinput')
+# Input types registered by capa, used to detect inputs this extractor does not handle
+CAPA_INPUTS = SUPPORTED_INPUTS + (
+    'radiogroup', 'textbox', 'schematic', 'imageinput', 'crystallography', 'vsepr_input',
+    'chemicalequationinput', 'drag_and_drop_input', 'editamoleculeinput', 'designprotein2dinput',
+    'editageneinput', 'annotationinput', 'choicetextgroup', 'radiotextgroup', 'checkboxtextgroup',
+    'jsinput', 'filesubmission', 'matlabinput', 'javascriptinput',
+)
+CHOICE_INPUTS = ('choicegroup', 'checkboxgroup')
+# Features that change the rendered problem per student or need python evaluation,
+# problems using them are left to capa
+UNSUPPORTED_MARKERS = ('<script', '$', 'shuffle=', 'answer-pool=', ':include')
+SKIP_ELEMS = ('description',)
+LABEL_ELEMS = ('p', 'label')
+
+
+class AnswerEntry(object):
+    """
+        Pre-parsed data of a single input of the problem
+    """
+    __slots__ = ('answer_id', 'label', 'choices', 'correct', 'correct_choices')
+
+    def __init__(self, answer_id, label, choices, correct, correct_choices=None):
+        self.answer_id = answer_id
+        self.label = label
+        self.choices = choices
+        self.correct = correct
+        # Names of the choices marked correct, None for the inputs without choices
+        self.correct_choices = correct_choices
+
+
+class AnswerExtractor(object):
+    """
+        Lightweight replacement of LoncapaProblem for the common response types.
+        The problem xml is parsed once into an answer_id -> AnswerEntry table and
+        each student answer is turned into report text with dictionary lookups.
+    """
+    def __init__(self, entries):
+        self.entries = entries
+
+    @classmethod
+    def from_problem(cls, problem_text, problem_id, gettext=None):
+        """
+            Return an AnswerExtractor for the problem, or None when the problem
+            uses anything this extractor does not understand
+        """
+        if not isinstance(problem_text, str) or any(marker in problem_text for marker in UNSUPPORTED_MARKERS):
+            return None
+        try:
+            tree = etree.XML(problem_text.encode('utf-8'), parser=PROBLEM_XML_PARSER)
+        except (etree.XMLSyntaxError, ValueError):
+            return None
+        gettext = gettext or (lambda text: text)
+        entries = {}
+        # capa numbers the responses in document order starting at 2
+        response_nr = 1
+        for element in tree.iter(etree.Element):
+            tag = element.tag
+            if not isinstance(tag, str) or not tag.endswith('response'):
+                continue
+            if tag not in SUPPORTED_RESPONSES:
+                return None
+            response_nr += 1
+            inputs = [x for x in element.iter(etree.Element) if x.tag in CAPA_INPUTS]
+            if not inputs or any(x.tag not in SUPPORTED_INPUTS for x in inputs):
+                return None
+            response_label = element.find('label')
+            for input_nr, input_element in enumerate(inputs, start=1):
+                answer_id = '{}_{}_{}'.format(problem_id, response_nr, input_nr)
+                label = None
+                if input_nr == 1 and response_label is not None:
+                    label = ''.join(response_label.itertext()).strip()
+                elif input_element.get('label'):
+                    label = input_element.get('label')
+                if not label:
+                    label = cls.find_question_label(input_element, answer_id, gettext)
+                # Inputs capa would not render a correct answer for are left to capa
+                if input_element.get('answer') is not None:
+                    return None
+                if input_element.tag == 'optioninput' and input_element.get('correct') is None:
+                    return None
+                choices, correct, correct_choices = cls.parse_input(element, input_element)
+                entries[answer_id] = AnswerEntry(answer_id, label, choices, correct, correct_choices)
+        return cls(entries)
+
+    @staticmethod
+    def find_question_label(input_element, answer_id, gettext):
+        """
+            Same heuristic used by LoncapaProblem.find_question_label when the
+            problem has no explicit label
+        """
+        questiontext_elem = input_element.getparent().getprevious()
+        while questiontext_elem is not None and questiontext_elem.tag in SKIP_ELEMS:
+            questiontext_elem = questiontext_elem.getprevious()
+        if questiontext_elem is not None and questiontext_elem.tag in LABEL_ELEMS:
+            return questiontext_elem.text
+        question_nr = int(answer_id.split('_')[-2]) - 1
+        return gettext("Question {}").format(question_nr)
+
+    @staticmethod
+    def parse_input(response, input_element):
+        """
+            Return (choices, correct, correct_choices) of the input, choices maps
+            the choice names sent by the student to the choice text and correct
+            is the plain text LoncapaProblem.find_correct_answer_text renders for
+            the input: the text of the choices marked correct="true", the `correct`
+            attribute of an optioninput and an empty text for the other inputs.
+            correct_choices lists the names of the correct choices of choice inputs.
+        """
+        choices = {}
+        correct = ''
+        correct_choices = None
+        tag = response.tag
+        if input_element.tag in CHOICE_INPUTS:
+            correct_texts = []
+            correct_choices = []
+            choice_elements = [x for x in input_element if x.tag == 'choice']
+            for index, choice in enumerate(choice_elements):
+                if tag == 'multiplechoiceresponse' and choice.get('name') is not None:
+                    name = 'choice_' + choice.get('name')
+                else:
+                    name = 'choice_{}'.format(index)
+                choices[name] = choice.text
+                if choice.get('correct') == 'true':
+                    correct_texts.extend(choice.xpath('text()'))
+                    correct_choices.append(name)
+            correct = ', '.join(correct_texts)
+        elif input_element.tag == 'optioninput':
+            correct = input_element.get('correct')
+        return choices, correct, correct_choices
+
+    def __contains__(self, answer_id):
+        return answer_id in self.entries
+
+    def get_answer_info(self, answer_id):
+        """
+            Return (question_text, correct_answer_text) for the answer id
+        """
+        entry = self.entries[answer_id]
+        return entry.label, entry.correct
+
+    def get_correct_choices(self, answer_id):
+        return self.entries[answer_id].correct_choices
+
+    def find_answer_text(self, answer_id, current_answer):
+        """
+            Return the text of the student answer, as LoncapaProblem.find_answer_text
+        """
+        if isinstance(current_answer, list):
+            return ", ".join(self.find_answer_text(answer_id, answer) for answer in current_answer)
+        if isinstance(current_answer, str) and current_answer.startswith('choice_'):
+            return self.entries[answer_id].choices.get(current_answer, "Answer Text Missing")
+        return current_answer
+
+
+def is_choice_answer(current_answer):
+    """
+        True for the answers of choice inputs: a choice name or a list of them
+    """
+    if isinstance(current_answer, list):
+        return all(isinstance(x, str) and x.startswith('choice_') for x in current_answer)
+    return isinstance(current_answer, str) and current_answer.startswith('choice_')
+
+
+def get_answer_report(template, answer_id, current_answer):
+    """
+        Report row of an answer, template is an AnswerExtractor or a ProblemTemplate.
+        Choice answers also list the [name, text] of each chosen choice, the
+        answer text joins them as LoncapaProblem.find_answer_text does, and
+        the names of the correct choices when the template knows them.
+    """
+    question_text, correct_answer_text = template.get_answer_info(answer_id)
+    report = {
+        "Answer ID": answer_id,
+        "Question": question_text,
+    }
+    if is_choice_answer(current_answer):
+        names = current_answer if isinstance(current_answer, list) else [current_answer]
+        choices = [[x, template.find_answer_text(answer_id, x)] for x in names]
+        report["Answer"] = ", ".join(text for _, text in choices)
+        report["Choices"] = choices
+        correct_choices = template.get_correct_choices(answer_id)
+        if correct_choices is not None:
+            report["Correct Choices"] = correct_choices
+    else:
+        report["Answer"] = template.find_answer_text(answer_id, current_answer)
+    if correct_answer_text is not None:
+        report["Correct Answer"] = correct_answer_text
+    return report
+
+
+def extract_answers(extractor, student_answers):
+    """
+        List of (answer_id, report) of the answers of a student, the report is
+        None for the answers the extractor does not know, those are left to capa
+    """
+    answers = []
+    for answer_id, current_answer in student_answers.items():
+        # Some types of problems have data in lcp.student_answers that isn't in lcp.problem_data.
+        # E.g. formulae do this to store the MathML version of the answer.
+        # We exclude these rows from the report because we only need the text-only answer.
+        if answer_id.endswith('_dynamath'):
+            continue
+        if extractor is not None and answer_id in extractor:
+            answers.append((answer_id, get_answer_report(extractor, answer_id, current_answer)))
+        else:
+            answers.append((answer_id, None))
+    return answers
+
+
+# AnswerExtractor of the problem in each process of an extraction pool
+worker_extractor = None
+
+
+def init_extraction_worker(entries):
+    """
+        Initializer of the extraction pool, the problem is sent once per process
+    """
+    global worker_extractor
+    worker_extractor = AnswerExtractor(entries)
+
+
+def extract_batch(batch):
+    """
+        extract_answers of a batch of student_answers, run by the extraction pool
+    """
+    return [extract_answers(worker_extractor, x) for x in batch]
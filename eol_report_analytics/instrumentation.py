@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import sys
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from time import time
+
+try:
+    # Peak memory of the process, not available on every platform
+    import resource
+except ImportError:
+    resource = None
+
+# Installed packages (via pip)
+try:
+    # statsd metrics are only sent when the client is installed and configured
+    from statsd import StatsClient
+except ImportError:
+    StatsClient = None
+
+
+def get_peak_rss():
+    """
+        Peak resident memory of the process in MB, None when unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes
+    if sys.platform == 'darwin':
+        peak = peak / 1024.0
+    return round(peak / 1024.0, 1)
+
+
+def timer(instrumentation, phase):
+    """
+        Context timing the phase, nothing is measured when instrumentation is None
+    """
+    if instrumentation is None:
+        return nullcontext()
+    return instrumentation.timer(phase)
+
+
+class Instrumentation(object):
+    """
+        Seconds spent by each phase of a report, student rows computed and peak
+        memory of the process. Phases can be nested, e.g. the indiv_id lookups
+        are part of the grading. publish(metrics) is called at most once every
+        `interval` seconds while the rows are counted.
+    """
+    def __init__(self, publish=None, interval=10):
+        self.start = time()
+        self.phases = OrderedDict()
+        self.rows = 0
+        self.publish = publish
+        self.interval = interval
+        self.last_publish = self.start
+
+    @contextmanager
+    def timer(self, phase):
+        start = time()
+        try:
+            yield
+        finally:
+            self.phases[phase] = self.phases.get(phase, 0.0) + time() - start
+
+    def add_rows(self, rows):
+        self.rows += rows
+        now = time()
+        if self.publish is not None and now - self.last_publish >= self.interval:
+            self.last_publish = now
+            self.publish(self.get_metrics())
+
+    def get_metrics(self):
+        elapsed = time() - self.start
+        return {
+            'elapsed': round(elapsed, 3),
+            'phases': {x: round(y, 3) for x, y in self.phases.items()},
+            'rows': self.rows,
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed else 0,
+            'peak_rss_mb': get_peak_rss(),
+        }
+
+    def send_statsd(self, host, port, prefix):
+        """
+            Send the phases as timers and the rows, rows/sec and peak memory as gauges
+        """
+        if StatsClient is None or not host:
+            return
+        metrics = self.get_metrics()
+        client = StatsClient(host, port, prefix=prefix)
+        with client.pipeline() as pipe:
+            pipe.timing('elapsed', metrics['elapsed'] * 1000)
+            for phase, seconds in metrics['phases'].items():
+                pipe.timing('phase.{}'.format(phase), seconds * 1000)
+            pipe.gauge('rows', metrics['rows'])
+            pipe.gauge('rows_per_second', metrics['rows_per_second'])
+            if metrics['peak_rss_mb'] is not None:
+                pipe.gauge('peak_rss_mb', metrics['peak_rss_mb'])
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import logging
+
+# Installed packages (via pip)
+from django.core.management.base import BaseCommand, CommandError
+
+# Edx dependencies
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey, UsageKey
+from xmodule.modulestore.django import modulestore
+
+# Internal project dependencies
+from eol_report_analytics.aggregates import rebuild_aggregate
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Compute the problem aggregates from the student states, for every problem of a course or a single problem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='+', help='Course ids or problem usage keys')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Student states per query')
+
+    def handle(self, *args, **options):
+        for block_id in self.get_problem_ids(options['ids']):
+            aggregate = rebuild_aggregate(block_id, options['chunk_size'])
+            self.stdout.write('{}: answered={}'.format(block_id, aggregate.answered))
+
+    def get_problem_ids(self, ids):
+        problem_ids = []
+        for key in ids:
+            try:
+                problem_ids.append(UsageKey.from_string(key))
+                continue
+            except InvalidKeyError:
+                pass
+            try:
+                course_key = CourseKey.from_string(key)
+            except InvalidKeyError:
+                raise CommandError('Invalid course or block id: {}'.format(key))
+            problem_ids.extend(x.location for x in modulestore().get_items(course_key, qualifiers={'category': 'problem'}))
+        return problem_ids
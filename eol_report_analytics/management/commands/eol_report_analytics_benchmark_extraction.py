@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import logging
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from time import time
+
+# Installed packages (via pip)
+from django.core.management.base import BaseCommand
+
+# Internal project dependencies
+from eol_report_analytics.extractors import AnswerExtractor, extract_answers, extract_batch, init_extraction_worker
+
+logger = logging.getLogger(__name__)
+
+PROBLEM_XML = '''<problem>
+<multiplechoiceresponse>
+<label>Question 1</label>
+<choicegroup type="MultipleChoice">
+<choice correct="false">Answer 1</choice>
+<choice correct="true">Answer 2</choice>
+<choice correct="false">Answer 3</choice>
+</choicegroup>
+</multiplechoiceresponse>
+<p>Question 2</p>
+<choiceresponse>
+<checkboxgroup>
+<choice correct="true">Answer 1</choice>
+<choice correct="false">Answer 2</choice>
+<choice correct="true">Answer 3</choice>
+</checkboxgroup>
+</choiceresponse>
+<optionresponse><optioninput options="('a','b','c')" correct="b"/></optionresponse>
+<stringresponse answer="Chile" type="ci"><additional_answer answer="chile"/><textline/></stringresponse>
+<numericalresponse answer="5"><formulaequationinput/></numericalresponse>
+</problem>'''
+
+
+class Command(BaseCommand):
+    help = 'Measure the time used to extract the answers of random students, serially and with each number of processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100000, help='Number of students')
+        parser.add_argument('--workers', default='1,2,4,8', help='Comma separated numbers of processes')
+        parser.add_argument('--batch-size', type=int, default=500, help='Students per batch sent to a process')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random answers')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        extractor = AnswerExtractor.from_problem(PROBLEM_XML, 'problem')
+        student_answers = []
+        for _ in range(options['students']):
+            student_answers.append({
+                'problem_2_1': rnd.choice(['choice_0', 'choice_1', 'choice_2']),
+                'problem_3_1': rnd.sample(['choice_0', 'choice_1', 'choice_2'], rnd.randint(1, 3)),
+                'problem_4_1': rnd.choice(['a', 'b', 'c']),
+                'problem_5_1': rnd.choice(['Chile', 'Peru']),
+                'problem_6_1': str(rnd.randint(1, 9)),
+            })
+
+        start = time()
+        serial = [extract_answers(extractor, x) for x in student_answers]
+        serial_time = time() - start
+        self.stdout.write('serial: students={} seconds={:.3f}'.format(len(student_answers), serial_time))
+
+        batch_size = options['batch_size']
+        batches = [student_answers[i:i + batch_size] for i in range(0, len(student_answers), batch_size)]
+        for workers in [int(x) for x in options['workers'].split(',')]:
+            # The time includes starting the processes, as in a report
+            start = time()
+            with ProcessPoolExecutor(workers, initializer=init_extraction_worker, initargs=(extractor.entries,)) as pool:
+                results = list(chain.from_iterable(pool.map(extract_batch, batches)))
+            elapsed = time() - start
+            if results != serial:
+                logger.error('EolReportAnalytics - Parallel extraction with {} processes differs from the serial one'.format(workers))
+            self.stdout.write('workers={}: students={} batch_size={} seconds={:.3f} speedup={:.2f}'.format(
+                workers, len(student_answers), batch_size, elapsed, serial_time / elapsed if elapsed else 0))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import logging
+import random
+from time import time
+
+# Installed packages (via pip)
+from django.core.management.base import BaseCommand
+
+# Internal project dependencies
+from eol_report_analytics import psychometrics
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Measure the time used to compute the psychometrics of random answers, with and without numpy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100000, help='Number of students')
+        parser.add_argument('--items', type=int, default=50, help='Number of questions')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random answers')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        items = ['question_{}'.format(x) for x in range(options['items'])]
+        # Each question has its own difficulty and each student its own ability,
+        # so the statistics are not trivial
+        difficulty = [rnd.random() for x in items]
+        students = []
+        for _ in range(options['students']):
+            ability = rnd.random()
+            correct = [x for x, p in zip(items, difficulty) if rnd.random() < (ability + p) / 2]
+            answered = set(correct)
+            incorrect = [x for x in items if x not in answered]
+            students.append((len(correct) / float(len(items)), correct, incorrect))
+
+        engines = [('array', None)]
+        if psychometrics.numpy is not None:
+            engines.insert(0, ('numpy', psychometrics.numpy))
+        backend = psychometrics.numpy
+        try:
+            for name, module in engines:
+                psychometrics.numpy = module
+                start = time()
+                engine = psychometrics.Psychometrics()
+                for score, correct, incorrect in students:
+                    engine.add(score, correct, incorrect)
+                alpha, statistics = engine.get_statistics()
+                elapsed = time() - start
+                self.stdout.write('{}: students={} items={} seconds={:.3f} alpha={}'.format(
+                    name, len(students), len(items), elapsed, alpha))
+        finally:
+            psychometrics.numpy = backend
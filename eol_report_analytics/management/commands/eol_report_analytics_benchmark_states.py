@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import logging
+from time import time
+
+# Installed packages (via pip)
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Edx dependencies
+from lms.djangoapps.courseware.models import StudentModule
+from opaque_keys.edx.keys import UsageKey
+
+# Internal project dependencies
+from eol_report_analytics.views import EolReportAnalyticsView
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Measure the queries and time used to read the student states of a problem block'
+
+    def add_arguments(self, parser):
+        parser.add_argument('block_id', help='Usage key of the problem block')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Student states per query')
+
+    def handle(self, *args, **options):
+        block_id = options['block_id']
+        usage_key = UsageKey.from_string(block_id)
+
+        # Previous implementation: a single query over every state of the block sorted by username
+        with CaptureQueriesContext(connection) as queries:
+            start = time()
+            rows = len(list(StudentModule.objects.filter(
+                course_id=usage_key.course_key,
+                module_state_key=usage_key
+            ).order_by('student__username').values_list('student__username', 'state')))
+            elapsed = time() - start
+        self.report('single query', rows, len(queries), elapsed)
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time()
+            rows = sum(len(chunk) for chunk in EolReportAnalyticsView().get_all_states(block_id, options['chunk_size']))
+            elapsed = time() - start
+        self.report('keyset chunks', rows, len(queries), elapsed)
+
+    def report(self, name, rows, queries, elapsed):
+        self.stdout.write('{}: rows={} queries={} seconds={:.3f} rows/s={:.0f}'.format(
+            name, rows, queries, elapsed, rows / elapsed if elapsed else 0))
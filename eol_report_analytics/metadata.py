@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+import hashlib
+
+# Installed packages (via pip)
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import override
+
+# Internal project dependencies
+from .extractors import AnswerExtractor
+
+# The format number changes when the cached AnswerEntry changes
+METADATA_CACHE_KEY = 'eol_report_analytics:metadata:3:{}'
+# Problems kept parsed in the memory of each process
+METADATA_LRU_SIZE = 512
+
+
+class LRUCache(object):
+    """
+        Size bounded mapping that drops the least recently used entries,
+        shared by the threads of the process
+    """
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+local_cache = LRUCache(METADATA_LRU_SIZE)
+
+
+def get_metadata_key(usage_key, version):
+    """
+        Cache key of the parsed problem, a publish of the problem changes its
+        version so the entries of previous versions are never read again
+    """
+    key = '|'.join([str(usage_key), version.isoformat()])
+    return METADATA_CACHE_KEY.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def parse_problem(block, gettext):
+    """
+        AnswerExtractor of the problem, the labels of the questions without one
+        are translated to the language of the site and not of the request, so
+        the web and task processes share the same entry
+    """
+    with override(settings.LANGUAGE_CODE):
+        return AnswerExtractor.from_problem(block.data, block.location.html_id(), gettext)
+
+
+def get_answer_extractor(block, gettext=None, timeout=0):
+    """
+        AnswerExtractor of the problem, None when the problem needs capa.
+        The parsed problem is kept by usage key and content version in memory
+        and, when timeout is not 0, for timeout seconds in the django cache
+        shared by the web and task processes.
+    """
+    version = getattr(block, 'edited_on', None)
+    if not isinstance(version, datetime):
+        return parse_problem(block, gettext)
+    key = get_metadata_key(block.location, version)
+    cached = local_cache.get(key)
+    if cached is None and timeout:
+        cached = cache.get(key)
+    if cached is None:
+        extractor = parse_problem(block, gettext)
+        # Problems left to capa are cached too, as a None table
+        cached = (extractor.entries if extractor is not None else None,)
+        if timeout:
+            cache.set(key, cached, timeout)
+    local_cache.set(key, cached)
+    if cached[0] is None:
+        return None
+    return AnswerExtractor(cached[0])
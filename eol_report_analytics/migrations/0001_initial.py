@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import opaque_keys.edx.django.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_id', opaque_keys.edx.django.models.UsageKeyField(max_length=255, unique=True)),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(db_index=True, max_length=255)),
+                ('answered', models.IntegerField(default=0)),
+                ('headers', models.JSONField(default=list)),
+                ('correct', models.JSONField(default=dict)),
+                ('incorrect', models.JSONField(default=dict)),
+                ('score_sum', models.TextField(default='0')),
+                ('score_sum_squares', models.TextField(default='0')),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProblemResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_id', opaque_keys.edx.django.models.UsageKeyField(db_index=True, max_length=255)),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(db_index=True, max_length=255)),
+                ('score', models.FloatField()),
+                ('correct', models.JSONField(default=list)),
+                ('incorrect', models.JSONField(default=list)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('block_id', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+import opaque_keys.edx.django.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_report_analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True)),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(db_index=True, max_length=255)),
+                ('block_id', opaque_keys.edx.django.models.UsageKeyField(max_length=255)),
+                ('report_name', models.CharField(max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import opaque_keys.edx.django.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('eol_report_analytics', '0002_reportfingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_id', opaque_keys.edx.django.models.UsageKeyField(max_length=255, unique=True)),
+                ('course_id', opaque_keys.edx.django.models.CourseKeyField(db_index=True, max_length=255)),
+                ('signature', models.CharField(max_length=64)),
+                ('watermark', models.DateTimeField()),
+                ('questions', models.JSONField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReportRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_id', opaque_keys.edx.django.models.UsageKeyField(db_index=True, max_length=255)),
+                ('state_id', models.BigIntegerField()),
+                ('username', models.CharField(max_length=150)),
+                ('input_keys', models.JSONField(null=True)),
+                ('answers', models.JSONField(null=True)),
+                ('attempts', models.JSONField(null=True)),
+                ('score_earned', models.JSONField(null=True)),
+                ('score_possible', models.JSONField(null=True)),
+                ('score', models.FloatField(null=True)),
+                ('correct', models.JSONField(default=list)),
+                ('incorrect', models.JSONField(default=list)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('block_id', 'state_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_report_analytics', '0003_reportrow_reportwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportfingerprint',
+            name='analytics',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reportfingerprint',
+            index=models.Index(fields=['block_id', 'created'], name='eol_report_block_created_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_report_analytics', '0004_reportfingerprint_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportrow',
+            name='options',
+            field=models.JSONField(null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eol_report_analytics', '0005_reportrow_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problemaggregate',
+            name='enrollment_modes',
+            field=models.JSONField(default=list),
+        ),
+    ]
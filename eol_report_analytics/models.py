@@ -1,4 +1,156 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+from collections import Counter
+from fractions import Fraction
+
+# Installed packages (via pip)
+from django.contrib.auth.models import User
 from django.db import models
-# Create your models here.
+from opaque_keys.edx.django.models import CourseKeyField, UsageKeyField
+
+# Internal project dependencies
+from .analytics import ProblemAnalytics
+
+
+class ProblemResult(models.Model):
+    """
+        Graded answers of a student in a problem, kept to take them out of
+        the aggregate when the student answers again
+    """
+    block_id = UsageKeyField(max_length=255, db_index=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    score = models.FloatField()
+    correct = models.JSONField(default=list)
+    incorrect = models.JSONField(default=list)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('block_id', 'user')
+
+    def __str__(self):
+        return '{} - {}'.format(self.block_id, self.user_id)
+
+
+class ProblemAggregate(models.Model):
+    """
+        Analytics of a problem over the results of its students, enough to
+        write the report summary without reading any student state
+    """
+    block_id = UsageKeyField(max_length=255, unique=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    answered = models.IntegerField(default=0)
+    # Answer ids in the order of the report columns
+    headers = models.JSONField(default=list)
+    correct = models.JSONField(default=dict)
+    incorrect = models.JSONField(default=dict)
+    # Exact sums stored as fractions, so the mean and standard deviation match the report
+    score_sum = models.TextField(default='0')
+    score_sum_squares = models.TextField(default='0')
+    # Enrollment modes of the students counted, the aggregate is not used once the setting changes
+    enrollment_modes = models.JSONField(default=list)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.block_id)
+
+    def add(self, result, sign=1):
+        """
+            Add the result of a student, or take it out with sign=-1
+        """
+        score = Fraction(result.score)
+        self.answered += sign
+        self.score_sum = str(Fraction(self.score_sum) + sign * score)
+        self.score_sum_squares = str(Fraction(self.score_sum_squares) + sign * score * score)
+        correct = Counter(self.correct)
+        correct.update({x: sign for x in result.correct})
+        self.correct = {x: y for x, y in correct.items() if y > 0}
+        incorrect = Counter(self.incorrect)
+        incorrect.update({x: sign for x in result.incorrect})
+        self.incorrect = {x: y for x, y in incorrect.items() if y > 0}
+
+    def remove(self, result):
+        self.add(result, -1)
+
+    def to_analytics(self):
+        """
+            ProblemAnalytics of the aggregate, without discrimination quartiles
+        """
+        analytics = ProblemAnalytics(0)
+        analytics.users = self.answered
+        analytics.correct = Counter(self.correct)
+        analytics.incorrect = Counter(self.incorrect)
+        analytics.score_sum = Fraction(self.score_sum)
+        analytics.score_sum_squares = Fraction(self.score_sum_squares)
+        return analytics
+
+
+class ReportFingerprint(models.Model):
+    """
+        Index of the stored reports by the fingerprint of the data they were
+        built from, a request with the same fingerprint reuses the report
+    """
+    fingerprint = models.CharField(max_length=64, unique=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    block_id = UsageKeyField(max_length=255)
+    report_name = models.CharField(max_length=255)
+    # Per question analytics of the report, served by the json endpoint
+    analytics = models.JSONField(null=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['block_id', 'created'], name='eol_report_block_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.report_name
+
+
+class ReportRow(models.Model):
+    """
+        Student state of a problem as computed by the last report, the next
+        incremental report only computes again the states modified since then
+    """
+    block_id = UsageKeyField(max_length=255, db_index=True)
+    state_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    username = models.CharField(max_length=150)
+    # Answer ids of the state, None when the student has no attempts
+    input_keys = models.JSONField(null=True)
+    # Answer text by answer id, None when the state has no row in the report
+    answers = models.JSONField(null=True)
+    # Answer counted by the distractor analysis by answer id, the [[name, text], ...]
+    # of the chosen choices for choice answers
+    options = models.JSONField(null=True)
+    attempts = models.JSONField(null=True)
+    score_earned = models.JSONField(null=True)
+    score_possible = models.JSONField(null=True)
+    score = models.FloatField(null=True)
+    correct = models.JSONField(default=list)
+    incorrect = models.JSONField(default=list)
+
+    class Meta:
+        unique_together = ('block_id', 'state_id')
+
+    def __str__(self):
+        return '{} - {}'.format(self.block_id, self.username)
+
 
+class ReportWatermark(models.Model):
+    """
+        Last incremental report of a problem, the stored rows are valid while
+        the signature (problem version, grading and enrollment modes) is the same
+    """
+    block_id = UsageKeyField(max_length=255, unique=True)
+    course_id = CourseKeyField(max_length=255, db_index=True)
+    signature = models.CharField(max_length=64)
+    # States modified after this date are computed again
+    watermark = models.DateTimeField()
+    # (StudentModule id, questions) read from the first state with answers
+    questions = models.JSONField(null=True)
 
+    def __str__(self):
+        return str(self.block_id)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+from collections import OrderedDict
+from contextlib import contextmanager
+from queue import Full, Queue
+from threading import Event, Thread
+from time import time
+
+# Installed packages (via pip)
+from django.db import connections
+
+# Marks the end of the items of a queue
+END = object()
+# Seconds between checks of the stop event while a queue is full or empty
+QUEUE_POLL = 0.1
+
+
+class Pipeline(object):
+    """
+        Stages of a report run by their own threads and connected by bounded
+        queues, so the database is read while the previous chunk is graded and
+        the graded rows are saved meanwhile. A full queue blocks its producer,
+        which keeps at most queue_size chunks in memory per queue.
+        The seconds spent by each stage are kept in `timings`, and the seconds
+        a stage waited for the previous one in `waits`.
+    """
+    def __init__(self, queue_size=2):
+        self.queue_size = queue_size
+        self.timings = OrderedDict()
+        self.waits = OrderedDict()
+
+    def add_time(self, times, stage, seconds):
+        times[stage] = times.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage):
+        start = time()
+        try:
+            yield
+        finally:
+            self.add_time(self.timings, stage, time() - start)
+
+    def prefetch(self, iterable, stage='fetch'):
+        """
+            Iterate `iterable` in a thread, up to queue_size items ahead of the consumer
+        """
+        queue = Queue(self.queue_size)
+        stop = Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=QUEUE_POLL)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                iterator = iter(iterable)
+                while True:
+                    start = time()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    finally:
+                        self.add_time(self.timings, stage, time() - start)
+                    if not put((item, None)):
+                        return
+                put((END, None))
+            except Exception as e:
+                put((END, e))
+            finally:
+                # The thread opened its own database connection
+                connections.close_all()
+
+        thread = Thread(target=produce, name='eol_report_analytics_{}'.format(stage), daemon=True)
+        thread.start()
+        try:
+            while True:
+                start = time()
+                item, error = queue.get()
+                self.add_time(self.waits, stage, time() - start)
+                if error is not None:
+                    raise error
+                if item is END:
+                    return
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    @contextmanager
+    def writer(self, write, stage='write'):
+        """
+            Run write(item) in a thread for every item sent to the function
+            returned, an error of the writer is raised when the block ends
+        """
+        queue = Queue(self.queue_size)
+        errors = []
+
+        def consume():
+            while True:
+                item = queue.get()
+                if item is END:
+                    return
+                if errors:
+                    # Drain the queue after an error so the producer never blocks
+                    continue
+                start = time()
+                try:
+                    write(item)
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    self.add_time(self.timings, stage, time() - start)
+
+        def send(item):
+            if errors:
+                raise errors[0]
+            start = time()
+            queue.put(item)
+            self.add_time(self.waits, stage, time() - start)
+
+        thread = Thread(target=consume, name='eol_report_analytics_{}'.format(stage), daemon=True)
+        thread.start()
+        try:
+            yield send
+        finally:
+            queue.put(END)
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def get_timings(self):
+        """
+            Seconds of each stage and seconds each stage waited, rounded for the task progress
+        """
+        return {
+            'timings': {x: round(y, 3) for x, y in self.timings.items()},
+            'waits': {x: round(y, 3) for x, y in self.waits.items()},
+        }
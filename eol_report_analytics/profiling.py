@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import cProfile
+import io
+import marshal
+import pstats
+import tracemalloc
+
+# Frames kept per allocation, one is enough to group them by line
+TRACEMALLOC_FRAMES = 1
+
+
+class ReportProfile(object):
+    """
+        cProfile and tracemalloc capture of a function call, the stats are
+        kept even when the function raises
+    """
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.snapshot = None
+        self.peak = 0
+
+    def run(self, function, *args, **kwargs):
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.profiler.disable()
+            self.snapshot = tracemalloc.take_snapshot()
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def get_pstats(self):
+        """
+            Content of the .pstats file, readable with pstats.Stats(path) or snakeviz
+        """
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def get_allocation_summary(self, top=25):
+        """
+            Text with the lines that allocated the most memory still in use at
+            the end of the call, followed by the slowest functions by cumulative time
+        """
+        output = io.StringIO()
+        statistics = self.snapshot.statistics('lineno')
+        total = sum(x.size for x in statistics)
+        output.write('Peak memory traced: {:.1f} KiB\n'.format(self.peak / 1024.0))
+        output.write('Memory allocated and not released: {:.1f} KiB in {} lines\n\n'.format(total / 1024.0, len(statistics)))
+        output.write('Top {} lines by memory\n'.format(top))
+        for index, stat in enumerate(statistics[:top], start=1):
+            frame = stat.traceback[0]
+            output.write('#{}: {}:{}: {:.1f} KiB in {} blocks\n'.format(index, frame.filename, frame.lineno, stat.size / 1024.0, stat.count))
+        output.write('\nTop {} functions by cumulative time\n'.format(top))
+        pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(top)
+        return output.getvalue()
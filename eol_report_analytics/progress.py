@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+from time import sleep, time
+
+# Installed packages (via pip)
+from django.core.cache import cache
+
+# Each field of a progress record has its own key, so concurrent writers
+# (the view, the task and the fan-out reducer) never overwrite each other
+PROGRESS_CACHE_KEY = 'eol_report_analytics:progress:{}:{}'
+# Fields of a progress record served by the status endpoint, other fields are not kept
+PROGRESS_FIELDS = ('state', 'step', 'rows', 'report_name', 'report_url', 'summary_report_url', 'course', 'user_id')
+# Seconds a progress record is kept after its last update
+PROGRESS_TIMEOUT = 24 * 60 * 60
+# Seconds between cache reads while a status request waits for a change
+POLL_INTERVAL = 0.5
+
+STATE_QUEUED = 'QUEUED'
+STATE_PROGRESS = 'PROGRESS'
+STATE_SUCCESS = 'SUCCESS'
+STATE_FAILURE = 'FAILURE'
+FINAL_STATES = (STATE_SUCCESS, STATE_FAILURE)
+
+
+def get_progress_key(task_id, field):
+    return PROGRESS_CACHE_KEY.format(task_id, field)
+
+
+class ProgressRecord(object):
+    """
+        Progress of a report task kept in the cache, updated by the task and read
+        by the status endpoint. Each update increases its version atomically.
+    """
+    def __init__(self, task_id):
+        self.task_id = task_id
+
+    def update(self, state=None, **fields):
+        if not self.task_id:
+            return
+        if state is not None:
+            fields['state'] = state
+        cache.set_many({get_progress_key(self.task_id, x): y for x, y in fields.items() if x in PROGRESS_FIELDS}, PROGRESS_TIMEOUT)
+        self.increase_version()
+
+    def add(self, **fields):
+        """
+            Set the fields not set yet, e.g. the queued state unless the task already started
+        """
+        if not self.task_id:
+            return
+        for field, value in fields.items():
+            if field in PROGRESS_FIELDS:
+                cache.add(get_progress_key(self.task_id, field), value, PROGRESS_TIMEOUT)
+        self.increase_version()
+
+    def increase_version(self):
+        # The version is written after the fields, a reader of a new version reads its fields
+        key = get_progress_key(self.task_id, 'version')
+        cache.add(key, 0, PROGRESS_TIMEOUT)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between both calls
+            cache.set(key, 1, PROGRESS_TIMEOUT)
+        cache.touch(key, PROGRESS_TIMEOUT)
+
+
+def get_progress(task_id):
+    """
+        Fields and version of the progress record of the task, None when there is no record
+    """
+    keys = {get_progress_key(task_id, x): x for x in PROGRESS_FIELDS + ('version',)}
+    values = cache.get_many(list(keys))
+    if get_progress_key(task_id, 'version') not in values:
+        return None
+    return {keys[x]: y for x, y in values.items()}
+
+
+def wait_progress(task_id, version, timeout):
+    """
+        Progress record of the task as soon as its version differs from `version`,
+        waiting at most timeout seconds. Only the version is read while waiting.
+    """
+    key = get_progress_key(task_id, 'version')
+    deadline = time() + timeout
+    while cache.get(key) == version:
+        remaining = deadline - time()
+        if remaining <= 0:
+            break
+        sleep(min(POLL_INTERVAL, remaining))
+    return get_progress(task_id)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+from array import array
+from fractions import Fraction
+from math import fsum, sqrt
+
+# Installed packages (via pip)
+try:
+    # Vectorized accumulation, used when it is installed
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Psychometrics(object):
+    """
+        Classical test theory statistics of the questions of a problem.
+        Students are buffered in a 0/1 correctness matrix plus a score vector,
+        each full buffer is reduced to per question sums, so memory does not
+        grow with the number of students and partial results can be merged.
+        The correct answers are integers and their sums are exact, the score
+        is kept as mean and sums of deviations from the mean, combined with
+        the pairwise update of Chan et al., so no variance is a difference
+        of two large sums.
+    """
+    def __init__(self, buffer_size=1024):
+        self.buffer_size = buffer_size
+        self.n = 0
+        # Exact sums over the students of the correct answers count t and its square
+        self.sum_t = 0
+        self.sum_t2 = 0
+        # Mean of the score s, sum of its squared deviations and its range
+        self.mean_s = 0.0
+        self.m2_s = 0.0
+        self.min_s = None
+        self.max_s = None
+        # Column of each answer id, per column exact sums of x and x * t and
+        # sum of x times the deviation of the score
+        self.items = {}
+        self.sum_x = []
+        self.sum_xt = []
+        self.c_xs = []
+        self.pending = []
+        self.pending_scores = array('d')
+
+    def column(self, answer_id):
+        if answer_id not in self.items:
+            self.items[answer_id] = len(self.items)
+            self.sum_x.append(0)
+            self.sum_xt.append(0)
+            self.c_xs.append(0.0)
+        return self.items[answer_id]
+
+    def add(self, score, correct, incorrect=()):
+        """
+            Add a student, answer ids in incorrect only register the question
+        """
+        for answer_id in incorrect:
+            self.column(answer_id)
+        self.pending.append([self.column(x) for x in correct])
+        self.pending_scores.append(score)
+        if len(self.pending) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+            Reduce the buffered students to the sums
+        """
+        if not self.pending:
+            return
+        if numpy is not None:
+            self.flush_numpy()
+        else:
+            self.flush_array()
+        self.pending = []
+        self.pending_scores = array('d')
+
+    def flush_numpy(self):
+        rows = len(self.pending)
+        matrix = numpy.zeros((rows, len(self.items)), dtype=numpy.uint8)
+        row_index = numpy.repeat(numpy.arange(rows), [len(x) for x in self.pending])
+        column_index = numpy.fromiter((x for columns in self.pending for x in columns), dtype=numpy.intp, count=len(row_index))
+        matrix[row_index, column_index] = 1
+        scores = numpy.frombuffer(self.pending_scores, dtype=numpy.float64)
+        totals = matrix.sum(axis=1, dtype=numpy.int64)
+        mean_s = fsum(self.pending_scores) / rows
+        deviations = scores - mean_s
+        self.combine(
+            rows,
+            int(totals.sum()),
+            int(totals.dot(totals)),
+            mean_s,
+            float(deviations.dot(deviations)),
+            float(scores.min()),
+            float(scores.max()),
+            [int(x) for x in matrix.sum(axis=0, dtype=numpy.int64)],
+            [int(x) for x in totals.dot(matrix)],
+            [float(x) for x in deviations.dot(matrix)])
+
+    def flush_array(self):
+        rows = len(self.pending)
+        width = len(self.items)
+        mean_s = fsum(self.pending_scores) / rows
+        sum_t = 0
+        sum_t2 = 0
+        sum_x = [0] * width
+        sum_xt = [0] * width
+        c_xs = [[] for x in range(width)]
+        for columns, score in zip(self.pending, self.pending_scores):
+            total = len(columns)
+            deviation = score - mean_s
+            sum_t += total
+            sum_t2 += total * total
+            for x in columns:
+                sum_x[x] += 1
+                sum_xt[x] += total
+                c_xs[x].append(deviation)
+        self.combine(
+            rows,
+            sum_t,
+            sum_t2,
+            mean_s,
+            fsum((x - mean_s) * (x - mean_s) for x in self.pending_scores),
+            min(self.pending_scores),
+            max(self.pending_scores),
+            sum_x,
+            sum_xt,
+            [fsum(x) for x in c_xs])
+
+    def combine(self, n, sum_t, sum_t2, mean_s, m2_s, min_s, max_s, sum_x, sum_xt, c_xs):
+        """
+            Add the sums of other group of students, the per column lists follow
+            the columns of this instance and may be shorter
+        """
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean_s - self.mean_s
+        # Weight of the difference of the means in the sums of deviations
+        weight = self.n * n / total
+        for x in range(len(self.items)):
+            other_x = sum_x[x] if x < len(sum_x) else 0
+            other_c = c_xs[x] if x < len(c_xs) else 0.0
+            mean_x = self.sum_x[x] / self.n if self.n else 0.0
+            self.c_xs[x] += other_c + (other_x / n - mean_x) * delta * weight
+            self.sum_x[x] += other_x
+            self.sum_xt[x] += sum_xt[x] if x < len(sum_xt) else 0
+        self.m2_s += m2_s + delta * delta * weight
+        self.mean_s += delta * n / total
+        self.min_s = min_s if self.min_s is None else min(self.min_s, min_s)
+        self.max_s = max_s if self.max_s is None else max(self.max_s, max_s)
+        self.sum_t += sum_t
+        self.sum_t2 += sum_t2
+        self.n = total
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        columns = [self.column(x) for x in other.items]
+        width = len(self.items)
+        sum_x = [0] * width
+        sum_xt = [0] * width
+        c_xs = [0.0] * width
+        for column, x in zip(other.items.values(), columns):
+            sum_x[x] = other.sum_x[column]
+            sum_xt[x] = other.sum_xt[column]
+            c_xs[x] = other.c_xs[column]
+        self.combine(other.n, other.sum_t, other.sum_t2, other.mean_s, other.m2_s, other.min_s, other.max_s, sum_x, sum_xt, c_xs)
+
+    def to_dict(self):
+        self.flush()
+        return {
+            'n': self.n,
+            'sums': [self.sum_t, self.sum_t2],
+            'score': [self.mean_s, self.m2_s, self.min_s, self.max_s],
+            'items': {x: [self.sum_x[i], self.sum_xt[i], self.c_xs[i]] for x, i in self.items.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, value):
+        psychometrics = cls()
+        psychometrics.n = value['n']
+        psychometrics.sum_t, psychometrics.sum_t2 = value['sums']
+        psychometrics.mean_s, psychometrics.m2_s, psychometrics.min_s, psychometrics.max_s = value['score']
+        for answer_id, sums in value['items'].items():
+            x = psychometrics.column(answer_id)
+            psychometrics.sum_x[x], psychometrics.sum_xt[x], psychometrics.c_xs[x] = sums
+        return psychometrics
+
+    def get_statistics(self):
+        """
+            Return (alpha, questions) where alpha is the Cronbach's alpha (KR-20 for
+            right/wrong questions) and questions maps each answer id to its
+            difficulty, point-biserial correlation with the score and alpha if
+            the question is deleted. Undefined values are None.
+        """
+        self.flush()
+        questions = {}
+        if self.n == 0:
+            return None, questions
+        n = self.n
+        k = len(self.items)
+        # Variances of the correct answers are exact fractions, the variance of
+        # the score is zero only when every student has the same score
+        var_s = self.m2_s / n if self.max_s > self.min_s else 0.0
+        var_t = Fraction(n * self.sum_t2 - self.sum_t * self.sum_t, n * n)
+        variances = {}
+        for answer_id, x in self.items.items():
+            p = Fraction(self.sum_x[x], n)
+            variances[answer_id] = p * (1 - p)
+        sum_variances = sum(variances.values())
+        alpha = None
+        if k > 1 and var_t > 0:
+            alpha = float(Fraction(k, k - 1) * (1 - sum_variances / var_t))
+        for answer_id, x in self.items.items():
+            var_x = variances[answer_id]
+            point_biserial = None
+            if var_x > 0 and var_s > 0:
+                point_biserial = self.c_xs[x] / n / sqrt(float(var_x) * var_s)
+            # Variance of the correct answers count without this question
+            cov_xt = Fraction(n * self.sum_xt[x] - self.sum_x[x] * self.sum_t, n * n)
+            var_rest = var_t + var_x - 2 * cov_xt
+            alpha_if_deleted = None
+            if k > 2 and var_rest > 0:
+                alpha_if_deleted = float(Fraction(k - 1, k - 2) * (1 - (sum_variances - var_x) / var_rest))
+            questions[answer_id] = {
+                'difficulty': self.sum_x[x] / n,
+                'point_biserial': point_biserial,
+                'alpha_if_deleted': alpha_if_deleted,
+            }
+        return alpha, questions
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+from collections import Counter
+from heapq import heapify, heappop, heappush, heapreplace
+
+
+def get_answer_pairs(entries):
+    """
+        Count of the (question, answer) pairs of the entries
+    """
+    counts = Counter()
+    for entry in entries:
+        for question, answer in (entry[3] or {}).items():
+            if isinstance(answer, list):
+                counts.update((question, x) for x in answer)
+            else:
+                counts[(question, answer)] += 1
+    return counts
+
+
+class DescendingKey(object):
+    """
+        Invert the ordering of a value, so the heap roots hold the latest arrival
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class QuartileTracker(object):
+    """
+        Keep the `size` best and worst scored students with a pair of bounded heaps,
+        each insertion is O(log size).
+        Ties are resolved by arrival order, or by the given order key (e.g. the username):
+        among students with the same score the first ones are kept.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        # min-heap whose root is the lowest score, latest arrival of the best students
+        self.best = []
+        # min-heap whose root is the highest score, latest arrival of the worst students
+        self.worst = []
+
+    def add(self, score, correct, order=None, answers=None):
+        """
+            Add a student score with the list of questions answered correctly
+            and optionally the answer of each question
+        """
+        if order is None:
+            order = self.count
+        self.count += 1
+        if self.size <= 0:
+            return
+        order = DescendingKey(order)
+        self.push(self.best, score, order, correct, answers)
+        self.push(self.worst, -score, order, correct, answers)
+
+    def push(self, heap, score, order, correct, answers=None):
+        if len(heap) < self.size:
+            heappush(heap, (score, order, correct, answers))
+        elif (score, order) > heap[0][:2]:
+            heapreplace(heap, (score, order, correct, answers))
+
+    def merge(self, other):
+        """
+            Add the students kept by other tracker, both trackers must use explicit
+            order keys. The best of the union are the best of each tracker's best.
+        """
+        self.count += other.count
+        if self.size <= 0:
+            return
+        for entry in other.best:
+            self.push(self.best, *entry)
+        for entry in other.worst:
+            self.push(self.worst, *entry)
+
+    def to_dict(self):
+        return {
+            'size': self.size,
+            'count': self.count,
+            'best': [[score, order.value, correct, answers] for score, order, correct, answers in self.best],
+            'worst': [[score, order.value, correct, answers] for score, order, correct, answers in self.worst],
+        }
+
+    @classmethod
+    def from_dict(cls, value):
+        tracker = cls(value['size'])
+        tracker.count = value['count']
+        tracker.best = [(score, DescendingKey(order), correct, answers) for score, order, correct, answers in value['best']]
+        tracker.worst = [(score, DescendingKey(order), correct, answers) for score, order, correct, answers in value['worst']]
+        heapify(tracker.best)
+        heapify(tracker.worst)
+        return tracker
+
+    def get_quartile_size(self, answered):
+        """
+            Students in each quartile of the students that answered. It is smaller
+            than a quarter when more students answered than the tracker was sized
+            for, e.g. states created while the report was read.
+        """
+        return min(int(answered / 4), max(self.size, 0))
+
+    def is_truncated(self, answered):
+        return self.get_quartile_size(answered) < int(answered / 4)
+
+    def get_quartiles(self, answered):
+        """
+            Return the entries of the best and worst quartile of the students that answered
+        """
+        quartile = self.get_quartile_size(answered)
+        best = list(self.best)
+        worst = list(self.worst)
+        # Trim the heaps when fewer students answered than expected, dropping the
+        # lowest (highest) scores and latest arrivals first
+        while len(best) > quartile:
+            heappop(best)
+        while len(worst) > quartile:
+            heappop(worst)
+        return best, worst
+
+    def get_discriminatory_index(self, answered):
+        """
+            Return the count of correct answers by question in the best and worst
+            quartile of the students that answered
+        """
+        best, worst = self.get_quartiles(answered)
+        best_count = Counter(x for entry in best for x in entry[2])
+        worst_count = Counter(x for entry in worst for x in entry[2])
+        return best_count, worst_count
+
+    def get_answer_counts(self, answered):
+        """
+            Return the count of each (question, answer) pair in the best and worst
+            quartile of the students that answered, each choice of a list of
+            choices is an answer
+        """
+        best, worst = self.get_quartiles(answered)
+        return get_answer_pairs(best), get_answer_pairs(worst)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import random
+from math import fsum, sqrt
+from time import time
+
+# Number of primary key ranges expected to fill the sample, more ranges give
+# narrower intervals at the cost of more queries
+SAMPLE_CLUSTERS = 20
+
+# Normal quantile of the 95% confidence intervals
+Z_95 = 1.959963984540054
+# Student's t quantiles of the 95% confidence intervals by degrees of freedom
+T_95 = (
+    12.706204736, 4.302652730, 3.182446305, 2.776445105, 2.570581836,
+    2.446911851, 2.364624252, 2.306004135, 2.262157163, 2.228138852,
+    2.200985160, 2.178812830, 2.160368656, 2.144786688, 2.131449546,
+    2.119905299, 2.109815578, 2.100922040, 2.093024054, 2.085963447,
+    2.079613845, 2.073873068, 2.068657610, 2.063898562, 2.059538553,
+    2.055529439, 2.051830516, 2.048407142, 2.045229642, 2.042272456,
+)
+
+
+def get_primary_key_ranges(low, high, parts, rnd):
+    """
+        Split the ids from low to high in `parts` [start, end) ranges of the same width, in random order
+    """
+    width = (high - low + parts) // parts
+    ranges = [(low + i * width, low + (i + 1) * width) for i in range(parts)]
+    rnd.shuffle(ranges)
+    return ranges
+
+
+class PrimaryKeySample(object):
+    """
+        Cluster sample of rows: whole primary key ranges read in random order,
+        without sorting the table by a random value. Every row belongs to
+        exactly one range, so all the rows have the same chance to be sampled,
+        but rows of a range are read together and are not a simple random
+        sample, see cluster_interval.
+    """
+    def __init__(self, low, high, total, sample_size, rnd=None):
+        rows_per_range = max(1, sample_size // SAMPLE_CLUSTERS)
+        parts = max(1, min(total // rows_per_range, high - low + 1))
+        self.ranges = get_primary_key_ranges(low, high, parts, rnd or random.Random())
+        self.sample_size = sample_size
+        self.rows = 0
+        self.ranges_read = 0
+
+    def read(self, read_range, deadline):
+        """
+            Yield the chunks of read_range(cluster, start, end) of each range until
+            the sample size is reached or the deadline (a time() value) is spent,
+            cluster is the position of the range in the reading order
+        """
+        for cluster, (start, end) in enumerate(self.ranges):
+            if self.rows >= self.sample_size or time() >= deadline:
+                return
+            self.ranges_read += 1
+            for chunk in read_range(cluster, start, end):
+                self.rows += len(chunk)
+                yield chunk
+
+    @property
+    def complete(self):
+        return self.ranges_read == len(self.ranges)
+
+
+def t_quantile(df):
+    """
+        Quantile of the Student's t distribution of the 95% confidence intervals
+    """
+    if df <= len(T_95):
+        return T_95[df - 1]
+    # Cornish-Fisher expansion around the normal quantile, exact to 4 decimals past the table
+    z = Z_95
+    return (z + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+def cluster_interval(totals, sizes, clusters, lower=None, upper=None):
+    """
+        Confidence interval of the ratio sum(totals) / sum(sizes) over a sample
+        of whole clusters out of `clusters`, given the total and size of each
+        cluster read. The variance is the between cluster variance of the
+        residuals of the ratio, with a t quantile of len(totals) - 1 degrees of
+        freedom, as rows of the same cluster are not independent.
+    """
+    n = len(totals)
+    size = fsum(sizes)
+    if size == 0:
+        return None, None
+    ratio = fsum(totals) / size
+    if n >= clusters:
+        # Every cluster was read, the ratio is exact
+        margin = 0.0
+    elif n < 2:
+        return None, None
+    else:
+        residuals = fsum((y - ratio * m) ** 2 for y, m in zip(totals, sizes)) / (n - 1)
+        margin = t_quantile(n - 1) * sqrt((1.0 - n / float(clusters)) * residuals / n) * n / size
+    low, high = ratio - margin, ratio + margin
+    if lower is not None:
+        low = max(low, lower)
+    if upper is not None:
+        high = min(high, upper)
+    return low, high
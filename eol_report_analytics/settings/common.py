@@ -7,3 +7,90 @@ def plugin_settings(settings):
     # Add app template path to the base list, so its included on mako lookups
     if hasattr(settings, 'MAKO_TEMPLATE_DIRS_BASE'):
         settings.MAKO_TEMPLATE_DIRS_BASE.append(template_path)
+
+    # How the analytics grade each answer: 'correct_map' uses the correctness stored in
+    # the student state, 'text' compares the rendered answer with the correct answer
+    settings.EOL_REPORT_ANALYTICS_GRADING_MODE = getattr(settings, 'EOL_REPORT_ANALYTICS_GRADING_MODE', 'correct_map')
+
+    # Student states read from the database per chunk while building a report
+    settings.EOL_REPORT_ANALYTICS_CHUNK_SIZE = getattr(settings, 'EOL_REPORT_ANALYTICS_CHUNK_SIZE', 1000)
+
+    # Size in bytes above which the report being written spills from memory to a temporary file
+    settings.EOL_REPORT_ANALYTICS_SPOOL_MAX_SIZE = getattr(settings, 'EOL_REPORT_ANALYTICS_SPOOL_MAX_SIZE', 5 * 1024 * 1024)
+
+    # Enrollment modes of the students included in the reports
+    settings.EOL_REPORT_ANALYTICS_ENROLLMENT_MODES = getattr(settings, 'EOL_REPORT_ANALYTICS_ENROLLMENT_MODES', ['honor'])
+
+    # Students whose indiv_id is requested per query while resolving the report rows
+    settings.EOL_REPORT_ANALYTICS_DIRECTORY_BATCH_SIZE = getattr(settings, 'EOL_REPORT_ANALYTICS_DIRECTORY_BATCH_SIZE', 500)
+
+    # Seconds the indiv_id of a student is kept in the django cache, 0 disables the cache
+    settings.EOL_REPORT_ANALYTICS_INDIV_ID_CACHE_TIMEOUT = getattr(settings, 'EOL_REPORT_ANALYTICS_INDIV_ID_CACHE_TIMEOUT', 0)
+
+    # Seconds a stored report is reused while its fingerprint does not change, None reuses it forever
+    settings.EOL_REPORT_ANALYTICS_FINGERPRINT_MAX_AGE = getattr(settings, 'EOL_REPORT_ANALYTICS_FINGERPRINT_MAX_AGE', 3600)
+
+    # Split the report in celery tasks by 'block' or by 'student' id range, None builds it in a single task
+    settings.EOL_REPORT_ANALYTICS_FANOUT_MODE = getattr(settings, 'EOL_REPORT_ANALYTICS_FANOUT_MODE', None)
+
+    # Number of celery tasks of a split report
+    settings.EOL_REPORT_ANALYTICS_FANOUT_PARTS = getattr(settings, 'EOL_REPORT_ANALYTICS_FANOUT_PARTS', 4)
+
+    # Keep per problem aggregates updated from the student states, the report summary is read from them
+    settings.EOL_REPORT_ANALYTICS_AGGREGATES = getattr(settings, 'EOL_REPORT_ANALYTICS_AGGREGATES', False)
+
+    # Store the computed rows of the problem reports and only compute again the student states modified since the last report
+    settings.EOL_REPORT_ANALYTICS_INCREMENTAL = getattr(settings, 'EOL_REPORT_ANALYTICS_INCREMENTAL', False)
+
+    # Seconds before the last incremental report whose modified states are computed again
+    settings.EOL_REPORT_ANALYTICS_INCREMENTAL_OVERLAP = getattr(settings, 'EOL_REPORT_ANALYTICS_INCREMENTAL_OVERLAP', 300)
+
+    # Student states sampled by the quick mode of the problem reports
+    settings.EOL_REPORT_ANALYTICS_QUICK_SAMPLE_SIZE = getattr(settings, 'EOL_REPORT_ANALYTICS_QUICK_SAMPLE_SIZE', 2000)
+
+    # Seconds after which the quick mode stops sampling and reports what it has read
+    settings.EOL_REPORT_ANALYTICS_QUICK_TIME_BUDGET = getattr(settings, 'EOL_REPORT_ANALYTICS_QUICK_TIME_BUDGET', 30)
+
+    # Publish the analytics of a problem graded from the correct_map before the per-student report
+    settings.EOL_REPORT_ANALYTICS_TWO_PHASE = getattr(settings, 'EOL_REPORT_ANALYTICS_TWO_PHASE', False)
+
+    # Seconds the dashboard waits between requests to the status endpoint while a task runs
+    settings.EOL_REPORT_ANALYTICS_STATUS_POLL_INTERVAL = getattr(settings, 'EOL_REPORT_ANALYTICS_STATUS_POLL_INTERVAL', 5)
+
+    # Seconds a status request with the last version read waits for a change of the progress
+    settings.EOL_REPORT_ANALYTICS_STATUS_MAX_WAIT = getattr(settings, 'EOL_REPORT_ANALYTICS_STATUS_MAX_WAIT', 3)
+
+    # Seconds the parsed problems are kept in the django cache, 0 keeps them only in the memory of each process
+    settings.EOL_REPORT_ANALYTICS_METADATA_CACHE_TIMEOUT = getattr(settings, 'EOL_REPORT_ANALYTICS_METADATA_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+
+    # Processes extracting the answers of a problem, 0 extracts them in the task process.
+    # Only used by the workers run with the solo or threads pool, the prefork workers
+    # are daemonic processes that cannot start processes and extract them serially
+    settings.EOL_REPORT_ANALYTICS_EXTRACTION_WORKERS = getattr(settings, 'EOL_REPORT_ANALYTICS_EXTRACTION_WORKERS', 0)
+
+    # Minimum student states sent to an extraction process per batch, each chunk is split
+    # in batches for every process and smaller chunks are extracted in the task process
+    settings.EOL_REPORT_ANALYTICS_EXTRACTION_BATCH_SIZE = getattr(settings, 'EOL_REPORT_ANALYTICS_EXTRACTION_BATCH_SIZE', 100)
+
+    # Read the student states and save the graded rows in their own threads while the chunks are graded
+    settings.EOL_REPORT_ANALYTICS_PIPELINE = getattr(settings, 'EOL_REPORT_ANALYTICS_PIPELINE', False)
+
+    # Chunks each queue of the pipeline holds before blocking its producer
+    settings.EOL_REPORT_ANALYTICS_PIPELINE_QUEUE_SIZE = getattr(settings, 'EOL_REPORT_ANALYTICS_PIPELINE_QUEUE_SIZE', 2)
+
+    # Time each phase of the reports, count the rows and publish them in the task progress
+    settings.EOL_REPORT_ANALYTICS_INSTRUMENTATION = getattr(settings, 'EOL_REPORT_ANALYTICS_INSTRUMENTATION', False)
+
+    # Minimum seconds between two publications of the metrics in the task progress
+    settings.EOL_REPORT_ANALYTICS_INSTRUMENTATION_INTERVAL = getattr(settings, 'EOL_REPORT_ANALYTICS_INSTRUMENTATION_INTERVAL', 10)
+
+    # statsd server receiving the metrics of each report, None does not send them
+    settings.EOL_REPORT_ANALYTICS_STATSD_HOST = getattr(settings, 'EOL_REPORT_ANALYTICS_STATSD_HOST', None)
+    settings.EOL_REPORT_ANALYTICS_STATSD_PORT = getattr(settings, 'EOL_REPORT_ANALYTICS_STATSD_PORT', 8125)
+    settings.EOL_REPORT_ANALYTICS_STATSD_PREFIX = getattr(settings, 'EOL_REPORT_ANALYTICS_STATSD_PREFIX', 'eol_report_analytics')
+
+    # Courses whose reports are always run under cProfile and tracemalloc
+    settings.EOL_REPORT_ANALYTICS_PROFILE_COURSES = getattr(settings, 'EOL_REPORT_ANALYTICS_PROFILE_COURSES', [])
+
+    # Lines and functions listed in the allocation summary of a profiled report
+    settings.EOL_REPORT_ANALYTICS_PROFILE_TOP = getattr(settings, 'EOL_REPORT_ANALYTICS_PROFILE_TOP', 25)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import logging
+
+# Installed packages (via pip)
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Edx dependencies
+from common.djangoapps.student.models import CourseEnrollment
+from lms.djangoapps.courseware.models import StudentModule
+
+# Internal project dependencies
+from .aggregates import update_enrollment_results, update_problem_aggregate
+from .views import get_aggregates_enabled
+
+logger = logging.getLogger(__name__)
+
+
+def queue_on_commit(update, key, user_id):
+    """
+        Queue the aggregate update of the student once the transaction of the
+        request commits, errors are logged and never reach the request
+    """
+    def send():
+        try:
+            update.delay(key, user_id)
+        except Exception:
+            logger.exception('EolReportAnalytics - Error queuing the aggregate update of {} user {}'.format(key, user_id))
+
+    try:
+        transaction.on_commit(send)
+    except Exception:
+        logger.exception('EolReportAnalytics - Error queuing the aggregate update of {} user {}'.format(key, user_id))
+
+
+def queue_problem_aggregate(instance):
+    if not get_aggregates_enabled() or instance.module_type != 'problem':
+        return
+    queue_on_commit(update_problem_aggregate, str(instance.module_state_key), instance.student_id)
+
+
+@receiver(post_save, sender=StudentModule)
+def student_module_saved(sender, instance, **kwargs):
+    """
+        Keep the problem aggregate up to date when a student answers
+    """
+    queue_problem_aggregate(instance)
+
+
+@receiver(post_delete, sender=StudentModule)
+def student_module_deleted(sender, instance, **kwargs):
+    queue_problem_aggregate(instance)
+
+
+@receiver(post_save, sender=CourseEnrollment)
+def enrollment_saved(sender, instance, **kwargs):
+    """
+        Count or drop the results of the student when the enrollment or its mode changes
+    """
+    if not get_aggregates_enabled():
+        return
+    queue_on_commit(update_enrollment_results, str(instance.course_id), instance.user_id)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import pickle
+from heapq import merge
+from operator import itemgetter
+from tempfile import TemporaryFile
+
+
+class SortedRows(object):
+    """
+        Rows that arrive in chunks with any order and must be written sorted by
+        their first column. Each chunk is sorted and saved as a run in a temporary
+        file, the runs are merged when the rows are written, so only one row per
+        run is in memory at a time.
+    """
+    def __init__(self):
+        self.runs = []
+        self.pending = []
+
+    def add_chunk(self, rows):
+        if self.pending:
+            self.runs.append(self._save_run(self.pending))
+        self.pending = sorted(rows, key=itemgetter(0))
+
+    def _save_run(self, rows):
+        run = TemporaryFile()
+        for row in rows:
+            pickle.dump(row, run, pickle.HIGHEST_PROTOCOL)
+        run.seek(0)
+        return run
+
+    def _read_run(self, run):
+        try:
+            while True:
+                yield pickle.load(run)
+        except EOFError:
+            run.close()
+
+    def __iter__(self):
+        # The last chunk is merged from memory, a single chunk never touches the disk
+        runs = [self._read_run(run) for run in self.runs]
+        runs.append(iter(self.pending))
+        self.runs = []
+        self.pending = []
+        return merge(*runs, key=itemgetter(0))
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -- coding: utf-8 --
+
+# Python Standard Libraries
+import json
+
+# Installed packages (via pip)
+try:
+    # Faster json backend, used when it is installed
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+class StudentState(object):
+    """
+        StudentModule state decoded once, every stage of the report reads from here
+    """
+    __slots__ = (
+        'username',
+        'state_id',
+        'user_id',
+        'email',
+        'attempts',
+        'score_earned',
+        'score_possible',
+        'seed',
+        'student_answers',
+        'correct_map',
+        'input_keys',
+    )
+
+    def __init__(self, username, attempts=None, score_earned=None, score_possible=None, seed=None,
+                 student_answers=None, correct_map=None, input_keys=None, user_id=None, email=None, state_id=None):
+        self.username = username
+        self.state_id = state_id
+        self.user_id = user_id
+        self.email = email
+        self.attempts = attempts
+        self.score_earned = score_earned
+        self.score_possible = score_possible
+        self.seed = seed
+        self.student_answers = student_answers
+        self.correct_map = correct_map
+        self.input_keys = input_keys
+
+    @property
+    def has_attempts(self):
+        return self.attempts is not None
+
+
+def decode_state(username, state, user_id=None, email=None, state_id=None):
+    """
+        Parse the StudentModule state json of a student
+    """
+    raw_state = json_loads(state) if state else {}
+    score = raw_state.get('score') or {}
+    input_state = raw_state.get('input_state')
+    return StudentState(
+        username,
+        attempts=raw_state.get('attempts'),
+        score_earned=score.get('raw_earned'),
+        score_possible=score.get('raw_possible'),
+        seed=raw_state.get('seed'),
+        student_answers=raw_state.get('student_answers'),
+        correct_map=raw_state.get('correct_map'),
+        input_keys=list(input_state.keys()) if input_state is not None else None,
+        user_id=user_id,
+        email=email,
+        state_id=state_id,
+    )
+
+
+def get_answer_ids(state):
+    """
+        Answer ids of the student answers, without the MathML copies of formulae
+    """
+    return [x for x in (state.student_answers or {}) if not x.endswith('_dynamath')]
+
+
+def grade_correct_map(state, answer_ids=None):
+    """
+        Split the answer ids in correct and incorrect using the correct_map
+        of the state, without rendering any text.
+        Return None if the correct_map does not grade every answer id.
+    """
+    correct_map = state.correct_map
+    if not correct_map:
+        return None
+    if answer_ids is None:
+        answer_ids = get_answer_ids(state)
+    correct = []
+    incorrect = []
+    for answer_id in answer_ids:
+        if answer_id not in correct_map:
+            return None
+        if correct_map[answer_id].get('correctness') == 'correct':
+            correct.append(answer_id)
+        else:
+            incorrect.append(answer_id)
+    return correct, incorrect
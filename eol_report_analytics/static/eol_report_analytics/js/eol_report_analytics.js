@@ -43,12 +43,62 @@ function generate_analytics_report(input){
               }
               else{
                   success_div.textContent = data.status;
+                  if (data.report_url) {
+                      var report_link = document.createElement('a');
+                      report_link.href = data.report_url;
+                      report_link.textContent = ' Descargar';
+                      success_div.appendChild(report_link);
+                  }
                   success_div.style.display = 'block';
                   warning_div.style.display = 'none';
                   error_div.style.display = 'none';
+                  if (data.task_id && input.dataset.statusEndpoint) {
+                      poll_analytics_report(input.dataset.statusEndpoint, data.task_id);
+                  }
               }
           }
           return true
       }
   });}
-}
\ No newline at end of file
+}
+
+function poll_analytics_report(url, task_id, version){
+  var success_div = document.getElementById('eol_report_analytics-success-msg');
+  var error_div = document.getElementById('eol_report_analytics-error-msg');
+  return $.ajax({
+      type: 'GET',
+      dataType: 'json',
+      url: url,
+      data: {'task_id': task_id, 'version': version},
+      error: function(error) {
+          // The report keeps running, the polling is retried later
+          setTimeout(function(){ poll_analytics_report(url, task_id, version); }, 5000);
+          return true
+      },
+      success: function(data) {
+          if (data.error) {
+              return true
+          }
+          if (data.state == 'SUCCESS') {
+              success_div.textContent = 'La analitica de preguntas esta disponible.';
+              if (data.report_url) {
+                  var report_link = document.createElement('a');
+                  report_link.href = data.report_url;
+                  report_link.textContent = ' Descargar';
+                  success_div.appendChild(report_link);
+              }
+          }
+          else if (data.state == 'FAILURE') {
+              error_div.textContent = 'Error en generar reporte de problemas. Por favor actualice la página e intente de nuevo.';
+              error_div.style.display = 'block';
+              success_div.style.display = 'none';
+          }
+          else {
+              // The server waits a few seconds for a change of the version it is sent,
+              // then it tells how long to wait for the next request
+              setTimeout(function(){ poll_analytics_report(url, task_id, data.version); }, (data.retry_after || 5) * 1000);
+          }
+          return true
+      }
+  });
+}
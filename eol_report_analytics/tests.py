@@ -1,13 +1,21 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 # Python Standard Libraries
-from collections import defaultdict
+from collections import Counter, defaultdict
+from datetime import datetime
+import csv
+from statistics import mean, pstdev
 import json
+import random
 
 # Installed packages (via pip)
-from django.test import Client
+import six
+from django.core.management import call_command
+from django.test import Client, override_settings
 from django.urls import reverse
+from django.utils import translation
 from mock import patch, Mock
+from pytz import UTC
 
 # Edx dependencies
 from common.djangoapps.student.models import CourseEnrollment
@@ -16,12 +24,97 @@ from common.djangoapps.student.roles import CourseInstructorRole
 from lms.djangoapps.courseware.models import StudentModule
 from opaque_keys.edx.keys import UsageKey
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
-from xmodule.modulestore.tests.factories import CourseFactory
-from lms.djangoapps.instructor_task.models import ReportStore
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+from lms.djangoapps.instructor_task.api_helper import AlreadyRunningError
+from lms.djangoapps.instructor_task.models import InstructorTask, ReportStore
 
 # Internal project dependencies
-from .views import EolReportAnalyticsView, generate
+from . import psychometrics
+from .aggregates import rebuild_aggregate
+from .analytics import ProblemAnalytics
+from .extractors import AnswerExtractor
+from .metadata import get_answer_extractor, local_cache
+from .models import ProblemAggregate, ReportFingerprint, ReportRow, ReportWatermark
+from .pipeline import Pipeline
+from .progress import STATE_FAILURE, STATE_PROGRESS, STATE_QUEUED, STATE_SUCCESS, ProgressRecord, get_progress, wait_progress
+from .quartiles import QuartileTracker
+from .sampling import cluster_interval, get_primary_key_ranges
+from .sorted_rows import SortedRows
+from .states import decode_state
+from .views import EncodedWriter, EolReportAnalyticsView, ProblemTemplate, StudentDirectory, fail_report_parts, generate, get_running_task_id, get_task_key, process_data
+
+PROBLEM_XML = '''<problem>
+<multiplechoiceresponse>
+<label>question_text_1</label>
+<choicegroup type="MultipleChoice">
+<choice correct="false">wrong_answer_text_1</choice>
+<choice correct="true">correct_answer_text_1</choice>
+</choicegroup>
+</multiplechoiceresponse>
+<p>question_text_2</p>
+<choiceresponse>
+<checkboxgroup>
+<choice correct="true">correct_answer_text_2</choice>
+<choice correct="false">wrong_answer_text_2</choice>
+<choice correct="true">correct_answer_text_3</choice>
+</checkboxgroup>
+</choiceresponse>
+<optionresponse><optioninput options="('a','b')" correct="b"/></optionresponse>
+<stringresponse answer="Chile" type="ci"><textline/></stringresponse>
+<numericalresponse answer="5"><formulaequationinput/></numericalresponse>
+</problem>'''
+
+
+def _sort_based_discriminatory_index(students, quartile, answered):
+    """
+        Previous implementation of the quartiles, re-sorting the lists after
+        every student. Kept as reference for the regression test.
+    """
+    best_quartile = defaultdict(list)
+    best_quartile_list = []
+    worst_quartile = defaultdict(list)
+    worst_quartile_list = []
+    for score, correct in students:
+        if len(best_quartile_list) < quartile:
+            best_quartile_list.append(score)
+            best_quartile[score].append(correct)
+        elif quartile != 0 and best_quartile_list[0] < score:
+            if len(best_quartile[best_quartile_list[0]]) > 1:
+                best_quartile[best_quartile_list[0]].pop()
+            else:
+                best_quartile.pop(best_quartile_list[0])
+            best_quartile_list[0] = score
+            best_quartile[score].append(correct)
+        best_quartile_list.sort()
+        if len(worst_quartile_list) < quartile:
+            worst_quartile_list.append(score)
+            worst_quartile[score].append(correct)
+        elif quartile != 0 and worst_quartile_list[-1] > score:
+            if len(worst_quartile[worst_quartile_list[-1]]) > 1:
+                worst_quartile[worst_quartile_list[-1]].pop()
+            else:
+                worst_quartile.pop(worst_quartile_list[-1])
+            worst_quartile_list[-1] = score
+            worst_quartile[score].append(correct)
+        worst_quartile_list.sort()
+    if quartile != int(answered / 4):
+        q = int(answered / 4)
+        for x in range(quartile - q):
+            if len(best_quartile[best_quartile_list[x]]) > 1:
+                best_quartile[best_quartile_list[x]].pop()
+            else:
+                best_quartile.pop(best_quartile_list[x])
+            y = x + q
+            if len(worst_quartile[worst_quartile_list[y]]) > 1:
+                worst_quartile[worst_quartile_list[y]].pop()
+            else:
+                worst_quartile.pop(worst_quartile_list[y])
+    best = Counter(x for xs in best_quartile.values() for xq in xs for x in xq)
+    worst = Counter(x for xs in worst_quartile.values() for xq in xs for x in xq)
+    return best, worst
+
 
 class TestEolReportAnalyticsView(ModuleStoreTestCase):
     def setUp(self):
@@ -478,80 +571,1104 @@ class TestEolReportAnalyticsView(ModuleStoreTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(r['status'], 'La analitica de preguntas esta siendo creado, en un momento estará disponible para descargar.')
     
-    def test_order_best_quartile(self):
+    def test_quartile_tracker(self):
         """
-            test order_best_quartile
+            test QuartileTracker keep the best and worst quartile
         """
         scores = [1,1,1,1,1,1,0.75,1,0.75,1,0.75,1,1,1,1,1,1,1,1,1,1,0.75,1,1,1,1,1,1,1,1,1,1,1,1,0.75,0.75,1,0.5,1,1,1,0.25,1,1,1,1,1,1,0.75,0.75,1,1,1,0.75,1,1,1,0.75,1,1,1,1,0.75]
-        quartile = int(len(scores) / 4)
-        best_quartile = defaultdict(list)
-        best_quartile_list = []
+        quartiles = QuartileTracker(int(len(scores) / 4))
         for x in scores:
-            aux_analytics = {'score': x, 'correct': ['a{}'.format(x)]}
-            best_quartile, best_quartile_list = EolReportAnalyticsView().order_best_quartile(best_quartile, best_quartile_list, quartile, aux_analytics)
-        expected_best_quartile = defaultdict(list)
-        expected_best_quartile[1] = [['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1'],['a1']]
-        self.assertEqual(best_quartile, expected_best_quartile)
-        self.assertEqual(best_quartile_list, [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1])
+            quartiles.add(x, ['a{}'.format(x)])
+        self.assertEqual(sorted(x[0] for x in quartiles.best), [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1])
+        self.assertEqual(sorted(-x[0] for x in quartiles.worst), [0.25,0.5,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,1,1])
+        best, worst = quartiles.get_discriminatory_index(len(scores))
+        self.assertEqual(best, Counter({'a1': 15}))
+        self.assertEqual(worst, Counter({'a1': 2, 'a0.75': 11, 'a0.5': 1, 'a0.25': 1}))
 
-    def test_order_worst_quartile(self):
+    def test_get_discriminatory_index_diff_quartile(self):
         """
-            test order_worst_quartile
+            test get_discriminatory_index when fewer students answered than the quartile size
         """
-        scores = [1,1,1,1,1,1,0.75,1,0.75,1,0.75,1,1,1,1,1,1,1,1,1,1,0.75,1,1,1,1,1,1,1,1,1,1,1,1,0.75,0.75,1,0.5,1,1,1,0.25,1,1,1,1,1,1,0.75,0.75,1,1,1,0.75,1,1,1,0.75,1,1,1,1,0.75]
-        quartile = int(len(scores) / 4)
-        worst_quartile = defaultdict(list)
-        worst_quartile_list = []
+        scores = [1,1,1,1,1,1,0.75,1,0.75,1,0.75,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,0.75,1,1,1,1,1,1,1,1,1,1,1,1,0.75,0.75,1,0.5,1,1,1,0.25,1,1,1,1,1,1,0.75,0.75,1,1,1,0.75,1,1,1,0.75,1,1,1,1,0.75]
+        answered = 63
+        quartiles = QuartileTracker(int(len(scores) / 4))
         for x in scores:
-            aux_analytics = {'score': x, 'correct': ['a{}'.format(x)]}
-            worst_quartile, worst_quartile_list = EolReportAnalyticsView().order_worst_quartile(worst_quartile, worst_quartile_list, quartile, aux_analytics)
-        expected_worst_quartile = defaultdict(list)
-        expected_worst_quartile[1] = [['a1'],['a1']]
-        expected_worst_quartile[0.75] = [['a0.75'],['a0.75'],['a0.75'],['a0.75'],['a0.75'],['a0.75'],['a0.75'],['a0.75'],['a0.75'],['a0.75'],['a0.75']]
-        expected_worst_quartile[0.5] = [['a0.5']]
-        expected_worst_quartile[0.25] = [['a0.25']]
-        self.assertEqual(worst_quartile, expected_worst_quartile)
-        self.assertEqual(worst_quartile_list, [0.25,0.5,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,1,1])
-    
-    def test_get_discriminatory_index(self):
+            quartiles.add(x, ['a{}'.format(x)])
+        best, worst = quartiles.get_discriminatory_index(answered)
+        self.assertEqual(sum(best.values()), int(answered / 4))
+        self.assertEqual(sum(worst.values()), int(answered / 4))
+        self.assertEqual(best, Counter({'a1': 15}))
+        self.assertEqual(worst, Counter({'a1': 2, 'a0.75': 11, 'a0.5': 1, 'a0.25': 1}))
+
+    def test_quartile_tracker_regression(self):
         """
-            test get_discriminatory_index
+            test QuartileTracker give the same discrimination numbers as the previous
+            sort based implementation, including ties and a trimmed quartile
         """
-        scores = [1,1,1,1,1,1,0.75,1,0.75,1,0.75,1,1,1,1,1,1,1,1,1,1,0.75,1,1,1,1,1,1,1,1,1,1,1,1,0.75,0.75,1,0.5,1,1,1,0.25,1,1,1,1,1,1,0.75,0.75,1,1,1,0.75,1,1,1,0.75,1,1,1,1,0.75]
-        quartile = int(len(scores) / 4)
-        best_quartile = defaultdict(list)
-        best_quartile[1] = [['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d']]
-        worst_quartile = defaultdict(list)
-        worst_quartile[1] = [['a','b','c','d'],['a','b','c','d']]
-        worst_quartile[0.75] = [['b','c','d'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c']]
-        worst_quartile[0.5] = [['b','c']]
-        worst_quartile[0.25] = [['c']]
-        best_quartile_list = [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
-        worst_quartile_list = [0.25,0.5,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,1,1]
-        best, worst = EolReportAnalyticsView().get_discriminatory_index(best_quartile, best_quartile_list, worst_quartile, worst_quartile_list, quartile, len(scores))
-        self.assertEqual((best.get('a', 0) - worst.get('a', 0)) / int(len(scores)/4), (15-12)/int(63/4))
-        self.assertEqual((best.get('b', 0) - worst.get('b', 0)) / int(len(scores)/4), (15-14)/int(63/4))
-        self.assertEqual((best.get('c', 0) - worst.get('c', 0)) / int(len(scores)/4), (15-15)/int(63/4))
-        self.assertEqual((best.get('d', 0) - worst.get('d', 0)) / int(len(scores)/4), (15-3)/int(63/4))
-    
-    def test_get_discriminatory_index_diff_quartile(self):
+        rand = random.Random(42)
+        questions = ['a', 'b', 'c', 'd']
+        for n_students in [0, 3, 4, 7, 50, 203, 1000]:
+            students = []
+            for x in range(n_students):
+                correct = [q for q in questions if rand.random() < 0.6]
+                students.append((rand.choice([0, 0.25, 0.5, 0.75, 1]), correct))
+            for answered in set([n_students, int(n_students * 0.8)]):
+                quartile = int(n_students / 4)
+                quartiles = QuartileTracker(quartile)
+                for score, correct in students[:answered]:
+                    quartiles.add(score, correct)
+                expected = _sort_based_discriminatory_index(students[:answered], quartile, answered)
+                self.assertEqual(quartiles.get_discriminatory_index(answered), expected)
+
+    @patch("eol_report_analytics.views.LoncapaSystem")
+    @patch("eol_report_analytics.views.LoncapaProblem")
+    def test_generate_report_data_parse_once_per_seed(self, lcp_mock, system_mock):
         """
-            test get_discriminatory_index
+            test generate_report_data build only one LoncapaProblem per distinct seed
         """
-        scores = [1,1,1,1,1,1,0.75,1,0.75,1,0.75,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,0.75,1,1,1,1,1,1,1,1,1,1,1,1,0.75,0.75,1,0.5,1,1,1,0.25,1,1,1,1,1,1,0.75,0.75,1,1,1,0.75,1,1,1,0.75,1,1,1,1,0.75]
-        quartile = int(len(scores) / 4)
-        answered = 63
-        best_quartile = defaultdict(list)
-        best_quartile[1] = [['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d']]
-        worst_quartile = defaultdict(list)
-        worst_quartile[1] = [['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d'],['a','b','c','d']]
-        worst_quartile[0.75] = [['b','c','d'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c'],['a','b','c']]
-        worst_quartile[0.5] = [['b','c']]
-        worst_quartile[0.25] = [['c']]
-        best_quartile_list = [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1]
-        worst_quartile_list = [0.25,0.5,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,0.75,1,1,1,1,1]
-        best, worst = EolReportAnalyticsView().get_discriminatory_index(best_quartile, best_quartile_list, worst_quartile, worst_quartile_list, quartile, 63)
-        self.assertEqual((best.get('a', 0) - worst.get('a', 0)) / int(answered/4), (15-12)/int(answered/4))
-        self.assertEqual((best.get('b', 0) - worst.get('b', 0)) / int(answered/4), (15-14)/int(answered/4))
-        self.assertEqual((best.get('c', 0) - worst.get('c', 0)) / int(answered/4), (15-15)/int(answered/4))
-        self.assertEqual((best.get('d', 0) - worst.get('d', 0)) / int(answered/4), (15-3)/int(answered/4))
+        lcp_mock.return_value.find_question_label.return_value = 'question_text_1'
+        lcp_mock.return_value.find_correct_answer_text.return_value = 'correct_answer_text_1'
+        lcp_mock.return_value.find_answer_text.return_value = 'answer_text_1'
+        lcp_mock.return_value.responders = {}
+        block = Mock(category='problem', data='<problem><customresponse/></problem>', rerandomize='always')
+        user_states = [
+            decode_state('student{}'.format(x), json.dumps({'seed': x % 2, 'student_answers': {'answer_id_1': 'choice_0'}}))
+            for x in range(6)
+        ]
+        report = list(EolReportAnalyticsView().generate_report_data(user_states, block))
+        self.assertEqual(len(report), 6)
+        self.assertEqual(report[0], ('student0', {'Answer ID': 'answer_id_1', 'Question': 'question_text_1', 'Answer': 'answer_text_1', 'Choices': [['choice_0', 'answer_text_1']], 'Correct Answer': 'correct_answer_text_1'}))
+        self.assertEqual(lcp_mock.call_count, 2)
+        self.assertEqual(lcp_mock.return_value.find_question_label.call_count, 2)
+        self.assertEqual(lcp_mock.return_value.find_answer_text.call_count, 6)
+
+        # Non randomized problems share a single parsed problem
+        lcp_mock.reset_mock()
+        block.rerandomize = 'never'
+        report = list(EolReportAnalyticsView().generate_report_data(user_states, block))
+        self.assertEqual(len(report), 6)
+        self.assertEqual(lcp_mock.call_count, 1)
+
+    def test_answer_extractor(self):
+        """
+            test AnswerExtractor pre-parse the common response types
+        """
+        extractor = AnswerExtractor.from_problem(PROBLEM_XML, 'problem_id')
+        self.assertEqual(list(extractor.entries.keys()), ['problem_id_2_1', 'problem_id_3_1', 'problem_id_4_1', 'problem_id_5_1', 'problem_id_6_1'])
+        self.assertEqual(extractor.get_answer_info('problem_id_2_1'), ('question_text_1', 'correct_answer_text_1'))
+        self.assertEqual(extractor.get_answer_info('problem_id_3_1'), ('question_text_2', 'correct_answer_text_2, correct_answer_text_3'))
+        self.assertEqual(extractor.get_answer_info('problem_id_4_1'), ('Question 3', 'b'))
+        # capa renders no correct answer text for text inputs
+        self.assertEqual(extractor.get_answer_info('problem_id_5_1'), ('Question 4', ''))
+        self.assertEqual(extractor.get_answer_info('problem_id_6_1'), ('Question 5', ''))
+        self.assertEqual(extractor.find_answer_text('problem_id_2_1', 'choice_0'), 'wrong_answer_text_1')
+        self.assertEqual(extractor.find_answer_text('problem_id_3_1', ['choice_1', 'choice_2']), 'wrong_answer_text_2, correct_answer_text_3')
+        self.assertEqual(extractor.find_answer_text('problem_id_5_1', 'chile'), 'chile')
+        self.assertEqual(extractor.get_correct_choices('problem_id_2_1'), ['choice_1'])
+        self.assertEqual(extractor.get_correct_choices('problem_id_3_1'), ['choice_0', 'choice_2'])
+        self.assertIsNone(extractor.get_correct_choices('problem_id_4_1'))
+        self.assertIsNone(AnswerExtractor.from_problem('<problem><customresponse/></problem>', 'problem_id'))
+        self.assertIsNone(AnswerExtractor.from_problem('<problem><script>x = 1</script></problem>', 'problem_id'))
+
+    def test_answer_extractor_matches_capa(self):
+        """
+            test the lightweight extractor renders the same questions, correct answers and answers as capa
+        """
+        problem = ItemFactory.create(parent_location=self.course.location, category='problem', display_name='problem_1', data=PROBLEM_XML)
+        block = modulestore().get_item(problem.location)
+        view = EolReportAnalyticsView()
+        i18n = block.runtime.service(block, "i18n")
+        template = ProblemTemplate(block, view.get_capa_system(block, i18n), 1)
+        extractor = AnswerExtractor.from_problem(block.data, block.location.html_id(), i18n.gettext)
+        answers = [
+            ('2_1', 'choice_0'),
+            ('3_1', ['choice_1', 'choice_2']),
+            ('4_1', 'a'),
+            ('5_1', 'chile'),
+            ('6_1', '5'),
+        ]
+        for suffix, answer in answers:
+            answer_id = '{}_{}'.format(block.location.html_id(), suffix)
+            self.assertEqual(extractor.get_answer_info(answer_id), template.get_answer_info(answer_id))
+            self.assertEqual(extractor.find_answer_text(answer_id, answer), template.find_answer_text(answer_id, answer))
+        for suffix in ['2_1', '3_1']:
+            answer_id = '{}_{}'.format(block.location.html_id(), suffix)
+            self.assertEqual(sorted(extractor.get_correct_choices(answer_id)), sorted(template.get_correct_choices(answer_id)))
+
+    @patch("eol_report_analytics.views.LoncapaProblem")
+    def test_generate_report_data_fast_extractor(self, lcp_mock):
+        """
+            test generate_report_data use the lightweight extractor without building a LoncapaProblem
+        """
+        block = Mock(category='problem', data=PROBLEM_XML, rerandomize='always')
+        block.location.html_id.return_value = 'problem_id'
+        block.runtime.service.return_value.gettext.side_effect = lambda text: text
+        user_states = [decode_state('student', json.dumps({'seed': 3, 'student_answers': {'problem_id_2_1': 'choice_1', 'problem_id_4_1': 'a'}}))]
+        report = list(EolReportAnalyticsView().generate_report_data(user_states, block))
+        self.assertEqual(report, [
+            ('student', {'Answer ID': 'problem_id_2_1', 'Question': 'question_text_1', 'Answer': 'correct_answer_text_1', 'Choices': [['choice_1', 'correct_answer_text_1']], 'Correct Choices': ['choice_1'], 'Correct Answer': 'correct_answer_text_1'}),
+            ('student', {'Answer ID': 'problem_id_4_1', 'Question': 'Question 3', 'Answer': 'a', 'Correct Answer': 'b'}),
+        ])
+        lcp_mock.assert_not_called()
+
+    def test_decode_state(self):
+        """
+            test decode_state parse the StudentModule state into a StudentState
+        """
+        state = decode_state('student', '{"score": {"raw_earned": 1, "raw_possible": 3}, "seed": 1, "attempts": 2, "input_state": {"answer_id_1": {}, "answer_id_2": {}}, "correct_map": {"answer_id_1": {"correctness": "correct"}}}')
+        self.assertEqual(state.username, 'student')
+        self.assertEqual(state.attempts, 2)
+        self.assertEqual(state.score_earned, 1)
+        self.assertEqual(state.score_possible, 3)
+        self.assertEqual(state.seed, 1)
+        self.assertEqual(state.input_keys, ['answer_id_1', 'answer_id_2'])
+        self.assertEqual(state.correct_map, {'answer_id_1': {'correctness': 'correct'}})
+        self.assertIsNone(state.student_answers)
+        self.assertTrue(state.has_attempts)
+        self.assertFalse(decode_state('student', '{}').has_attempts)
+
+    def test_set_data_grading_correct_map(self):
+        """
+            test set_data grade the answers with the correct_map of the state
+        """
+        students = {'student': {'email': 'student@edx.org', 'indiv_id': ''}}
+        response = decode_state('student', json.dumps({
+            "score": {"raw_earned": 2, "raw_possible": 2}, "attempts": 1,
+            "input_state": {"answer_id_1": {}, "answer_id_2": {}},
+            "correct_map": {"answer_id_1": {"correctness": "correct"}, "answer_id_2": {"correctness": "correct"}}}))
+        user_states = [
+            {"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": '5.01', "Correct Answer": '5'},
+            {"Answer ID": 'answer_id_2', "Question": 'question_text_2', "Answer": 'b', "Correct Answer": 'a, b'},
+        ]
+        responses, aux_analytics = EolReportAnalyticsView().set_data(response, students, user_states, ['answer_id_1', 'answer_id_2'])
+        self.assertEqual(responses, ['student', 'student@edx.org', '', 1, '5.01', 'b', 2, 2, '1,0'])
+        self.assertEqual(aux_analytics['correct'], ['answer_id_1', 'answer_id_2'])
+        self.assertEqual(aux_analytics['incorrect'], [])
+        with override_settings(EOL_REPORT_ANALYTICS_GRADING_MODE='text'):
+            responses, aux_analytics = EolReportAnalyticsView().set_data(response, students, user_states, ['answer_id_1', 'answer_id_2'])
+        self.assertEqual(aux_analytics['correct'], [])
+        self.assertEqual(aux_analytics['incorrect'], ['answer_id_1', 'answer_id_2'])
+        self.assertIsNone(EolReportAnalyticsView().grade_state(response, ['answer_id_1', 'answer_id_3']))
+
+    def test_get_all_states_chunks(self):
+        """
+            test get_all_states read the enrolled student states in chunks of primary key order
+        """
+        usage_key = UsageKey.from_string(self.block_id)
+        for user in [self.student2, self.student, self.user_instructor]:
+            StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=user,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state='{"attempts": 1}')
+        # The instructor is not enrolled, so its state is filtered out by the query
+        with self.assertNumQueries(3):
+            chunks = list(EolReportAnalyticsView().get_all_states(self.block_id, chunk_size=1))
+        self.assertEqual([[x.username for x in chunk] for chunk in chunks], [['student2'], ['student']])
+        self.assertEqual(EolReportAnalyticsView().count_states(self.block_id), 2)
+        with override_settings(EOL_REPORT_ANALYTICS_ENROLLMENT_MODES=['honor', 'audit']):
+            CourseEnrollmentFactory(user=self.user_instructor, course_id=self.course.id, mode='audit')
+            self.assertEqual(EolReportAnalyticsView().count_states(self.block_id), 3)
+
+    def test_problem_analytics_moments(self):
+        """
+            test ProblemAnalytics mean and standard deviation match the statistics module
+        """
+        rand = random.Random(7)
+        scores = [rand.randint(0, 7) / 7 for x in range(500)]
+        analytics = ProblemAnalytics(int(len(scores) / 4))
+        for x in scores:
+            analytics.add(x, [], [])
+        self.assertEqual(analytics.users, 500)
+        self.assertEqual(analytics.mean(), mean(scores))
+        self.assertAlmostEqual(analytics.pstdev(), pstdev(scores), places=12)
+
+    def test_sorted_rows(self):
+        """
+            test SortedRows write chunks of rows in username order
+        """
+        rows = SortedRows()
+        rows.add_chunk([['student3', 1], ['student1', 2]])
+        rows.add_chunk([['student4', 3], ['student2', 4]])
+        rows.add_chunk([['student0', 5]])
+        self.assertEqual(list(rows), [['student0', 5], ['student1', 2], ['student2', 4], ['student3', 1], ['student4', 3]])
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    def test_student_directory(self, id_list):
+        """
+            test StudentDirectory count the enrolled students and resolve indiv_ids in batches
+        """
+        id_list.side_effect = lambda user_ids: [(x, '09472337K') for x in user_ids if x == self.student.id]
+        students = StudentDirectory(self.course.id)
+        self.assertEqual(students.count(), 2)
+        states = [
+            decode_state('student', '{}', self.student.id, self.student.email),
+            decode_state('student2', '{}', self.student2.id, self.student2.email)]
+        with override_settings(EOL_REPORT_ANALYTICS_DIRECTORY_BATCH_SIZE=1):
+            resolved = students.resolve(states)
+        self.assertEqual(id_list.call_count, 2)
+        self.assertEqual(resolved, {
+            'student': {'email': self.student.email, 'indiv_id': '09472337K'},
+            'student2': {'email': self.student2.email, 'indiv_id': ''}})
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_eol_report_analytics_course_report(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test the course report write a section per problem and the summary table
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": 'answer_text_1', "Correct Answer": 'answer_text_1'}]
+            for x in user_states}
+        chapter = ItemFactory.create(parent_location=self.course.location, category='chapter', display_name='chapter')
+        sequential = ItemFactory.create(parent_location=chapter.location, category='sequential', display_name='sequential')
+        vertical = ItemFactory.create(parent_location=sequential.location, category='vertical', display_name='vertical')
+        problem1 = ItemFactory.create(parent_location=vertical.location, category='problem', display_name='problem_1')
+        problem2 = ItemFactory.create(parent_location=vertical.location, category='problem', display_name='problem_2')
+        for user in [self.student, self.student2]:
+            StudentModule.objects.create(
+                module_state_key=problem1.location,
+                student=user,
+                course_id=self.course.id,
+                module_type='problem',
+                state='{"score": {"raw_earned": 1, "raw_possible": 2}, "attempts": 1, "input_state": {"answer_id_1": 1}}')
+        data = {'block': str(self.course.location), 'course': str(self.course.id), 'base_url':'this_is_a_url'}
+        task_input = {'data': data }
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            result = generate(
+                None, None, self.course.id,
+                task_input, 'Eol_Report_Analytics'
+            )
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        expected_data = [
+            ';'.join(['Problema 1', 'problem_1', str(problem1.location)]),
+            ';'.join([self.student.username, self.student.email, '', '1', 'answer_text_1', '1', '2', '0,5']),
+            ';'.join([self.student2.username, self.student2.email, '', '1', 'answer_text_1', '1', '2', '0,5']),
+            'Problema;Nombre;Bloque;Preguntas;Cuantos contestaron;% contestaron;Promedio;Desviacion estandar',
+            ';'.join(['Problema 1', 'problem_1', str(problem1.location), '1', '2', '1,0', '0,5', '0,0']),
+            ';'.join(['Problema 2', 'problem_2', str(problem2.location), '0', '0', '0', '', '']),
+            ]
+        self._verify_csv_file_report(report_store, expected_data)
+        self.assertTrue(EolReportAnalyticsView().validate_block(str(sequential.location)))
+
+    def test_problem_analytics_merge(self):
+        """
+            test ProblemAnalytics merged from serialized parts match the analytics of all the students
+        """
+        rand = random.Random(11)
+        students = [(rand.randint(0, 5) / 5, ['q{}'.format(x) for x in range(3) if rand.random() < 0.5], 'user{}'.format(i)) for i in range(200)]
+        quartile_size = int(len(students) / 4)
+        expected = ProblemAnalytics(quartile_size)
+        parts = [ProblemAnalytics(quartile_size) for x in range(3)]
+        for i, (score, correct, username) in enumerate(students):
+            expected.add(score, correct, [], username)
+            parts[i % 3].add(score, correct, [], username)
+        merged = ProblemAnalytics.from_dict(json.loads(json.dumps(parts[0].to_dict())))
+        for part in parts[1:]:
+            merged.merge(ProblemAnalytics.from_dict(json.loads(json.dumps(part.to_dict()))))
+        self.assertEqual(merged.users, expected.users)
+        self.assertEqual(merged.correct, expected.correct)
+        self.assertEqual(merged.mean(), expected.mean())
+        self.assertEqual(merged.pstdev(), expected.pstdev())
+        self.assertEqual(merged.get_discriminatory_index(), expected.get_discriminatory_index())
+
+    def test_problem_analytics_distractors(self):
+        """
+            test the answer counts by question, in total and by quartile, and that they merge
+        """
+        students = [
+            (1.0, ['q1'], {'q1': 'b', 'q2': 'text 1'}, 'user1'),
+            (1.0, ['q1'], {'q1': 'b', 'q2': 'text 2'}, 'user2'),
+            (0.5, ['q1'], {'q1': 'b', 'q2': 'text 3'}, 'user3'),
+            (0.0, [], {'q1': 'a', 'q2': 'text 4'}, 'user4'),
+            (0.0, [], {'q1': 'c', 'q2': 'text 5'}, 'user5'),
+            (0.5, ['q1'], {'q1': 'b', 'q2': 'text 6'}, 'user6'),
+            (0.0, [], {'q1': 'a', 'q2': 'text 7'}, 'user7'),
+            (1.0, ['q1'], {'q1': 'b', 'q2': 'text 8'}, 'user8'),
+        ]
+        expected = ProblemAnalytics(2)
+        parts = [ProblemAnalytics(2), ProblemAnalytics(2)]
+        with patch('eol_report_analytics.analytics.MAX_OPTIONS', 5):
+            for i, (score, correct, answers, username) in enumerate(students):
+                expected.add(score, correct, [], username, answers)
+                parts[i % 2].add(score, correct, [], username, answers)
+            merged = ProblemAnalytics.from_dict(json.loads(json.dumps(parts[0].to_dict())))
+            merged.merge(ProblemAnalytics.from_dict(json.loads(json.dumps(parts[1].to_dict()))))
+        for analytics in [expected, merged]:
+            options, best, worst = analytics.get_distractors()
+            # q2 has more distinct answers than MAX_OPTIONS
+            self.assertEqual(options, {'q1': Counter({'b': 5, 'a': 2, 'c': 1})})
+            self.assertEqual(best[('q1', 'b')], 2)
+            # user4 and user5 are the worst, ties are resolved by username
+            self.assertEqual(worst[('q1', 'a')], 1)
+            self.assertEqual(worst[('q1', 'c')], 1)
+
+    def test_problem_analytics_choice_distractors(self):
+        """
+            test choice answers are counted by choice name, each chosen choice of a
+            checkbox once, whatever the number of combinations, and written with their
+            text, marked correct by name even when a wrong choice has the same text
+        """
+        names = ['choice_{}'.format(x) for x in range(8)]
+        texts = {x: 'Text {}'.format(x[-1]) for x in names}
+        texts['choice_7'] = 'Text 1'
+        analytics = ProblemAnalytics(2)
+        rand = random.Random(11)
+        for x in range(60):
+            chosen = sorted(rand.sample(names, rand.randint(1, 4)))
+            analytics.add(rand.random(), [], [], 'user{}'.format(x), {'q1': [[y, texts[y]] for y in chosen]})
+        merged = ProblemAnalytics.from_dict(json.loads(json.dumps(analytics.to_dict())))
+        for result in [analytics, merged]:
+            options, best, worst = result.get_distractors()
+            self.assertEqual(set(options['q1']), set(names))
+            self.assertEqual(result.get_option_text('q1', 'choice_3'), 'Text 3')
+            self.assertEqual(sum(best.values()), sum(len(entry[3]['q1']) for entry in result.quartiles.best))
+        output_buffer = six.BytesIO()
+        csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+        questions = {'q1': {'question': '', 'correct': 'Text 1, Text 5', 'correct_choices': ['choice_1', 'choice_5']}}
+        EolReportAnalyticsView().write_distractors(csvwriter, merged, ['q1'], questions)
+        rows = [x.split(';') for x in output_buffer.getvalue().decode('utf-8').splitlines() if x.startswith('Pregunta 1')]
+        self.assertEqual(len(rows), len(names))
+        self.assertEqual(sorted(x[1] for x in rows if x[2] == 'Si'), ['Text 1', 'Text 5'])
+        self.assertEqual([x[2] for x in rows if x[1] == 'Text 1'].count('No'), 1)
+
+    def test_psychometrics(self):
+        """
+            test point-biserial, alpha and alpha if deleted, with and without numpy, match the textbook formulas
+        """
+        rand = random.Random(5)
+        items = ['q{}'.format(x) for x in range(4)]
+        students = []
+        for i in range(300):
+            correct = [x for j, x in enumerate(items) if rand.random() < 0.3 + 0.15 * j]
+            students.append((rand.randint(0, 4) / 4, correct, [x for x in items if x not in correct]))
+        matrix = [[1 if x in correct else 0 for x in items] for score, correct, incorrect in students]
+        scores = [score for score, correct, incorrect in students]
+        totals = [sum(row) for row in matrix]
+        variances = [pstdev([row[j] for row in matrix]) ** 2 for j in range(len(items))]
+        k = len(items)
+        expected_alpha = k / (k - 1) * (1 - sum(variances) / pstdev(totals) ** 2)
+
+        def correlation(x, y):
+            mx, my = mean(x), mean(y)
+            return mean([(a - mx) * (b - my) for a, b in zip(x, y)]) / (pstdev(x) * pstdev(y))
+
+        for backend in [psychometrics.numpy, None]:
+            with patch('eol_report_analytics.psychometrics.numpy', backend):
+                analytics = ProblemAnalytics(0)
+                for score, correct, incorrect in students:
+                    analytics.add(score, correct, incorrect)
+                alpha, statistics = analytics.psychometrics.get_statistics()
+            self.assertAlmostEqual(alpha, expected_alpha)
+            for j, x in enumerate(items):
+                column = [row[j] for row in matrix]
+                rest = [t - c for t, c in zip(totals, column)]
+                expected_deleted = (k - 1) / (k - 2) * (1 - (sum(variances) - variances[j]) / pstdev(rest) ** 2)
+                self.assertAlmostEqual(statistics[x]['difficulty'], mean(column))
+                self.assertAlmostEqual(statistics[x]['point_biserial'], correlation(column, scores))
+                self.assertAlmostEqual(statistics[x]['alpha_if_deleted'], expected_deleted)
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_eol_report_analytics_fan_out(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test the report split in parts by student id range give the same csv than a single worker,
+            with the problems in course order
+        """
+        mock_user_id_with_indiv_id_list.return_value = [(self.student.id, '09472337K')]
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": x.username, "Correct Answer": 'student'}]
+            for x in user_states}
+        vertical = ItemFactory.create(parent_location=self.course.location, category='vertical', display_name='vertical')
+        # The states are read in module_state_key order, the second problem first
+        problem = ItemFactory.create(parent_location=vertical.location, category='problem', display_name='problem_1', location=self.course.id.make_usage_key('problem', 'z_problem'))
+        problem2 = ItemFactory.create(parent_location=vertical.location, category='problem', display_name='problem_2', location=self.course.id.make_usage_key('problem', 'a_problem'))
+        for location in [problem.location, problem2.location]:
+            for user, earned in [(self.student, 1), (self.student2, 2)]:
+                StudentModule.objects.create(
+                    module_state_key=location,
+                    student=user,
+                    course_id=self.course.id,
+                    module_type='problem',
+                    state='{"score": {"raw_earned": %d, "raw_possible": 2}, "attempts": 1, "input_state": {"answer_id_1": 1}}' % earned)
+        data = {'block': str(self.course.location), 'course': str(self.course.id), 'base_url':'this_is_a_url'}
+        output_buffer = six.BytesIO()
+        csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+        EolReportAnalyticsView()._build_course_data(data, StudentDirectory(data['course']), data['block'], csvwriter)
+        with override_settings(EOL_REPORT_ANALYTICS_FANOUT_MODE='student', EOL_REPORT_ANALYTICS_FANOUT_PARTS=2):
+            with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+                generate(None, None, self.course.id, {'data': data}, 'Eol_Report_Analytics')
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        report_csv_filename = report_store.links_for(self.course.id)[0][0]
+        with report_store.storage.open(report_store.path_to(self.course.id, report_csv_filename)) as csv_file:
+            self.assertEqual(csv_file.read().decode('utf-8'), output_buffer.getvalue().decode('utf-8'))
+        report_csv = output_buffer.getvalue().decode('utf-8')
+        self.assertIn('09472337K', report_csv)
+        self.assertLess(
+            report_csv.index(';'.join(['Problema 1', 'problem_1', str(problem.location)])),
+            report_csv.index(';'.join(['Problema 2', 'problem_2', str(problem2.location)])))
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_fan_out_task_state(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test the task of a fan-out report keeps running until the reduce task stores the csv, and fails when a part fails
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": x.username, "Correct Answer": 'student'}]
+            for x in user_states}
+        vertical = ItemFactory.create(parent_location=self.course.location, category='vertical', display_name='vertical')
+        problem = ItemFactory.create(parent_location=vertical.location, category='problem', display_name='problem_1')
+        StudentModule.objects.create(
+            module_state_key=problem.location,
+            student=self.student,
+            course_id=self.course.id,
+            module_type='problem',
+            state='{"score": {"raw_earned": 1, "raw_possible": 2}, "attempts": 1, "input_state": {"answer_id_1": 1}}')
+        data = {'block': str(self.course.location), 'course': str(self.course.id), 'base_url':'this_is_a_url'}
+        entries = [
+            InstructorTask.objects.create(
+                course_id=self.course.id,
+                task_type='Eol_Report_Analytics',
+                task_key=get_task_key(data),
+                task_input='{}',
+                task_id='fan_out_task_{}'.format(i),
+                task_state='PROGRESS',
+                requester=self.user_instructor)
+            for i in range(2)]
+        # The parent task returning does not finish the InstructorTask, identical requests still join it
+        process_data.on_success({'fanout': True, 'step': 'EolReportAnalytics - Report split in parts'}, entries[0].task_id, [entries[0].id, None], {})
+        self.assertEqual(InstructorTask.objects.get(pk=entries[0].id).task_state, 'PROGRESS')
+        self.assertEqual(get_running_task_id(data), entries[1].task_id)
+        with override_settings(EOL_REPORT_ANALYTICS_FANOUT_MODE='student', EOL_REPORT_ANALYTICS_FANOUT_PARTS=2):
+            with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+                result = generate(None, entries[1].id, self.course.id, {'data': dict(data)}, 'Eol_Report_Analytics')
+        self.assertTrue(result['fanout'])
+        # The reduce task finished the task and its progress
+        self.assertEqual(InstructorTask.objects.get(pk=entries[1].id).task_state, 'SUCCESS')
+        self.assertEqual(get_progress(entries[1].task_id)['state'], STATE_SUCCESS)
+        # A failed part finishes the task as failed
+        fail_report_parts(Mock(id='part_task_id'), ValueError('part failed'), None, entries[0].task_id)
+        self.assertEqual(InstructorTask.objects.get(pk=entries[0].id).task_state, 'FAILURE')
+        self.assertEqual(get_progress(entries[0].task_id)['state'], STATE_FAILURE)
+        self.assertIsNone(get_running_task_id(data))
+
+    @override_settings(EOL_REPORT_ANALYTICS_AGGREGATES=True)
+    def test_problem_aggregate_signals(self):
+        """
+            test the problem aggregate follows the student states saved and deleted
+        """
+        usage_key = UsageKey.from_string(self.block_id)
+        state = '{"attempts": 1, "score": {"raw_earned": %d, "raw_possible": 2}, "student_answers": {"answer_id_1": "a", "answer_id_2": "b"}, "correct_map": {"answer_id_1": {"correctness": "correct"}, "answer_id_2": {"correctness": "%s"}}}'
+        rebuild_aggregate(self.block_id)
+        # The aggregate is updated by a task queued when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            module = StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=self.student,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state=state % (1, 'incorrect'))
+        aggregate = ProblemAggregate.objects.get(block_id=usage_key)
+        self.assertEqual(aggregate.answered, 1)
+        self.assertEqual(aggregate.correct, {'answer_id_1': 1})
+        self.assertEqual(aggregate.incorrect, {'answer_id_2': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            module.state = state % (2, 'correct')
+            module.save()
+            # The instructor is not enrolled, its answers are not aggregated
+            StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=self.user_instructor,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state=state % (0, 'incorrect'))
+        analytics, headers = EolReportAnalyticsView().get_aggregate_analytics(usage_key)
+        self.assertEqual(analytics.users, 1)
+        self.assertEqual(analytics.correct, Counter({'answer_id_1': 1, 'answer_id_2': 1}))
+        self.assertEqual(analytics.incorrect, Counter())
+        self.assertEqual(analytics.mean(), 1.0)
+        # Enrollment changes queue the update of the results of the student, the read only takes the aggregate row
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseEnrollment.unenroll(self.student, self.course.id)
+        with self.assertNumQueries(1):
+            analytics, headers = EolReportAnalyticsView().get_aggregate_analytics(usage_key)
+        self.assertEqual(analytics.users, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseEnrollment.enroll(self.student, self.course.id, mode='honor')
+        analytics, headers = EolReportAnalyticsView().get_aggregate_analytics(usage_key)
+        self.assertEqual(analytics.users, 1)
+        # An aggregate of other enrollment modes is not used until it is rebuilt
+        with override_settings(EOL_REPORT_ANALYTICS_ENROLLMENT_MODES=['honor', 'audit']):
+            with self.captureOnCommitCallbacks(execute=True):
+                CourseEnrollmentFactory(user=self.user_instructor, course_id=self.course.id, mode='audit')
+            self.assertIsNone(EolReportAnalyticsView().get_aggregate_analytics(usage_key))
+            rebuild_aggregate(self.block_id)
+            analytics, headers = EolReportAnalyticsView().get_aggregate_analytics(usage_key)
+            self.assertEqual(analytics.users, 2)
+            self.assertEqual(analytics.incorrect, Counter({'answer_id_2': 1}))
+        self.assertIsNone(EolReportAnalyticsView().get_aggregate_analytics(usage_key))
+        rebuild_aggregate(self.block_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            module.delete()
+        self.assertEqual(ProblemAggregate.objects.get(block_id=usage_key).answered, 0)
+        # An error updating the aggregate is logged, the student state is saved anyway
+        with patch('eol_report_analytics.signals.update_problem_aggregate.delay', side_effect=Exception('broker down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                StudentModule.objects.create(
+                    module_state_key=usage_key,
+                    student=self.student2,
+                    course_id=usage_key.course_key,
+                    module_type='problem',
+                    state=state % (1, 'incorrect'))
+        self.assertTrue(StudentModule.objects.filter(module_state_key=usage_key, student=self.student2).exists())
+
+    def test_backfill_aggregates_command(self):
+        """
+            test the backfill command compute the aggregate from the existing student states
+        """
+        usage_key = UsageKey.from_string(self.block_id)
+        for user, earned in [(self.student, 1), (self.student2, 2)]:
+            StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=user,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state='{"attempts": 1, "score": {"raw_earned": %d, "raw_possible": 2}, "input_state": {"answer_id_1": {}}, "student_answers": {"answer_id_1": "a"}, "correct_map": {"answer_id_1": {"correctness": "correct"}}}' % earned)
+        call_command('eol_report_analytics_backfill_aggregates', self.block_id)
+        aggregate = ProblemAggregate.objects.get(block_id=usage_key)
+        self.assertEqual(aggregate.answered, 2)
+        self.assertEqual(aggregate.headers, ['answer_id_1'])
+        self.assertEqual(aggregate.to_analytics().mean(), 0.75)
+        self.assertEqual(aggregate.to_analytics().pstdev(), 0.25)
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_eol_report_analytics_fingerprint(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test a report is reused while its fingerprint does not change
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.return_value = {}
+        problem = ItemFactory.create(parent_location=self.course.location, category='problem', display_name='problem_1')
+        StudentModule.objects.create(
+            module_state_key=problem.location,
+            student=self.student,
+            course_id=self.course.id,
+            module_type='problem',
+            state='{"attempts": 1}')
+        data = {'block': str(problem.location), 'course': str(self.course.id)}
+        view = EolReportAnalyticsView()
+        data['fingerprint'] = view.get_fingerprint(data)
+        self.assertIsNotNone(data['fingerprint'])
+        self.assertIsNone(view.get_fingerprint_report(data))
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            generate(None, None, self.course.id, {'data': data}, 'Eol_Report_Analytics')
+        self.assertEqual(ReportFingerprint.objects.filter(fingerprint=data['fingerprint']).count(), 1)
+        with patch("eol_report_analytics.views.task_process_data") as task_mock:
+            response = self.client_instructor.get(reverse('eol_report_analytics:data'), {'course': data['course'], 'block': data['block']})
+            self.assertFalse(task_mock.called)
+        self.assertIn('report_url', json.loads(response.content.decode('utf-8')))
+        # A new answer changes the fingerprint
+        StudentModule.objects.create(
+            module_state_key=problem.location,
+            student=self.student2,
+            course_id=self.course.id,
+            module_type='problem',
+            state='{"attempts": 1}')
+        self.assertNotEqual(view.get_fingerprint(data), data['fingerprint'])
+        # Enrolling a student and unenrolling other keeps the count, not the fingerprint
+        fingerprint = view.get_fingerprint(data)
+        CourseEnrollment.unenroll(self.student2, self.course.id)
+        CourseEnrollmentFactory(user=self.user_instructor, course_id=self.course.id, mode='honor')
+        self.assertNotEqual(view.get_fingerprint(data), fingerprint)
+        # Reports older than the max age are not reused
+        with override_settings(EOL_REPORT_ANALYTICS_FINGERPRINT_MAX_AGE=0):
+            self.assertIsNone(view.get_fingerprint_report(data))
+        # A report generated again after the max age is reused from then on
+        ReportFingerprint.objects.filter(fingerprint=data['fingerprint']).update(created=datetime(2021, 1, 1, tzinfo=UTC))
+        self.assertIsNone(view.get_fingerprint_report(data))
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            generate(None, None, self.course.id, {'data': data}, 'Eol_Report_Analytics')
+        self.assertEqual(ReportFingerprint.objects.filter(fingerprint=data['fingerprint']).count(), 1)
+        self.assertIsNotNone(view.get_fingerprint_report(data))
+
+    @override_settings(EOL_REPORT_ANALYTICS_INCREMENTAL_OVERLAP=0)
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.modulestore")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_incremental_report(self, report, store_mock, mock_user_id_with_indiv_id_list):
+        """
+            test the incremental report only computes the modified states and writes the same csv than the full report
+        """
+        mock_user_id_with_indiv_id_list.return_value = [(self.student.id, '09472337K')]
+        answers = {self.student.username: 'correct_answer_text_1', self.student2.username: 'wrong_answer_text_1'}
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": answers[x.username], "Correct Answer": 'correct_answer_text_1'}]
+            for x in user_states}
+        usage_key = UsageKey.from_string(self.block_id)
+        modules = {}
+        for user, earned in [(self.student, 1), (self.student2, 0)]:
+            modules[user.username] = StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=user,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state='{"attempts": 1, "score": {"raw_earned": %d, "raw_possible": 1}, "input_state": {"answer_id_1": {}}}' % earned)
+        data = {'block': self.block_id, 'course': str(self.course.id)}
+        view = EolReportAnalyticsView()
+
+        def build(incremental):
+            output_buffer = six.BytesIO()
+            csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+            if incremental:
+                view._build_incremental_data(data, StudentDirectory(data['course']), self.block_id, csvwriter)
+            else:
+                view._build_student_data(data, StudentDirectory(data['course']), self.block_id, view.get_all_states(self.block_id), csvwriter, 0)
+            return output_buffer.getvalue()
+
+        self.assertEqual(build(True), build(False))
+        answers[self.student2.username] = 'correct_answer_text_1'
+        modules[self.student2.username].state = '{"attempts": 2, "score": {"raw_earned": 1, "raw_possible": 1}, "input_state": {"answer_id_1": {}}}'
+        modules[self.student2.username].save()
+        report.reset_mock()
+        incremental = build(True)
+        self.assertEqual([[x.username for x in call[0][1]] for call in report.call_args_list], [[self.student2.username]])
+        self.assertEqual(incremental, build(False))
+        self.assertIn(';'.join([self.student2.username, self.student2.email, '', '2', 'correct_answer_text_1', '1', '1', '1,0']), incremental.decode('utf-8'))
+
+        # A failed run rolls back its rows and keeps the previous watermark
+        watermark = ReportWatermark.objects.get(block_id=usage_key).watermark
+        modules[self.student.username].save()
+        report.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            build(True)
+        self.assertEqual(ReportWatermark.objects.get(block_id=usage_key).watermark, watermark)
+        self.assertEqual(ReportRow.objects.filter(block_id=usage_key).count(), 2)
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.modulestore")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_quick_report(self, report, store_mock, mock_user_id_with_indiv_id_list):
+        """
+            test the quick mode samples the states by primary key range and reports the confidence intervals
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": 'answer', "Correct Answer": 'answer'}]
+            for x in user_states}
+        ranges = get_primary_key_ranges(3, 100, 7, random.Random(1))
+        self.assertEqual(sorted(x for low, high in ranges for x in range(low, high) if x <= 100), list(range(3, 101)))
+        usage_key = UsageKey.from_string(self.block_id)
+        for user, earned in [(self.student, 1), (self.student2, 0)]:
+            StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=user,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state='{"attempts": 1, "score": {"raw_earned": %d, "raw_possible": 1}, "input_state": {"answer_id_1": {}}}' % earned)
+        data = {'block': self.block_id, 'course': str(self.course.id), 'quick': True}
+        view = EolReportAnalyticsView()
+        output_buffer = six.BytesIO()
+        csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+        view._build_sample_data(data, StudentDirectory(data['course']), self.block_id, csvwriter)
+        report_csv = output_buffer.getvalue().decode('utf-8')
+        # Every state was sampled, so the intervals are the exact values
+        self.assertIn('Estados leidos;2;Muestra completa', report_csv)
+        self.assertIn('Rangos de ids leidos;1;1', report_csv)
+        self.assertIn('Promedio;0,5;0,5;0,5', report_csv)
+        # The variance is between ranges, ranges with the same mean add none
+        self.assertEqual(cluster_interval([2, 4], [4, 8], 10), (0.5, 0.5))
+        self.assertEqual(cluster_interval([0, 4], [4, 4], 10, 0.0, 1.0), (0.0, 1.0))
+        self.assertEqual(cluster_interval([0], [4], 10), (None, None))
+        with override_settings(EOL_REPORT_ANALYTICS_QUICK_TIME_BUDGET=0):
+            output_buffer = six.BytesIO()
+            csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+            view._build_sample_data(data, StudentDirectory(data['course']), self.block_id, csvwriter)
+        self.assertIn('Estados leidos;0;Muestra parcial', output_buffer.getvalue().decode('utf-8'))
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_eol_report_analytics_batch(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test the batch report writes every problem of the blocks once and that identical requests join the running task
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": 'answer_text_1', "Correct Answer": 'answer_text_1'}]
+            for x in user_states}
+        vertical = ItemFactory.create(parent_location=self.course.location, category='vertical', display_name='vertical')
+        problem1 = ItemFactory.create(parent_location=vertical.location, category='problem', display_name='problem_1')
+        problem2 = ItemFactory.create(parent_location=self.course.location, category='problem', display_name='problem_2')
+        for problem in [problem1, problem2]:
+            StudentModule.objects.create(
+                module_state_key=problem.location,
+                student=self.student,
+                course_id=self.course.id,
+                module_type='problem',
+                state='{"score": {"raw_earned": 1, "raw_possible": 2}, "attempts": 1, "input_state": {"answer_id_1": 1}}')
+        blocks = [str(problem2.location), str(vertical.location), str(problem1.location)]
+        data = {'block': None, 'blocks': blocks, 'course': str(self.course.id)}
+        output_buffer = six.BytesIO()
+        csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+        EolReportAnalyticsView()._build_batch_data(data, StudentDirectory(data['course']), blocks, csvwriter)
+        report_csv = output_buffer.getvalue().decode('utf-8')
+        self.assertEqual(report_csv.count(';'.join(['problem_1', str(problem1.location)])), 2)
+        self.assertEqual(report_csv.count(';'.join(['problem_2', str(problem2.location)])), 2)
+        # Different blocks get different task keys, the same blocks in any order share it
+        self.assertNotEqual(get_task_key({'block': str(problem1.location)}), get_task_key({'block': str(problem2.location)}))
+        self.assertEqual(get_task_key(data), get_task_key({'blocks': list(reversed(blocks))}))
+        # A profiled report does not join the running report without profile
+        self.assertNotEqual(get_task_key(data), get_task_key(dict(data, profile=True)))
+        InstructorTask.objects.create(
+            course_id=self.course.id,
+            task_type='Eol_Report_Analytics',
+            task_key=get_task_key(data),
+            task_input='{}',
+            task_id='running_task_id',
+            task_state='PROGRESS',
+            requester=self.user_instructor)
+        with patch("eol_report_analytics.views.submit_task", side_effect=AlreadyRunningError):
+            response = self.client_instructor.get(reverse('eol_report_analytics:batch'), {'course': data['course'], 'block': blocks})
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['task_id'], 'running_task_id')
+
+    @override_settings(EOL_REPORT_ANALYTICS_TWO_PHASE=True)
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.modulestore")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_two_phase_report(self, report, store_mock, mock_user_id_with_indiv_id_list):
+        """
+            Test the summary graded from the correct_map is published before the per-student report
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": 'answer', "Correct Answer": 'answer'}]
+            for x in user_states}
+        usage_key = UsageKey.from_string(self.block_id)
+        for user, correctness in [(self.student, 'correct'), (self.student2, 'incorrect')]:
+            StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=user,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state=json.dumps({
+                    "attempts": 1,
+                    "score": {"raw_earned": 1 if correctness == 'correct' else 0, "raw_possible": 1},
+                    "input_state": {"answer_id_1": {}},
+                    "student_answers": {"answer_id_1": "choice_1"},
+                    "correct_map": {"answer_id_1": {"correctness": correctness}}}))
+        data = {'block': self.block_id, 'course': str(self.course.id)}
+        view = EolReportAnalyticsView()
+        output_buffer = six.BytesIO()
+        csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+        view._build_summary_data(data, StudentDirectory(data['course']), self.block_id, csvwriter)
+        self.assertFalse(report.called)
+        summary = output_buffer.getvalue().decode('utf-8')
+        self.assertIn('Cuantos contestaron;2', summary)
+        self.assertIn('Promedio;0,5', summary)
+        self.assertIn('Pregunta 1;;;Dificultad adecuada;0,5;0,5', summary)
+        # Read from the aggregate the summary has the same values, without psychometrics
+        with override_settings(EOL_REPORT_ANALYTICS_AGGREGATES=True):
+            rebuild_aggregate(self.block_id)
+            output_buffer = six.BytesIO()
+            csvwriter = csv.writer(EncodedWriter(output_buffer), delimiter=';', dialect='excel')
+            view._build_summary_data(data, StudentDirectory(data['course']), self.block_id, csvwriter)
+        self.assertEqual(output_buffer.getvalue().decode('utf-8'), summary[:summary.index('\r\n\r\nPsicometria')])
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            result = generate(None, None, self.course.id, {'data': data}, 'Eol_Report_Analytics')
+        self.assertIn('Analitica_de_Preguntas_Resumen', result['summary_report_name'])
+        self.assertNotIn('Resumen', result['report_name'])
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        self.assertEqual(
+            sorted(x[0] for x in report_store.links_for(self.course.id)),
+            sorted([result['summary_report_name'], result['report_name']]))
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_eol_report_analytics_json(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test the json endpoint serves the analytics of the last report with its fingerprint as ETag
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": 'answer_text_1', "Correct Answer": 'answer_text_1'}]
+            for x in user_states}
+        problem = ItemFactory.create(parent_location=self.course.location, category='problem', display_name='problem_1')
+        StudentModule.objects.create(
+            module_state_key=problem.location,
+            student=self.student,
+            course_id=self.course.id,
+            module_type='problem',
+            state='{"score": {"raw_earned": 1, "raw_possible": 2}, "attempts": 1, "input_state": {"answer_id_1": 1}}')
+        params = {'course': str(self.course.id), 'block': str(problem.location)}
+        response = self.client_instructor.get(reverse('eol_report_analytics:analytics'), params)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'error': 'No hay analitica calculada para el bloque'})
+        data = dict(params)
+        data['fingerprint'] = EolReportAnalyticsView().get_fingerprint(data)
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            generate(None, None, self.course.id, {'data': data}, 'Eol_Report_Analytics')
+        response = self.client_instructor.get(reverse('eol_report_analytics:analytics'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"{}"'.format(data['fingerprint']))
+        result = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(result['problems'][0]['block_id'], str(problem.location))
+        self.assertEqual(result['problems'][0]['answered'], 1)
+        self.assertEqual(result['problems'][0]['questions'][0]['difficulty'], 1.0)
+        response = self.client_instructor.get(reverse('eol_report_analytics:analytics'), params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client_student.get(reverse('eol_report_analytics:analytics'), params)
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'error': 'Usuario no tiene rol para esta funcionalidad'})
+
+    def test_eol_report_analytics_status(self):
+        """
+            Test the status endpoint serves the progress record of a task, waits a bounded time for a
+            change of the version it is sent and tells when to poll again
+        """
+        response = self.client_instructor.get(reverse('eol_report_analytics:status'), {'task_id': 'task_1'})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'error': 'Tarea no encontrada'})
+        progress = ProgressRecord('task_1')
+        progress.update(STATE_PROGRESS, step='EolReportAnalytics - Calculating', course=str(self.course.id), user_id=self.student.id)
+        # The view queues the task after the worker started it, the state of the worker is kept
+        progress.add(state=STATE_QUEUED, step='EolReportAnalytics - Queued')
+        ProgressRecord('task_1').update(rows=10)
+        self.assertEqual(get_progress('task_1')['version'], 3)
+        with override_settings(EOL_REPORT_ANALYTICS_STATUS_POLL_INTERVAL=3):
+            response = self.client_student.get(reverse('eol_report_analytics:status'), {'task_id': 'task_1'})
+        result = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(result['state'], STATE_PROGRESS)
+        self.assertEqual(result['step'], 'EolReportAnalytics - Calculating')
+        self.assertEqual(result['rows'], 10)
+        self.assertEqual(result['version'], 3)
+        self.assertEqual(result['retry_after'], 3)
+        self.assertEqual(response['Retry-After'], '3')
+        # A request with the current version waits until the record changes, or at most the max wait
+        with patch('eol_report_analytics.views.wait_progress', side_effect=lambda task_id, version, timeout: dict(get_progress(task_id), rows=20)) as wait_mock:
+            with override_settings(EOL_REPORT_ANALYTICS_STATUS_MAX_WAIT=2):
+                response = self.client_student.get(reverse('eol_report_analytics:status'), {'task_id': 'task_1', 'version': '3'})
+            wait_mock.assert_called_once_with('task_1', 3, 2)
+            self.assertEqual(json.loads(response.content.decode('utf-8'))['rows'], 20)
+            # An outdated version is answered at once
+            self.client_student.get(reverse('eol_report_analytics:status'), {'task_id': 'task_1', 'version': '2'})
+            self.assertEqual(wait_mock.call_count, 1)
+        with patch('eol_report_analytics.progress.sleep', side_effect=lambda seconds: ProgressRecord('task_1').update(rows=30)):
+            self.assertEqual(wait_progress('task_1', 3, 10)['rows'], 30)
+        self.assertEqual(get_progress('task_1')['version'], 4)
+        self.assertEqual(wait_progress('task_1', 4, 0)['rows'], 30)
+        # The instructor of the course reads the progress
+        progress.update(STATE_SUCCESS, report_name='report.csv', report_url='/report.csv')
+        response = self.client_instructor.get(reverse('eol_report_analytics:status'), {'task_id': 'task_1'})
+        result = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(result['state'], STATE_SUCCESS)
+        self.assertEqual(result['report_url'], '/report.csv')
+        self.assertEqual(result['rows'], 30)
+        self.assertEqual(result['version'], 5)
+        self.assertIsNone(result['retry_after'])
+        self.assertFalse(response.has_header('Retry-After'))
+        response = self.client_student.get(reverse('eol_report_analytics:status'), {'task_id': 'task_2'})
+        self.assertEqual(json.loads(response.content.decode('utf-8')), {'error': 'Tarea no encontrada'})
+
+    def test_answer_extractor_cache(self):
+        """
+            Test the parsed problem is reused while its version is the same, whatever the language of the request
+        """
+        local_cache.clear()
+        block = Mock(data=PROBLEM_XML, edited_on=datetime(2021, 1, 1), location=self.course.id.make_usage_key('problem', 'cached'))
+        with patch('eol_report_analytics.metadata.AnswerExtractor.from_problem', wraps=AnswerExtractor.from_problem) as parse:
+            extractor = get_answer_extractor(block, timeout=60)
+            self.assertEqual(get_answer_extractor(block, timeout=60).entries, extractor.entries)
+            self.assertEqual(parse.call_count, 1)
+            # Another process reads it from the django cache
+            local_cache.clear()
+            get_answer_extractor(block, timeout=60)
+            self.assertEqual(parse.call_count, 1)
+            # A celery task, without the language of the request, reads the entry of the web process
+            local_cache.clear()
+            with translation.override('en'):
+                get_answer_extractor(block, timeout=60)
+            self.assertEqual(parse.call_count, 1)
+            block.edited_on = datetime(2021, 1, 2)
+            extractor = get_answer_extractor(block, timeout=60)
+            self.assertEqual(parse.call_count, 2)
+        self.assertEqual(extractor.get_answer_info('{}_2_1'.format(block.location.html_id())), ('question_text_1', 'correct_answer_text_1'))
+
+    @override_settings(EOL_REPORT_ANALYTICS_EXTRACTION_WORKERS=2, EOL_REPORT_ANALYTICS_EXTRACTION_BATCH_SIZE=2)
+    def test_parallel_extraction(self):
+        """
+            Test the answers extracted by the process pool are the same and in the same order as the serial ones
+        """
+        block = Mock(data=PROBLEM_XML, edited_on=datetime(2021, 1, 1), location=self.course.id.make_usage_key('problem', 'parallel'), rerandomize='never', category='problem')
+        block.runtime.service.return_value = Mock(gettext=lambda text: text)
+        html_id = block.location.html_id()
+        user_states = [
+            decode_state('student_{}'.format(i), json.dumps({
+                'attempts': 1,
+                'student_answers': {
+                    '{}_2_1'.format(html_id): 'choice_{}'.format(i % 2),
+                    '{}_4_1'.format(html_id): 'a',
+                    '{}_6_1_dynamath'.format(html_id): '<math/>',
+                }}))
+            for i in range(7)]
+        view = EolReportAnalyticsView()
+        serial = list(view.generate_report_data(user_states, block))
+        self.assertEqual(len(serial), 14)
+        with view.get_extraction_pool(block.location, block):
+            self.assertIsNotNone(view.extraction_pool)
+            with patch.object(view.extraction_pool, 'map', wraps=view.extraction_pool.map) as pool_map:
+                self.assertEqual(list(view.generate_report_data(user_states, block)), serial)
+            # 7 states in batches of the minimum size, fewer than 4 batches per process
+            self.assertEqual([len(x) for x in pool_map.call_args[0][1]], [2, 2, 2, 1])
+        self.assertIsNone(view.extraction_pool)
+        # A prefork celery worker is daemonic, no pool is started
+        with patch('eol_report_analytics.views.multiprocessing.current_process', return_value=Mock(daemon=True)):
+            with view.get_extraction_pool(block.location, block):
+                self.assertIsNone(view.extraction_pool)
+                self.assertEqual(list(view.generate_report_data(user_states, block)), serial)
+
+    def test_pipeline(self):
+        """
+            Test the pipeline keeps the order of the chunks, times each stage and raises the errors of its threads
+        """
+        pipeline = Pipeline(queue_size=1)
+        saved = []
+        with pipeline.writer(saved.append) as write:
+            for chunk in pipeline.prefetch(iter([[1, 2], [3], [4, 5]])):
+                with pipeline.timer('grade'):
+                    write([x * 2 for x in chunk])
+        self.assertEqual(saved, [[2, 4], [6], [8, 10]])
+        timings = pipeline.get_timings()
+        self.assertEqual(set(timings['timings']), {'fetch', 'grade', 'write'})
+        self.assertEqual(set(timings['waits']), {'fetch', 'write'})
+
+        def failing_chunks():
+            yield [1]
+            raise ValueError('fetch')
+        with self.assertRaises(ValueError):
+            list(pipeline.prefetch(failing_chunks()))
+        with self.assertRaises(ZeroDivisionError):
+            with pipeline.writer(lambda chunk: 1 / 0) as write:
+                write([1])
+
+    @override_settings(EOL_REPORT_ANALYTICS_INSTRUMENTATION=True, EOL_REPORT_ANALYTICS_INSTRUMENTATION_INTERVAL=0)
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_report_metrics(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test the task progress lists the seconds of each phase, the rows and the rows per second
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": 'answer_text_1', "Correct Answer": 'answer_text_1'}]
+            for x in user_states}
+        problem = ItemFactory.create(parent_location=self.course.location, category='problem', display_name='problem_1')
+        StudentModule.objects.create(
+            module_state_key=problem.location,
+            student=self.student,
+            course_id=self.course.id,
+            module_type='problem',
+            state='{"score": {"raw_earned": 1, "raw_possible": 2}, "attempts": 1, "input_state": {"answer_id_1": 1}}')
+        data = {'block': str(problem.location), 'course': str(self.course.id)}
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            result = generate(None, None, self.course.id, {'data': data}, 'Eol_Report_Analytics')
+        metrics = result['metrics']
+        self.assertEqual(metrics['rows'], 1)
+        self.assertGreater(metrics['rows_per_second'], 0)
+        for phase in ('enrollment', 'indiv_id', 'query', 'extract', 'grade', 'csv', 'store'):
+            self.assertIn(phase, metrics['phases'])
+
+    @patch("eol_report_analytics.views.get_user_id_with_indiv_id_list")
+    @patch("eol_report_analytics.views.EolReportAnalyticsView.get_report_xblock")
+    def test_profile_report(self, report, mock_user_id_with_indiv_id_list):
+        """
+            Test a profiled report uploads the pstats file and the allocation summary next to the csv
+        """
+        mock_user_id_with_indiv_id_list.return_value = []
+        report.side_effect = lambda block_key, user_states, block: {
+            x.username: [{"Answer ID": 'answer_id_1', "Question": 'question_text_1', "Answer": 'answer_text_1', "Correct Answer": 'answer_text_1'}]
+            for x in user_states}
+        problem = ItemFactory.create(parent_location=self.course.location, category='problem', display_name='problem_1')
+        StudentModule.objects.create(
+            module_state_key=problem.location,
+            student=self.student,
+            course_id=self.course.id,
+            module_type='problem',
+            state='{"score": {"raw_earned": 1, "raw_possible": 2}, "attempts": 1, "input_state": {"answer_id_1": 1}}')
+        params = {'course': str(self.course.id), 'block': str(problem.location), 'profile': '1'}
+        # Only staff users can profile a report
+        with patch("eol_report_analytics.views.task_process_data") as task_mock:
+            self.client_instructor.get(reverse('eol_report_analytics:data'), params)
+            self.assertTrue(task_mock.call_args[0][1]['profile'])
+            self.client_data_researcher.get(reverse('eol_report_analytics:data'), params)
+            self.assertFalse(task_mock.call_args[0][1]['profile'])
+        data = {'block': str(problem.location), 'course': str(self.course.id), 'profile': True}
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            result = generate(None, None, self.course.id, {'data': data}, 'Eol_Report_Analytics')
+        self.assertEqual(result['profile_report_name'], result['report_name'].replace('.csv', '.pstats'))
+        self.assertEqual(result['allocations_report_name'], result['report_name'].replace('.csv', '_memoria.txt'))
+        report_store = ReportStore.from_config('GRADES_DOWNLOAD')
+        for name in (result['profile_report_name'], result['allocations_report_name']):
+            self.assertTrue(report_store.storage.exists(report_store.path_to(self.course.id, name)))
+
+    def test_quartiles_bounded_by_count(self):
+        """
+            Test the scans stop at the last state counted, and the discrimination
+            uses the students kept when more students answered than counted
+        """
+        usage_key = UsageKey.from_string(self.block_id)
+        for user in [self.student, self.student2]:
+            StudentModule.objects.create(
+                module_state_key=usage_key,
+                student=user,
+                course_id=usage_key.course_key,
+                module_type='problem',
+                state='{"attempts": 1}')
+        view = EolReportAnalyticsView()
+        total, last_id = view.get_states_bound(self.block_id)
+        self.assertEqual(total, 2)
+        new_user = UserFactory(username='student3')
+        CourseEnrollmentFactory(user=new_user, course_id=self.course.id, mode='honor')
+        StudentModule.objects.create(
+            module_state_key=usage_key,
+            student=new_user,
+            course_id=usage_key.course_key,
+            module_type='problem',
+            state='{"attempts": 1}')
+        chunks = list(view.get_all_states(self.block_id, id__lte=last_id))
+        self.assertEqual(sorted(x.username for chunk in chunks for x in chunk), ['student', 'student2'])
+        quartiles = QuartileTracker(1)
+        for x in range(12):
+            quartiles.add(x, ['a'] if x > 5 else [])
+        self.assertTrue(quartiles.is_truncated(12))
+        self.assertEqual(quartiles.get_quartile_size(12), 1)
+        self.assertEqual(quartiles.get_discriminatory_index(12), (Counter({'a': 1}), Counter()))
+
+    def test_psychometrics_stability(self):
+        """
+            Test the point-biserial is undefined when every student has the same
+            score, and merged partials give the statistics of a single pass
+        """
+        for backend in [psychometrics.numpy, None]:
+            with patch('eol_report_analytics.psychometrics.numpy', backend):
+                engine = psychometrics.Psychometrics(buffer_size=7)
+                for x in range(50):
+                    engine.add(0.1, ['q1'] if x % 3 else [], ['q1', 'q2'])
+                alpha, statistics = engine.get_statistics()
+                self.assertIsNone(statistics['q1']['point_biserial'])
+                rand = random.Random(3)
+                students = [(rand.randint(0, 3) / 3, [x for x in ['q1', 'q2', 'q3'] if rand.random() < 0.5]) for x in range(200)]
+                single = psychometrics.Psychometrics(buffer_size=16)
+                parts = [psychometrics.Psychometrics(buffer_size=16) for x in range(3)]
+                for i, (score, correct) in enumerate(students):
+                    single.add(score, correct, ['q1', 'q2', 'q3'])
+                    parts[i % 3].add(score, correct, ['q1', 'q2', 'q3'])
+                merged = psychometrics.Psychometrics.from_dict(parts[0].to_dict())
+                merged.merge(parts[1])
+                merged.merge(parts[2])
+                single_alpha, single_statistics = single.get_statistics()
+                merged_alpha, merged_statistics = merged.get_statistics()
+                self.assertEqual(merged_alpha, single_alpha)
+                for x in ['q1', 'q2', 'q3']:
+                    self.assertEqual(merged_statistics[x]['alpha_if_deleted'], single_statistics[x]['alpha_if_deleted'])
+                    self.assertAlmostEqual(merged_statistics[x]['point_biserial'], single_statistics[x]['point_biserial'])
@@ -5,5 +5,8 @@ from .views import *
 
 
 urlpatterns = [
+    url(r'^batch$', EolReportAnalyticsBatchView.as_view(), name='batch'),
+    url(r'^analytics$', EolReportAnalyticsJsonView.as_view(), name='analytics'),
+    url(r'^status$', EolReportAnalyticsStatusView.as_view(), name='status'),
     url('data', EolReportAnalyticsView.as_view(), name='data'),
 ]
\ No newline at end of file
@@ -2,25 +2,39 @@
 # -- coding: utf-8 --
 
 # Python Standard Libraries
-import codecs
 import csv
+import hashlib
 import json
 import logging
+import multiprocessing
 import six
-from collections import OrderedDict, defaultdict, Counter
-from datetime import datetime
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime, timedelta
 from functools import partial
-from statistics import mean, pstdev
+from heapq import merge
+from io import BytesIO
+from itertools import chain, groupby
+from operator import itemgetter
+from tempfile import SpooledTemporaryFile
 from time import time
+from traceback import format_tb
+from uuid import uuid4
 
 # Installed packages (via pip)
 from capa.capa_problem import LoncapaProblem, LoncapaSystem
-from celery import task
+from celery import chord, group, task
+from celery.states import FAILURE, READY_STATES, SUCCESS
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.files.base import File
 from django.db import transaction
-from django.http import Http404, JsonResponse
-from django.urls import reverse
+from django.db.models import Count, Max, Min, Q, Sum
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags, quote_etag
 from django.utils.translation import ugettext_noop
 from django.views.generic.base import View
 from pytz import UTC
@@ -33,7 +47,7 @@ from lms.djangoapps.courseware.courses import get_course_with_access
 from lms.djangoapps.courseware.models import StudentModule
 from lms.djangoapps.instructor import permissions
 from lms.djangoapps.instructor_task.api_helper import submit_task, AlreadyRunningError
-from lms.djangoapps.instructor_task.models import ReportStore
+from lms.djangoapps.instructor_task.models import InstructorTask, ReportStore
 from lms.djangoapps.instructor_task.tasks_base import BaseInstructorTask
 from lms.djangoapps.instructor_task.tasks_helper.runner import run_main_task, TaskProgress
 from opaque_keys import InvalidKeyError
@@ -42,17 +56,166 @@ from openedx.core.djangoapps.content.course_overviews.models import CourseOvervi
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
 
+# Internal project dependencies
+from .analytics import ClusterAnalytics, ProblemAnalytics, ProblemPartial, first_read
+from .extractors import extract_answers, extract_batch, get_answer_report, init_extraction_worker
+from .instrumentation import Instrumentation, timer
+from .metadata import get_answer_extractor
+from .models import ProblemAggregate, ProblemResult, ReportFingerprint, ReportRow, ReportWatermark
+from .pipeline import Pipeline
+from .profiling import ReportProfile
+from .progress import FINAL_STATES, STATE_FAILURE, STATE_PROGRESS, STATE_QUEUED, STATE_SUCCESS, ProgressRecord, get_progress, wait_progress
+from .sampling import PrimaryKeySample, cluster_interval
+from .sorted_rows import SortedRows
+from .states import decode_state, get_answer_ids, grade_correct_map
+
 logger = logging.getLogger(__name__)
 
+INDIV_ID_CACHE_KEY = 'eol_report_analytics:indiv_id:{}'
+
+TASK_TYPE = 'Eol_Report_Analytics'
+
+# Blocks accepted by the report, any block other than a problem reports
+# every problem inside it in a single pass
+PROBLEM_BLOCK_TYPE = 'problem'
+REPORT_BLOCK_TYPES = (PROBLEM_BLOCK_TYPE, 'sequential', 'chapter', 'course')
+
+# Fan-out modes, the report is split in parts by problem or by student id range,
+# each part is built by its own celery task and a reducer writes the csv
+FANOUT_BLOCK = 'block'
+FANOUT_STUDENT = 'student'
+# Storage directory of the csv rows built by each part
+PARTS_DIR = 'eol_report_analytics_parts'
+# Changes when the content of the stored rows changes, so they are computed again
+REPORT_ROW_FORMAT = '3'
+
+# Batches of each chunk sent to every extraction process, more than one so
+# the processes that finish first take the remaining batches
+EXTRACTION_BATCHES_PER_WORKER = 4
+
+# Problem xml content that makes the rendered problem depend on the seed
+SEED_DEPENDENT_MARKERS = ('<script', 'shuffle=', 'answer-pool=', 'random')
+
+# Grading modes, 'correct_map' reads the correctness stored by capa in the
+# state and 'text' compares the rendered answer with the correct answer
+GRADING_CORRECT_MAP = 'correct_map'
+GRADING_TEXT = 'text'
+
+def get_grading_mode():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_GRADING_MODE', GRADING_CORRECT_MAP)
+
+def get_chunk_size():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_CHUNK_SIZE', 1000)
+
+def get_spool_max_size():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_SPOOL_MAX_SIZE', 5 * 1024 * 1024)
+
+def get_enrollment_modes():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_ENROLLMENT_MODES', ['honor'])
+
+def get_directory_batch_size():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_DIRECTORY_BATCH_SIZE', 500)
+
+def get_indiv_id_cache_timeout():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_INDIV_ID_CACHE_TIMEOUT', 0)
+
+def get_fanout_mode():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_FANOUT_MODE', None)
+
+def get_fanout_parts():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_FANOUT_PARTS', 4)
+
+def get_incremental_enabled():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_INCREMENTAL', False)
+
+def get_incremental_overlap():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_INCREMENTAL_OVERLAP', 300)
+
+def get_aggregates_enabled():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_AGGREGATES', False)
+
+def get_quick_sample_size():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_QUICK_SAMPLE_SIZE', 2000)
+
+def get_quick_time_budget():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_QUICK_TIME_BUDGET', 30)
+
+def get_two_phase_enabled():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_TWO_PHASE', False)
+
+def get_status_poll_interval():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_STATUS_POLL_INTERVAL', 5)
+
+def get_status_max_wait():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_STATUS_MAX_WAIT', 3)
+
+def get_metadata_cache_timeout():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_METADATA_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+
+def get_extraction_workers():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_EXTRACTION_WORKERS', 0)
+
+def get_extraction_batch_size():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_EXTRACTION_BATCH_SIZE', 100)
+
+def get_pipeline_enabled():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_PIPELINE', False)
+
+def get_pipeline_queue_size():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_PIPELINE_QUEUE_SIZE', 2)
+
+def get_instrumentation_enabled():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_INSTRUMENTATION', False)
+
+def get_instrumentation_interval():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_INSTRUMENTATION_INTERVAL', 10)
+
+def get_statsd_host():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_STATSD_HOST', None)
+
+def get_statsd_port():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_STATSD_PORT', 8125)
+
+def get_statsd_prefix():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_STATSD_PREFIX', 'eol_report_analytics')
+
+def get_profile_courses():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_PROFILE_COURSES', [])
+
+def get_profile_top():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_PROFILE_TOP', 25)
+
+def get_fingerprint_max_age():
+    return getattr(settings, 'EOL_REPORT_ANALYTICS_FINGERPRINT_MAX_AGE', 3600)
+
 def safe_div(num, den):
     return num / den if den else 0
 
+def get_task_key(data):
+    """
+        Key of the report task, requests of the same blocks and options share it
+        while reports of different blocks of a course run concurrently
+    """
+    blocks = sorted(data.get('blocks') or [data['block']])
+    options = ['full' if data.get('full') else '', 'quick' if data.get('quick') else '', 'profile' if data.get('profile') else '']
+    return hashlib.md5('|'.join(blocks + options).encode('utf-8')).hexdigest()
+
+def get_running_task_id(data):
+    """
+        Task id of the report task with the same key still running, None if there is none
+    """
+    return InstructorTask.objects.filter(
+        course_id=CourseKey.from_string(data['course']),
+        task_type=TASK_TYPE,
+        task_key=get_task_key(data)
+    ).exclude(task_state__in=READY_STATES).order_by('-id').values_list('task_id', flat=True).first()
+
 def task_process_data(request, data):
     course_key = CourseKey.from_string(data['course'])
-    task_type = 'Eol_Report_Analytics'
+    task_type = TASK_TYPE
     task_class = process_data
     task_input = {'data': data }
-    task_key = "{}_{}".format(task_type, data['course'])
+    task_key = get_task_key(data)
 
     return submit_task(
         request,
@@ -62,57 +225,353 @@ def task_process_data(request, data):
         task_input,
         task_key)
 
-@task(base=BaseInstructorTask, queue='edx.lms.core.low')
+class ReportInstructorTask(BaseInstructorTask):
+    """
+        Instructor task of the reports. A fan-out report is not finished when
+        the task returns, its InstructorTask stays in PROGRESS until the reduce
+        task stores the csv or a part fails, so identical requests still join it.
+    """
+    abstract = True
+
+    def on_success(self, task_progress, task_id, args, kwargs):
+        if isinstance(task_progress, dict) and task_progress.get('fanout'):
+            return
+        super(ReportInstructorTask, self).on_success(task_progress, task_id, args, kwargs)
+
+@task(base=ReportInstructorTask, queue='edx.lms.core.low')
 def process_data(entry_id, xmodule_instance_args):
     action_name = ugettext_noop('generated')
     task_fn = partial(generate, xmodule_instance_args)
 
-    return run_main_task(entry_id, task_fn, action_name)
+    try:
+        return run_main_task(entry_id, task_fn, action_name)
+    except Exception:
+        ProgressRecord(get_entry_task_id(entry_id)).update(STATE_FAILURE, step='EolReportAnalytics - Failed')
+        raise
+
+def get_entry_task_id(entry_id):
+    """
+        Celery task id of an InstructorTask entry, the id the view returns
+    """
+    if entry_id is None:
+        return None
+    return InstructorTask.objects.filter(pk=entry_id).values_list('task_id', flat=True).first()
+
+def finish_instructor_task(task_id, state, output):
+    """
+        Set the final state of the InstructorTask of a fan-out report
+    """
+    if task_id is None:
+        return
+    InstructorTask.objects.filter(task_id=task_id).update(task_state=state, task_output=output)
+
+@task(queue='edx.lms.core.low')
+def build_report_part(data, usage_keys, counts, part_path, filters):
+    """
+        Map task of the fan-out, return the partial results of the problems
+    """
+    return EolReportAnalyticsView().build_report_part(data, usage_keys, counts, part_path, filters)
+
+@task(queue='edx.lms.core.low')
+def reduce_report_parts(parts, data, course_id, report_name):
+    """
+        Reduce task of the fan-out, merge the partial results and store the csv
+    """
+    view = EolReportAnalyticsView()
+    students = StudentDirectory(data['course'])
+    report_store = ReportStore.from_config('GRADES_DOWNLOAD')
+    with SpooledTemporaryFile(max_size=get_spool_max_size()) as output_buffer:
+        csvwriter = csv.writer(
+                EncodedWriter(output_buffer),
+                delimiter=';',
+                dialect='excel')
+        view._build_report_from_parts(data, students, data['block'], parts, csvwriter)
+        store_report(report_store, CourseKey.from_string(course_id), report_name, output_buffer)
+    record_fingerprint(data, report_name, view.get_results_json())
+    ProgressRecord(data.get('task_id')).update(
+        STATE_SUCCESS,
+        step='EolReportAnalytics - CSV uploaded',
+        report_name=report_name,
+        report_url=get_report_url(report_store, CourseKey.from_string(course_id), report_name))
+    finish_instructor_task(data.get('task_id'), SUCCESS, InstructorTask.create_output_for_success({
+        'action_name': 'generated',
+        'attempted': 1,
+        'succeeded': 1,
+        'skipped': 0,
+        'failed': 0,
+        'total': 1,
+        'step': 'EolReportAnalytics - CSV uploaded',
+        'report_name': report_name,
+    }))
+    return report_name
+
+@task(queue='edx.lms.core.low')
+def fail_report_parts(request, exc, traceback, task_id):
+    """
+        Error callback of the fan-out, a part or the reduce task failed and the
+        csv is never written
+    """
+    logger.error('EolReportAnalytics - Fan-out of task {} failed in {}: {!r}'.format(task_id, request.id, exc))
+    ProgressRecord(task_id).update(STATE_FAILURE, step='EolReportAnalytics - Failed')
+    traceback_string = ''.join(format_tb(traceback)) if traceback is not None else None
+    finish_instructor_task(task_id, FAILURE, InstructorTask.create_output_for_failure(exc, traceback_string))
 
 def generate(_xmodule_instance_args, _entry_id, course_id, task_input, action_name):
     """
     For a given `course_id`, generate a CSV file containing
     all student answers to a given problem, and store using a `ReportStore`.
+    Reports requested with profile=1 by staff, or of the courses in
+    EOL_REPORT_ANALYTICS_PROFILE_COURSES, are run under cProfile and tracemalloc.
+    """
+    if task_input.get('data', {}).get('profile') or str(course_id) in get_profile_courses():
+        return profile_report(_xmodule_instance_args, _entry_id, course_id, task_input, action_name)
+    return generate_report(_xmodule_instance_args, _entry_id, course_id, task_input, action_name)
+
+def profile_report(_xmodule_instance_args, _entry_id, course_id, task_input, action_name):
+    """
+        Run the report under cProfile and tracemalloc and upload the .pstats file
+        and the allocation summary next to the csv, with the same timestamped name.
+        They are uploaded even when the report fails.
     """
+    start_date = datetime.now(UTC)
+    profile = ReportProfile()
+    result = None
+    try:
+        result = profile.run(generate_report, _xmodule_instance_args, _entry_id, course_id, task_input, action_name)
+        return result
+    finally:
+        if result and result.get('report_name'):
+            name = result['report_name'].rsplit('.', 1)[0]
+        else:
+            name = get_report_name(course_id, 'Analitica_de_Preguntas', start_date).rsplit('.', 1)[0]
+        profile_names = {
+            'profile_report_name': '{}.pstats'.format(name),
+            'allocations_report_name': '{}_memoria.txt'.format(name),
+        }
+        try:
+            report_store = ReportStore.from_config('GRADES_DOWNLOAD')
+            store_report(report_store, course_id, profile_names['profile_report_name'], BytesIO(profile.get_pstats()))
+            summary = profile.get_allocation_summary(get_profile_top())
+            store_report(report_store, course_id, profile_names['allocations_report_name'], BytesIO(summary.encode('utf-8')))
+            logger.info('EolReportAnalytics - Profile of {} uploaded: {}'.format(course_id, profile_names))
+            if result:
+                result.update(profile_names)
+        except Exception:
+            # The profile never makes the report fail
+            logger.exception('EolReportAnalytics - Error uploading the profile of {}'.format(course_id))
+
+def generate_report(_xmodule_instance_args, _entry_id, course_id, task_input, action_name):
     start_time = time()
     start_date = datetime.now(UTC)
     num_reports = 1
     task_progress = TaskProgress(action_name, num_reports, start_time)
-    current_step = {'step': 'EolReportAnalytics - Calculating students answers to problem'}
-    task_progress.update_task_state(extra_meta=current_step)
-    
     data = task_input.get('data')
-    students = EolReportAnalyticsView().get_all_enrolled_users(data['course'])
+    view = EolReportAnalyticsView()
+    # Progress record read by the status endpoint, a fan-out reducer finishes it
+    view.progress = ProgressRecord(get_entry_task_id(_entry_id))
+    data['task_id'] = view.progress.task_id
+    if get_pipeline_enabled():
+        view.pipeline = Pipeline(get_pipeline_queue_size())
+
+    def update_task_state(extra_meta, state=STATE_PROGRESS):
+        if view.instrumentation is not None:
+            extra_meta['metrics'] = view.instrumentation.get_metrics()
+        view.progress.update(state, rows=view.rows_processed, **extra_meta)
+        return task_progress.update_task_state(extra_meta=extra_meta)
+
+    if get_instrumentation_enabled():
+        # The metrics are published with the last step while the rows are computed
+        view.instrumentation = Instrumentation(lambda metrics: update_task_state(dict(current_step)), get_instrumentation_interval())
+
+    current_step = {'step': 'EolReportAnalytics - Calculating students answers to problem'}
+    update_task_state(current_step)
+
+    students = StudentDirectory(data['course'])
+    students.instrumentation = view.instrumentation
 
     report_store = ReportStore.from_config('GRADES_DOWNLOAD')
-    csv_name = 'Analitica_de_Preguntas'
+    batch = bool(data.get('blocks'))
+    problem = not batch and UsageKey.from_string(data['block']).block_type == PROBLEM_BLOCK_TYPE
+    # The quick mode only samples the states of a problem
+    quick = problem and data.get('quick', False)
+    csv_name = 'Analitica_de_Preguntas_Muestra' if quick else 'Analitica_de_Preguntas'
+    report_name = get_report_name(course_id, csv_name, start_date)
+    # Reports already published, listed in the extra_meta of every following step
+    artifacts = {}
+
+    if problem and not quick and get_two_phase_enabled():
+        # First phase, the analytics from the correct_map and scores of the states
+        # without rendering any answer, published before the per-student detail
+        summary_name = get_report_name(course_id, 'Analitica_de_Preguntas_Resumen', start_date)
+        with SpooledTemporaryFile(max_size=get_spool_max_size()) as output_buffer:
+            csvwriter = csv.writer(
+                    EncodedWriter(output_buffer),
+                    delimiter=';',
+                    dialect='excel')
+            view._build_summary_data(data, students, data['block'], csvwriter)
+            with timer(view.instrumentation, 'store'):
+                store_report(report_store, course_id, summary_name, output_buffer)
+        artifacts['summary_report_name'] = summary_name
+        artifacts['summary_report_url'] = get_report_url(report_store, course_id, summary_name)
+        current_step = {'step': 'EolReportAnalytics - Summary uploaded, calculating students answers to problem'}
+        current_step.update(artifacts)
+        update_task_state(current_step)
+
+    if get_fanout_mode() and not quick and not batch:
+        view.fan_out_report(data, course_id, report_name, get_fanout_mode())
+        # The InstructorTask is finished by the reduce task or the error callback
+        current_step = {
+            'step': 'EolReportAnalytics - Report split in parts',
+            'report_name': report_name,
+            'fanout': True,
+        }
+        current_step.update(artifacts)
+        return update_task_state(current_step)
+
+    # The csv is kept in memory while small and spills to disk above the configured size
+    with SpooledTemporaryFile(max_size=get_spool_max_size()) as output_buffer:
+        csvwriter = csv.writer(
+                EncodedWriter(output_buffer),
+                delimiter=';',
+                dialect='excel')
+        if batch:
+            view._build_batch_data(data, students, data['blocks'], csvwriter)
+        elif quick:
+            view._build_sample_data(data, students, data['block'], csvwriter)
+        elif problem:
+            if get_incremental_enabled():
+                view._build_incremental_data(data, students, data['block'], csvwriter, data.get('full', False))
+            else:
+                # The scan stops at the last state counted, so the quartiles hold every student read
+                total, last_id = view.get_states_bound(data['block'])
+                student_states = view.prefetch(view.get_all_states(data['block'], id__lte=last_id))
+                view._build_student_data(data, students, data['block'], student_states, csvwriter, int(total / 4))
+        else:
+            view._build_course_data(data, students, data['block'], csvwriter)
+
+        current_step = {'step': 'EolReportAnalytics - Uploading CSV'}
+        current_step.update(artifacts)
+        update_task_state(current_step)
+
+        with timer(view.instrumentation, 'store'):
+            store_report(report_store, course_id, report_name, output_buffer)
+    record_fingerprint(data, report_name, view.get_results_json())
+    current_step = {
+        'step': 'EolReportAnalytics - CSV uploaded',
+        'report_name': report_name,
+        'report_url': get_report_url(report_store, course_id, report_name),
+    }
+    current_step.update(artifacts)
+    if view.pipeline is not None:
+        current_step['pipeline'] = view.pipeline.get_timings()
+        logger.info('EolReportAnalytics - Pipeline stages of {}: {}'.format(data['block'], current_step['pipeline']))
+    if view.instrumentation is not None:
+        view.log_metrics(data)
+
+    return update_task_state(current_step, STATE_SUCCESS)
 
-    report_name = u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
+def get_report_name(course_id, csv_name, start_date):
+    return u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
         course_prefix=course_filename_prefix_generator(course_id),
         csv_name=csv_name,
         timestamp_str=start_date.strftime("%Y-%m-%d-%H%M")
     )
-    output_buffer = ContentFile('')
-    if six.PY2:
-        output_buffer.write(codecs.BOM_UTF8)
-    csvwriter = csv.writer(
-            output_buffer,
-            delimiter=';',
-            dialect='excel')
-    student_states = EolReportAnalyticsView().get_all_states(data['block'])
-    csvwriter = EolReportAnalyticsView()._build_student_data(data, students, data['block'], student_states, csvwriter)
 
-    current_step = {'step': 'EolReportAnalytics - Uploading CSV'}
-    task_progress.update_task_state(extra_meta=current_step)
+def get_report_url(report_store, course_id, report_name):
+    if not hasattr(report_store, 'storage'):
+        return None
+    return report_store.storage.url(report_store.path_to(course_id, report_name))
 
+def store_report(report_store, course_id, report_name, output_buffer):
+    """
+    Upload the report to the `ReportStore` storage, streaming the file
+    instead of reading it fully in memory.
+    """
     output_buffer.seek(0)
-    report_store.store(course_id, report_name, output_buffer)
-    current_step = {
-        'step': 'EolReportAnalytics - CSV uploaded',
-        'report_name': report_name,
-    }
+    if hasattr(report_store, 'storage'):
+        report_store.storage.save(report_store.path_to(course_id, report_name), File(output_buffer))
+    else:
+        report_store.store(course_id, report_name, output_buffer)
+
+def record_fingerprint(data, report_name, analytics=None):
+    """
+    Index the stored report and its analytics by the fingerprint computed when it was requested
+    """
+    if not data.get('fingerprint'):
+        return
+    ReportFingerprint.objects.update_or_create(
+        fingerprint=data['fingerprint'],
+        defaults={
+            'course_id': CourseKey.from_string(data['course']),
+            'block_id': UsageKey.from_string(data['block']),
+            'report_name': report_name,
+            'analytics': analytics,
+            # auto_now_add only sets it on insert, a report generated again is new
+            'created': datetime.now(UTC),
+        })
+
+def get_problem_result(usage_key, state):
+    """
+        Unsaved ProblemResult of the student state, graded as the summary
+        report does: answers without correct_map count as neither correct nor
+        incorrect. None when the summary would skip the state.
+    """
+    answer_ids = get_answer_ids(state)
+    if not state.has_attempts or not answer_ids or not state.score_possible:
+        return None
+    graded = grade_correct_map(state, answer_ids) or ([], [])
+    return ProblemResult(
+        block_id=usage_key,
+        course_id=usage_key.course_key,
+        user_id=state.user_id,
+        score=float(state.score_earned) / float(state.score_possible),
+        correct=graded[0],
+        incorrect=graded[1])
+
+class EncodedWriter(object):
+    """
+    Text interface over a binary file, used by the csv writer
+    """
+    def __init__(self, output_buffer):
+        self.output_buffer = output_buffer
+
+    def write(self, text):
+        return self.output_buffer.write(text.encode('utf-8'))
+
+class SectionBuffer(object):
+    """
+    Csv sections written in any order to a temporary file and copied to the
+    report in another order, reading one line of the file at a time
+    """
+    def __init__(self):
+        self.output_buffer = SpooledTemporaryFile(max_size=get_spool_max_size())
+        self.csvwriter = csv.writer(EncodedWriter(self.output_buffer), delimiter=';', dialect='excel')
+        # (start, end) offsets of each section in the file
+        self.sections = {}
+
+    def __contains__(self, key):
+        return key in self.sections
 
-    return task_progress.update_task_state(extra_meta=current_step)
+    def add(self, key, write):
+        """
+        Write the section with write(csvwriter), return what write returns
+        """
+        self.output_buffer.seek(0, 2)
+        start = self.output_buffer.tell()
+        result = write(self.csvwriter)
+        self.sections[key] = (start, self.output_buffer.tell())
+        return result
+
+    def read_lines(self, start, end):
+        self.output_buffer.seek(start)
+        while self.output_buffer.tell() < end:
+            yield self.output_buffer.readline().decode('utf-8')
+
+    def copy(self, key, csvwriter):
+        csvwriter.writerows(csv.reader(self.read_lines(*self.sections[key]), delimiter=';', dialect='excel'))
+
+    def close(self):
+        self.output_buffer.close()
 
 def _get_utf8_encoded_rows(row):
     """
@@ -126,10 +585,146 @@ def _get_utf8_encoded_rows(row):
     else:
         return [six.text_type(item) for item in row]
 
+class ProblemTemplate(object):
+    """
+        LoncapaProblem parsed once for a given seed, with memoized
+        question labels and correct answers per answer id
+    """
+    def __init__(self, block, capa_system, seed):
+        self.lcp = LoncapaProblem(
+            problem_text=block.data,
+            id=block.location.html_id(),
+            capa_system=capa_system,
+            # We choose to run without a fully initialized CapaModule
+            capa_module=None,
+            state={'seed': seed},
+            seed=seed,
+            # extract_tree=False allows us to work without a fully initialized CapaModule
+            # We'll still be able to find particular data in the XML when we need it
+            extract_tree=False,
+        )
+        self.answer_info = {}
+
+    def get_answer_info(self, answer_id):
+        """
+            Return (question_text, correct_answer_text) for the answer id
+        """
+        if answer_id not in self.answer_info:
+            self.answer_info[answer_id] = (
+                self.lcp.find_question_label(answer_id),
+                self.lcp.find_correct_answer_text(answer_id)
+            )
+        return self.answer_info[answer_id]
+
+    def find_answer_text(self, answer_id, current_answer):
+        return self.lcp.find_answer_text(answer_id, current_answer=current_answer)
+
+    def get_correct_choices(self, answer_id):
+        """
+            Names of the correct choices of a choice input, from its responder.
+            None when the responder does not list them.
+        """
+        for responder in self.lcp.responders.values():
+            if answer_id in responder.answer_ids:
+                correct = responder.get_answers().get(answer_id)
+                return list(correct) if isinstance(correct, (list, set)) else None
+        return None
+
+class StudentDirectory(object):
+    """
+        Enrolled students of a course, resolved lazily: the enrolled count is a
+        COUNT query and the email/indiv_id are only looked up for the students
+        that appear in the answer stream, in fixed-size batches.
+    """
+    def __init__(self, course_id):
+        self.course_id = course_id
+        self.enrolled_count = None
+        # indiv_id already resolved, reused when the same students answer several problems
+        self.indiv_ids = {}
+        # Instrumentation of the report timing the lookups, if enabled
+        self.instrumentation = None
+
+    def get_enrolled_users(self):
+        return User.objects.filter(
+            courseenrollment__course_id=self.course_id,
+            courseenrollment__is_active=1,
+            courseenrollment__mode__in=get_enrollment_modes()
+        )
+
+    def count(self):
+        if self.enrolled_count is None:
+            with timer(self.instrumentation, 'enrollment'):
+                self.enrolled_count = self.get_enrolled_users().count()
+        return self.enrolled_count
+
+    def resolve(self, student_states):
+        """
+            Return {username: {'email', 'indiv_id'}} of the students of the states
+        """
+        indiv_ids = self.get_indiv_ids([x.user_id for x in student_states])
+        return {
+            x.username: {'email': x.email, 'indiv_id': indiv_ids[x.user_id]}
+            for x in student_states
+        }
+
+    def get_indiv_ids(self, user_ids):
+        """
+            Return {user_id: indiv_id}, '' for the users without indiv_id.
+            The lookups can be cached setting EOL_REPORT_ANALYTICS_INDIV_ID_CACHE_TIMEOUT.
+        """
+        timeout = get_indiv_id_cache_timeout()
+        indiv_ids = {x: self.indiv_ids[x] for x in user_ids if x in self.indiv_ids}
+        if timeout:
+            cached = cache.get_many([INDIV_ID_CACHE_KEY.format(x) for x in user_ids if x not in indiv_ids])
+            for user_id in user_ids:
+                if INDIV_ID_CACHE_KEY.format(user_id) in cached:
+                    indiv_ids[user_id] = cached[INDIV_ID_CACHE_KEY.format(user_id)]
+        missing = [x for x in user_ids if x not in indiv_ids]
+        batch_size = get_directory_batch_size()
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            with timer(self.instrumentation, 'indiv_id'):
+                found = {user_id: indiv_id for user_id, indiv_id in get_user_id_with_indiv_id_list(batch)}
+            batch_indiv_ids = {x: found.get(x, '') for x in batch}
+            indiv_ids.update(batch_indiv_ids)
+            if timeout:
+                cache.set_many({INDIV_ID_CACHE_KEY.format(x): y for x, y in batch_indiv_ids.items()}, timeout)
+        self.indiv_ids.update(indiv_ids)
+        return indiv_ids
+
+    def get_id_ranges(self, parts):
+        """
+            Split the enrolled user ids in `parts` ranges of the same width,
+            returned as StudentModule filters
+        """
+        bounds = self.get_enrolled_users().aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return [{}]
+        width = (bounds['high'] - bounds['low']) // parts + 1
+        return [
+            {'student_id__gte': bounds['low'] + i * width, 'student_id__lt': bounds['low'] + (i + 1) * width}
+            for i in range(parts)
+        ]
+
 class EolReportAnalyticsView(View):
     """
         Return a csv with progress students
     """
+    def __init__(self, **kwargs):
+        super(EolReportAnalyticsView, self).__init__(**kwargs)
+        # Analytics of every problem written by this view, by usage key
+        self.problem_results = OrderedDict()
+        # Student rows computed by this view, published to the progress record if any
+        self.rows_processed = 0
+        self.progress = None
+        # Processes extracting the answers of the problem being reported, if enabled
+        self.extraction_pool = None
+        self.extraction_workers = 0
+        # Threads reading and saving the chunks while they are graded, if enabled
+        self.pipeline = None
+        # Phase timers, row counters and memory of the report, if enabled
+        self.instrumentation = None
+
     @transaction.non_atomic_requests
     def dispatch(self, args, **kwargs):
         return super(EolReportAnalyticsView, self).dispatch(args, **kwargs)
@@ -150,20 +745,101 @@ class EolReportAnalyticsView(View):
                 logger.error("EolReportAnalytics - Usuario no tiene rol para esta funcionalidad, user: {}, course: {}, block: {}".format(request.user, request.GET.get('course', ''), request.GET.get('block', '')))
                 return JsonResponse({'error': 'Usuario no tiene rol para esta funcionalidad'})
             data['base_url'] = request.build_absolute_uri('')
+            # full=1 skips the stored reports and rows, computing every student again
+            data['full'] = request.GET.get('full', '') == '1'
+            # quick=1 samples the student states and reports the analytics with confidence intervals
+            data['quick'] = request.GET.get('quick', '') == '1'
+            # profile=1 runs the report under cProfile and tracemalloc, only for staff
+            data['profile'] = request.user.is_staff and request.GET.get('profile', '') == '1'
             return self.get_context(request, data)
         else:
             logger.error("EolReportAnalytics - User is Anonymous")
         raise Http404()
 
     def get_context(self, request, data):
+        # Sampled and batch reports are never reused
+        data['fingerprint'] = None if data.get('quick') or data.get('blocks') else self.get_fingerprint(data)
+        # Profiled reports are always generated again
+        report_url = None if data.get('full') or data.get('profile') else self.get_fingerprint_report(data)
+        if report_url is not None:
+            success_status = 'La analitica de preguntas ya esta disponible para descargar.'
+            return JsonResponse({"status": success_status, "report_url": report_url})
         try:
             task = task_process_data(request, data)
+            # The worker may have published its first step already, its state is kept
+            progress = ProgressRecord(task.task_id)
+            progress.add(state=STATE_QUEUED, step='EolReportAnalytics - Queued')
+            progress.update(course=data['course'], user_id=request.user.id)
             success_status = 'La analitica de preguntas esta siendo creado, en un momento estará disponible para descargar.'
             return JsonResponse({"status": success_status, "task_id": task.task_id})
         except AlreadyRunningError:
+            # The same report is being generated, the request joins the running task
+            task_id = get_running_task_id(data)
+            if task_id is not None:
+                success_status = 'La analitica de preguntas ya se esta generando, en un momento estará disponible para descargar.'
+                return JsonResponse({"status": success_status, "task_id": task_id})
             logger.error("EolReportAnalytics - Task Already Running Error, user: {}, data: {}".format(request.user, data))
             return JsonResponse({'error_task': 'AlreadyRunningError'})
 
+    def get_fingerprint(self, data):
+        """
+            Hash of everything the report is built from: block and its published
+            version, enrollment modes, the enrolled students (count, sum of ids
+            and last enrollment, so a swap or a mode change is seen), grading
+            mode, and the last modification and count of the student states.
+            The indiv_id of the students is not part of it, see get_fingerprint_report.
+            None when the block version is unknown, such reports are not reused.
+        """
+        try:
+            course_key = CourseKey.from_string(data['course'])
+            block_key = UsageKey.from_string(data['block'])
+            block_item = modulestore().get_item(block_key)
+        except (InvalidKeyError, ItemNotFoundError):
+            return None
+        version = getattr(block_item, 'subtree_edited_on', None) or getattr(block_item, 'edited_on', None)
+        if not isinstance(version, datetime):
+            return None
+        if block_key.block_type == PROBLEM_BLOCK_TYPE:
+            smdat = StudentModule.objects.filter(course_id=course_key, module_state_key=block_key)
+        else:
+            smdat = StudentModule.objects.filter(course_id=course_key, module_type=PROBLEM_BLOCK_TYPE)
+        states = smdat.aggregate(last_modified=Max('modified'), total=Count('id'))
+        enrolled = StudentDirectory(data['course']).get_enrolled_users().aggregate(
+            total=Count('id'), id_sum=Sum('id'), last_enrolled=Max('courseenrollment__created'))
+        fingerprint = [
+            str(block_key),
+            version.isoformat(),
+            ','.join(sorted(get_enrollment_modes())),
+            str(enrolled['total']),
+            str(enrolled['id_sum'] or 0),
+            enrolled['last_enrolled'].isoformat() if enrolled['last_enrolled'] else '',
+            get_grading_mode(),
+            states['last_modified'].isoformat() if states['last_modified'] else '',
+            str(states['total']),
+        ]
+        return hashlib.sha256('|'.join(fingerprint).encode('utf-8')).hexdigest()
+
+    def get_fingerprint_report(self, data):
+        """
+            Url of the stored report with the same fingerprint, if it still exists.
+            Reports older than the configured max age are not reused, so the
+            edits of data outside the fingerprint (the indiv_id) are eventually shown.
+        """
+        if not data.get('fingerprint'):
+            return None
+        indexed = ReportFingerprint.objects.filter(fingerprint=data['fingerprint']).first()
+        if indexed is None:
+            return None
+        max_age = get_fingerprint_max_age()
+        if max_age is not None and indexed.created < datetime.now(UTC) - timedelta(seconds=max_age):
+            return None
+        report_store = ReportStore.from_config('GRADES_DOWNLOAD')
+        path = report_store.path_to(indexed.course_id, indexed.report_name)
+        if not report_store.storage.exists(path):
+            indexed.delete()
+            return None
+        return report_store.storage.url(path)
+
     def have_permission(self, user, course_id):
         """
             Verify if the user is instructor
@@ -220,97 +896,904 @@ class EolReportAnalyticsView(View):
         """
         try:
             block_key = UsageKey.from_string(block_id)
-            if block_key.block_type != 'problem':
+            if block_key.block_type not in REPORT_BLOCK_TYPES:
                 return False
             store = modulestore()
             block_item = store.get_item(block_key)
+            if block_key.block_type == PROBLEM_BLOCK_TYPE:
+                # The problem is parsed here so the task finds it in the cache
+                self.get_answer_extractor(block_item)
             return True
         except (InvalidKeyError, ItemNotFoundError) as e:
             return False
 
-    def get_all_states(self, block_id):
+    def get_enrolled_states(self, block_id):
         """
-            Get all student module
+            StudentModule of the block, only for the students actively enrolled
+            in the course with one of the configured modes
         """
         usage_key = UsageKey.from_string(block_id)
-        smdat = StudentModule.objects.filter(course_id=usage_key.course_key, module_state_key=usage_key).order_by('student__username').values('student__username', 'state')
-        response = []
-        for module in smdat:
-            response.append({'username': module['student__username'], 'state': module['state']})
+        return self.filter_enrolled_states(usage_key.course_key, module_state_key=usage_key)
 
-        return response
+    def filter_enrolled_states(self, course_key, **kwargs):
+        return StudentModule.objects.filter(
+            course_id=course_key,
+            student__courseenrollment__course_id=course_key,
+            student__courseenrollment__is_active=1,
+            student__courseenrollment__mode__in=get_enrollment_modes(),
+            **kwargs
+        )
 
-    def _build_student_data(self, data, students, block, student_states, csvwriter):
+    def get_all_states(self, block_id, chunk_size=None, **filters):
         """
-            Create list of list to make csv report
+            Get all student module in chunks of primary key order (keyset pagination),
+            each state is decoded only once
         """
-        url_base = data['base_url']
-        course_id = data['course']
-        course_key = CourseKey.from_string(course_id)
-        header = ['Username', 'Email', 'Documento_id', 'Intentos']
-        analytics = {'users': 0, 'correct': {}, 'incorrect': {}, 'score': []}
-        best_quartile = defaultdict(list)
-        best_quartile_list = []
-        worst_quartile = defaultdict(list)
-        worst_quartile_list = []
-        quartile = 0
+        chunk_size = chunk_size or get_chunk_size()
+        smdat = self.get_enrolled_states(block_id).filter(**filters)
+        last_id = 0
+        while True:
+            with timer(self.instrumentation, 'query'):
+                chunk = list(
+                    smdat.filter(id__gt=last_id).order_by('id').
+                    values_list('id', 'student_id', 'student__username', 'student__email', 'state')[:chunk_size]
+                )
+            if not chunk:
+                return
+            last_id = chunk[-1][0]
+            yield [decode_state(username, state, user_id, email, state_id) for state_id, user_id, username, email, state in chunk]
+
+    def count_states(self, block_id):
+        """
+            Count the student module of the block, upper bound of the students that answered
+        """
+        return self.get_enrolled_states(block_id).count()
+
+    def get_states_bound(self, block_id):
+        """
+            Count the student module of the block and return it with the last id
+            counted, the scans filtered by id__lte=last_id skip the states created
+            after the count. last_id is 0 when there is no state.
+        """
+        bound = self.get_enrolled_states(block_id).aggregate(total=Count('id'), last_id=Max('id'))
+        return bound['total'], bound['last_id'] or 0
+
+    def get_course_states(self, course_key, usage_keys, chunk_size=None, **filters):
+        """
+            Get the student module of several problems in one scan ordered by
+            (module_state_key, id), yield (usage_key, states) chunks that
+            never mix two problems
+        """
+        chunk_size = chunk_size or get_chunk_size()
+        smdat = self.filter_enrolled_states(course_key, module_state_key__in=usage_keys, **filters)
+        last = None
+        while True:
+            query = smdat
+            if last is not None:
+                query = query.filter(Q(module_state_key__gt=last[0]) | Q(module_state_key=last[0], id__gt=last[1]))
+            with timer(self.instrumentation, 'query'):
+                chunk = list(
+                    query.order_by('module_state_key', 'id').
+                    values_list('module_state_key', 'id', 'student_id', 'student__username', 'student__email', 'state')[:chunk_size]
+                )
+            if not chunk:
+                return
+            last = chunk[-1][:2]
+            for usage_key, rows in groupby(chunk, key=itemgetter(0)):
+                yield usage_key, [decode_state(username, state, user_id, email, state_id) for _, state_id, user_id, username, email, state in rows]
+
+    def count_course_states(self, course_key, usage_keys):
+        """
+            Count the student module of each problem with a single query, return
+            the counts and the last id counted to bound the scans with id__lte
+        """
+        counts = self.filter_enrolled_states(course_key, module_state_key__in=usage_keys).order_by().\
+            values('module_state_key').annotate(total=Count('id'), last_id=Max('id'))
+        counts = list(counts)
+        return {x['module_state_key']: x['total'] for x in counts}, max([x['last_id'] for x in counts] or [0])
+
+    def get_problem_blocks(self, block_item):
+        """
+            Problems inside the block in course order
+        """
+        problems = []
+        pending = [block_item]
+        while pending:
+            item = pending.pop()
+            if item.category == PROBLEM_BLOCK_TYPE:
+                problems.append(item)
+            else:
+                pending.extend(reversed(item.get_children()))
+        return problems
+
+    def _build_student_data(self, data, students, block, state_chunks, csvwriter, quartile_size=0):
+        """
+            Write the csv report reading the student states chunk by chunk,
+            the analytics are accumulated while the rows are written.
+            students is the StudentDirectory of the course.
+            quartile_size must be at least a quarter of the students that answered.
+        """
+        course_key = CourseKey.from_string(data['course'])
         store = modulestore()
         with store.bulk_operations(course_key):
             block_key = UsageKey.from_string(block)
             block_item = store.get_item(block_key)
-            generated_report_data = self.get_report_xblock(block_key, student_states, block_item)
-            if generated_report_data is not None:
-                quartile = int(len(generated_report_data) / 4)
-                jumo_to_url = url_base + reverse('jump_to', kwargs={
-                            'course_id': course_id,
-                            'location': block})
-                aux_headers = self.get_headers(student_states)
-                if aux_headers is not None:
-                    for i in range(len(aux_headers)):
-                        header.append('Pregunta {}'.format(i + 1))
-                    header.append('Ptos Obtenidos')
-                    header.append('Tolal de la Pregunta')
-                    header.append('Nota')
-                    csvwriter.writerow(_get_utf8_encoded_rows(header))
-                    for response in student_states:
-                        if response['username'] not in students:
-                            continue
-                        # A human-readable location for the current block
-                        # A machine-friendly location for the current block
-                        # A block that has a single state per user can contain multiple responses
-                        # within the same state.
-                        if block_key.block_type != 'problem':
-                            pass
-                        else:
-                            user_states = generated_report_data.get(response['username'])
-                            if user_states:
-                                responses, aux_analytics = self.set_data(
-                                        response,
-                                        students,
-                                        user_states,
-                                        aux_headers
-                                        )
-                                if responses:
-                                    analytics['users'] += 1
-                                    analytics['score'].append(aux_analytics['score'])
-                                    for x in aux_analytics['correct']:
-                                        if x in analytics['correct']:
-                                            analytics['correct'][x] += 1
-                                        else:
-                                            analytics['correct'][x] = 1
-                                    for x in aux_analytics['incorrect']:
-                                        if x in analytics['incorrect']:
-                                            analytics['incorrect'][x] += 1
-                                        else:
-                                            analytics['incorrect'][x] = 1
-                                    csvwriter.writerow(_get_utf8_encoded_rows(responses))
-                                    #TO DO: optimaze get discriminatory index
-                                    best_quartile, best_quartile_list = self.order_best_quartile(best_quartile, best_quartile_list, quartile, aux_analytics)
-                                    worst_quartile, worst_quartile_list = self.order_worst_quartile(worst_quartile, worst_quartile_list, quartile, aux_analytics)
-
-        #Analytics Here!
-        n_total_students = len(students)
-        n_students_answered = analytics['users']
+            self.write_problem_report(students, block_key, block_item, state_chunks, csvwriter, quartile_size)
+        return csvwriter
+
+    def _build_course_data(self, data, students, block, csvwriter):
+        """
+            Write the report of every problem inside a course, chapter or sequential,
+            walking the course tree once and reading all the student states in a
+            single scan. Each problem gets its own section and a summary table
+            closes the report.
+        """
+        course_key = CourseKey.from_string(data['course'])
+        store = modulestore()
+        with store.bulk_operations(course_key):
+            block_item = store.get_item(UsageKey.from_string(block), depth=None)
+            self.write_problems(students, course_key, self.get_problem_blocks(block_item), csvwriter)
+        return csvwriter
+
+    def _build_batch_data(self, data, students, blocks, csvwriter):
+        """
+            Write the report of several blocks of a course in a single task, the
+            enrolled students and the modulestore are shared and the problems of
+            every block are read in a single scan. A problem inside more than one
+            of the blocks is reported once.
+        """
+        course_key = CourseKey.from_string(data['course'])
+        store = modulestore()
+        problems = OrderedDict()
+        with store.bulk_operations(course_key):
+            for block in blocks:
+                block_item = store.get_item(UsageKey.from_string(block), depth=None)
+                for problem in self.get_problem_blocks(block_item):
+                    problems.setdefault(problem.location, problem)
+            self.write_problems(students, course_key, list(problems.values()), csvwriter)
+        return csvwriter
+
+    def write_problems(self, students, course_key, problems, csvwriter):
+        """
+            Write a section per problem reading all their student states in a
+            single scan, followed by the summary table. The scan reads the
+            problems in module_state_key order, their sections are buffered
+            and written in course order.
+        """
+        results = {}
+        problem_items = {x.location: x for x in problems}
+        usage_keys = list(problem_items)
+        counts, last_id = self.count_course_states(course_key, usage_keys)
+        sections = SectionBuffer()
+        try:
+            for usage_key, chunks in groupby(self.prefetch(self.get_course_states(course_key, usage_keys, id__lte=last_id)), key=itemgetter(0)):
+                results[str(usage_key)] = sections.add(usage_key, partial(
+                    self.write_problem_report,
+                    students,
+                    usage_key,
+                    problem_items[usage_key],
+                    (student_states for _, student_states in chunks),
+                    quartile_size=int(counts.get(usage_key, 0) / 4)))
+            written = False
+            for position, block_item in enumerate(problems):
+                if block_item.location not in sections:
+                    continue
+                self.write_problem_title(csvwriter, position, block_item, written)
+                sections.copy(block_item.location, csvwriter)
+                written = True
+        finally:
+            sections.close()
+        self.write_course_summary(csvwriter, students.count(), problems, results)
+
+    def _build_incremental_data(self, data, students, block, csvwriter, full=False):
+        """
+            Write the report of a problem computing again only the student states
+            modified since the last run, the other students are read from the
+            stored rows. full=True computes every student state again.
+        """
+        course_key = CourseKey.from_string(data['course'])
+        block_key = UsageKey.from_string(block)
+        store = modulestore()
+        with store.bulk_operations(course_key):
+            block_item = store.get_item(block_key)
+            watermark = self.update_report_rows(block_key, block_item, full)
+        self.write_report_rows(students, block_key, watermark, csvwriter)
+        return csvwriter
+
+    def _build_summary_data(self, data, students, block, csvwriter):
+        """
+            Write the analytics section of a problem graded only with the correct_map
+            and scores of the states, no answer is rendered. The questions are listed
+            by position, their text comes with the per-student report.
+        """
+        aggregate = self.get_aggregate_analytics(UsageKey.from_string(block))
+        if aggregate is not None:
+            # Every value comes from the aggregate, no student state is read
+            analytics, aux_headers = aggregate
+        else:
+            total, last_id = self.get_states_bound(block)
+            problem = self.collect_summary(block, int(total / 4), last_id)
+            self.check_quartiles(block, problem.analytics)
+            analytics, aux_headers = problem.analytics, problem.aux_headers
+        questions = {x: {'question': '', 'correct': ''} for x in aux_headers or []}
+        self.write_analytics(csvwriter, students.count(), analytics, aux_headers, questions)
+        return csvwriter
+
+    def collect_summary(self, block, quartile_size=0, last_id=None):
+        """
+            Return the ProblemPartial of a problem from the correct_map and scores
+            of its states up to last_id, answers without correct_map count as
+            neither correct nor incorrect
+        """
+        problem = ProblemPartial(ProblemAnalytics(quartile_size))
+        filters = {'id__lte': last_id} if last_id is not None else {}
+        for student_states in self.get_all_states(block, **filters):
+            for state in student_states:
+                if not state.has_attempts:
+                    continue
+                if problem.headers is None:
+                    problem.headers = [state.state_id, state.input_keys]
+                answer_ids = get_answer_ids(state)
+                if not answer_ids or not state.score_possible:
+                    continue
+                correct, incorrect = grade_correct_map(state, answer_ids) or ([], [])
+                score = float(state.score_earned) / float(state.score_possible)
+                problem.analytics.add(score, correct, incorrect, state.username)
+        return problem
+
+    def _build_sample_data(self, data, students, block, csvwriter):
+        """
+            Write the analytics of a problem over a random sample of its student
+            states, with confidence intervals. Sampling stops at the configured
+            sample size or when the time budget is spent.
+        """
+        start = time()
+        course_key = CourseKey.from_string(data['course'])
+        block_key = UsageKey.from_string(block)
+        smdat = self.get_enrolled_states(block)
+        total = smdat.count()
+        bounds = smdat.aggregate(low=Min('id'), high=Max('id'))
+        sample = None
+        problem = ProblemPartial(ProblemAnalytics(0))
+        if bounds['low'] is not None:
+            sample = PrimaryKeySample(bounds['low'], bounds['high'], total, get_quick_sample_size())
+            # Range read of each student, the confidence intervals come from the variance between ranges
+            clusters = {}
+
+            def read_range(cluster, low, high):
+                for chunk in self.get_all_states(block, id__gte=low, id__lt=high):
+                    clusters.update((x.username, cluster) for x in chunk)
+                    yield chunk
+
+            state_chunks = sample.read(read_range, start + get_quick_time_budget())
+            store = modulestore()
+            with store.bulk_operations(course_key):
+                block_item = store.get_item(block_key)
+                # Quartiles of a quarter of every state hold any sample
+                analytics = ClusterAnalytics(int(total / 4), clusters)
+                problem = self.collect_problem(students, block_key, block_item, state_chunks, None, analytics=analytics)
+        self.write_sample_analytics(csvwriter, students.count(), total, sample, problem, time() - start)
+        return csvwriter
+
+    def write_sample_analytics(self, csvwriter, n_total_students, total_states, sample, problem, elapsed):
+        def format_value(value):
+            return str(value).replace(".", ",") if value is not None else ''
+
+        analytics = problem.analytics
+        sampled_states = sample.rows if sample is not None else 0
+        complete = sample is None or sample.complete
+        ranges_read = sample.ranges_read if sample is not None else 0
+        ranges = len(sample.ranges) if sample is not None else 0
+        # Students that answered in the whole problem, estimated from the sampled states
+        population = analytics.users if complete else int(round(total_states * safe_div(analytics.users, sampled_states)))
+        csvwriter.writerow(['Analitica (muestra)'])
+        csvwriter.writerow([])
+        csvwriter.writerow(['Usuarios inscritos', n_total_students])
+        csvwriter.writerow(['Estados del problema', total_states])
+        csvwriter.writerow(_get_utf8_encoded_rows(['Estados leidos', sampled_states, 'Muestra completa' if complete else 'Muestra parcial']))
+        csvwriter.writerow(['Rangos de ids leidos', ranges_read, ranges])
+        csvwriter.writerow(['Cuantos contestaron en la muestra', analytics.users])
+        csvwriter.writerow(['Cuantos contestaron (estimado)', population])
+        csvwriter.writerow(['Tiempo (segundos)', format_value(round(elapsed, 3))])
+        if analytics.users == 0:
+            return
+        mean = analytics.mean()
+        pstdev = analytics.pstdev()
+        # Users of each range read, ranges without answers count as clusters of size 0
+        users = [analytics.cluster_users[x] for x in range(ranges_read)]
+        scores = [analytics.cluster_scores[x] for x in range(ranges_read)]
+        csvwriter.writerow([])
+        csvwriter.writerow(['', 'Estimacion', 'IC 95% inferior', 'IC 95% superior'])
+        csvwriter.writerow(['Promedio', format_value(mean)] + [format_value(x) for x in cluster_interval(scores, users, ranges)])
+        csvwriter.writerow(['Desviacion estandar', format_value(pstdev)])
+        aux_headers = problem.aux_headers
+        if not aux_headers:
+            return
+        quartile = analytics.get_quartile_size()
+        best, worst = analytics.get_discriminatory_index()
+        differences = analytics.get_cluster_discrimination()
+        # Share of each range in the quartiles, the quartile limits are taken as known
+        quartile_users = [x * quartile / analytics.users for x in users]
+        csvwriter.writerow([])
+        csvwriter.writerow(['Preguntas', 'Indice de dificultad', 'IC 95% inferior', 'IC 95% superior', 'Indice discriminatorio', 'IC 95% inferior', 'IC 95% superior'])
+        for x in range(len(aux_headers)):
+            answer_id = aux_headers[x]
+            difficulty = analytics.correct.get(answer_id, 0) / analytics.users
+            row = ['Pregunta {}'.format(x + 1), format_value(difficulty)]
+            correct = [analytics.cluster_correct.get(y, {}).get(answer_id, 0) for y in range(ranges_read)]
+            row.extend(format_value(y) for y in cluster_interval(correct, users, ranges, 0.0, 1.0))
+            if quartile != 0:
+                upper = best.get(answer_id, 0) / quartile
+                lower = worst.get(answer_id, 0) / quartile
+                row.append(format_value(upper - lower))
+                difference = [differences.get(y, {}).get(answer_id, 0) for y in range(ranges_read)]
+                row.extend(format_value(y) for y in cluster_interval(difference, quartile_users, ranges, -1.0, 1.0))
+            csvwriter.writerow(row)
+
+    def get_report_signature(self, block_item):
+        """
+            Hash of what the stored rows depend on besides the student states
+        """
+        version = getattr(block_item, 'edited_on', None)
+        signature = [
+            REPORT_ROW_FORMAT,
+            version.isoformat() if isinstance(version, datetime) else '',
+            get_grading_mode(),
+            ','.join(sorted(get_enrollment_modes())),
+        ]
+        return hashlib.sha256('|'.join(signature).encode('utf-8')).hexdigest()
+
+    def update_report_rows(self, block_key, block_item, full=False):
+        """
+            Compute the ReportRow of the states modified since the watermark,
+            or of every state when there is no valid watermark.
+            Runs in a single transaction holding the lock of the watermark, so
+            overlapping runs of the same problem wait for each other and the
+            watermark only advances with the rows it covers.
+        """
+        # Taken before the transaction reads anything, the states saved after it are read next time
+        started = datetime.now(UTC)
+        signature = self.get_report_signature(block_item)
+        with transaction.atomic():
+            # A new watermark has no signature, so its rows are computed from scratch
+            ReportWatermark.objects.get_or_create(
+                block_id=block_key,
+                defaults={'course_id': block_key.course_key, 'signature': '', 'watermark': started})
+            watermark = ReportWatermark.objects.select_for_update().get(block_id=block_key)
+            filters = None
+            if not full and watermark.signature == signature:
+                # The overlap covers the states saved by transactions still open at the last run
+                filters = {'modified__gte': watermark.watermark - timedelta(seconds=get_incremental_overlap())}
+                if not self.delete_report_rows(block_key, watermark, filters):
+                    filters = None
+            if filters is None:
+                ReportRow.objects.filter(block_id=block_key).delete()
+                watermark.questions = None
+                filters = {}
+            watermark.signature = signature
+            for student_states, generated_report_data in self.extract_chunks(block_key, block_item, self.get_all_states(str(block_key), **filters)):
+                if generated_report_data:
+                    username = next(iter(generated_report_data))
+                    order = next((x.state_id for x in student_states if x.username == username), student_states[0].state_id)
+                    watermark.questions = first_read(watermark.questions, [order, self.get_questions(generated_report_data)])
+                ReportRow.objects.filter(block_id=block_key, state_id__in=[x.state_id for x in student_states]).delete()
+                ReportRow.objects.bulk_create([
+                    self.get_report_row(block_key, x, generated_report_data.get(x.username))
+                    for x in student_states
+                ])
+            watermark.watermark = started
+            watermark.save()
+        return watermark
+
+    def delete_report_rows(self, block_key, watermark, filters):
+        """
+            Delete the rows of the states that no longer exist or are no longer enrolled.
+            Return False when the stored rows can not be patched and every
+            state has to be computed again.
+        """
+        smdat = self.get_enrolled_states(str(block_key))
+        current = set(smdat.values_list('id', flat=True))
+        stored = set(ReportRow.objects.filter(block_id=block_key).values_list('state_id', flat=True))
+        changed = set(smdat.filter(**filters).values_list('id', flat=True))
+        if current - stored - changed:
+            return False
+        # The questions are read from the first state with answers, if that state
+        # changed the next one is unknown
+        if watermark.questions and watermark.questions[0] in (stored - current) | changed:
+            return False
+        deleted = list(stored - current)
+        batch_size = get_chunk_size()
+        for i in range(0, len(deleted), batch_size):
+            ReportRow.objects.filter(block_id=block_key, state_id__in=deleted[i:i + batch_size]).delete()
+        return True
+
+    def get_report_row(self, block_key, response, user_states):
+        row = ReportRow(
+            block_id=block_key,
+            state_id=response.state_id,
+            user_id=response.user_id,
+            username=response.username,
+            input_keys=response.input_keys if response.has_attempts else None)
+        if response.has_attempts and user_states:
+            answers, aux_analytics = self.grade_answers(response, user_states)
+            row.answers = answers
+            row.options = aux_analytics['answers']
+            row.attempts = response.attempts
+            row.score_earned = response.score_earned
+            row.score_possible = response.score_possible
+            row.score = aux_analytics['score']
+            row.correct = aux_analytics['correct']
+            row.incorrect = aux_analytics['incorrect']
+        return row
+
+    def write_report_rows(self, students, block_key, watermark, csvwriter):
+        """
+            Write the report of a problem from its stored rows, the quartiles are
+            sized with the rows stored when the reading starts
+        """
+        stored_rows = ReportRow.objects.filter(block_id=block_key, answers__isnull=False)
+        bound = stored_rows.aggregate(total=Count('id'), last_id=Max('state_id'))
+        problem = ProblemPartial(ProblemAnalytics(int(bound['total'] / 4)), questions=watermark.questions)
+        headers = ReportRow.objects.filter(block_id=block_key, input_keys__isnull=False).order_by('state_id').\
+            values_list('state_id', 'input_keys').first()
+        rows = SortedRows()
+        if headers is not None and bound['last_id'] is not None:
+            problem.headers = list(headers)
+            stored_rows = stored_rows.filter(state_id__lte=bound['last_id']).select_related('user')
+            last_id = 0
+            while True:
+                chunk = list(stored_rows.filter(state_id__gt=last_id).order_by('state_id')[:get_chunk_size()])
+                if not chunk:
+                    break
+                last_id = chunk[-1].state_id
+                indiv_ids = students.get_indiv_ids([x.user_id for x in chunk])
+                chunk_rows = []
+                for row in chunk:
+                    responses = [row.username, row.user.email, indiv_ids[row.user_id], row.attempts]
+                    responses.extend(row.answers[x] for x in problem.aux_headers)
+                    responses.extend([row.score_earned, row.score_possible, str(row.score).replace(".",",")])
+                    problem.analytics.add(row.score, row.correct, row.incorrect, row.username, row.options)
+                    chunk_rows.append(_get_utf8_encoded_rows(responses))
+                rows.add_chunk(chunk_rows)
+                self.count_rows(len(chunk_rows))
+        self.write_problem(csvwriter, students.count(), problem, rows, block_key)
+
+    def write_problem_title(self, csvwriter, position, block_item, separate):
+        if separate:
+            csvwriter.writerow([])
+            csvwriter.writerow([])
+        csvwriter.writerow(_get_utf8_encoded_rows([
+            'Problema {}'.format(position + 1),
+            block_item.display_name,
+            str(block_item.location)
+        ]))
+
+    def write_problem_report(self, students, block_key, block_item, state_chunks, csvwriter, quartile_size=0):
+        """
+            Write the rows and analytics of a problem, return (analytics, aux_headers)
+        """
+        # States arrive in primary key order, the csv lists the students by username
+        rows = SortedRows()
+        problem = self.collect_problem(students, block_key, block_item, state_chunks, rows, quartile_size)
+        with self.timed_stage('csv'):
+            self.write_problem(csvwriter, students.count(), problem, rows, block_key)
+        return problem.analytics, problem.aux_headers
+
+    def collect_problem(self, students, block_key, block_item, state_chunks, rows, quartile_size=0, analytics=None):
+        """
+            Grade the states of a problem adding the csv rows to `rows`,
+            return the ProblemPartial with the analytics, a new ProblemAnalytics
+            with quartiles of quartile_size unless analytics is given
+        """
+        problem = ProblemPartial(analytics or ProblemAnalytics(quartile_size))
+        with self.get_rows_writer(rows) as add_chunk:
+            for student_states, generated_report_data in self.extract_chunks(block_key, block_item, state_chunks):
+                if problem.questions is None and generated_report_data:
+                    username = next(iter(generated_report_data))
+                    order = next((x.state_id for x in student_states if x.username == username), student_states[0].state_id)
+                    problem.questions = [order, self.get_questions(generated_report_data)]
+                if problem.headers is None:
+                    aux_headers = self.get_headers(student_states)
+                    if aux_headers is None:
+                        continue
+                    order = next(x.state_id for x in student_states if x.has_attempts)
+                    problem.headers = [order, aux_headers]
+                chunk_rows = []
+                with self.timed_stage('grade'):
+                    chunk_students = students.resolve(student_states)
+                    for responses, aux_analytics in self.grade_chunk(student_states, chunk_students, generated_report_data, problem.aux_headers):
+                        problem.analytics.add(aux_analytics['score'], aux_analytics['correct'], aux_analytics['incorrect'], responses[0], aux_analytics['answers'])
+                        chunk_rows.append(_get_utf8_encoded_rows(responses))
+                if add_chunk is not None:
+                    add_chunk(chunk_rows)
+                self.count_rows(len(chunk_rows))
+        return problem
+
+    def prefetch(self, state_chunks):
+        """
+            Read the next chunks in a thread while the current one is graded, when the pipeline is enabled
+        """
+        if self.pipeline is None:
+            return state_chunks
+        return self.pipeline.prefetch(state_chunks)
+
+    def timed_stage(self, stage):
+        """
+            Context timing a stage in the pipeline and in the instrumentation, when enabled
+        """
+        if self.pipeline is None and self.instrumentation is None:
+            return nullcontext()
+        timers = ExitStack()
+        for timed in (self.pipeline, self.instrumentation):
+            if timed is not None:
+                timers.enter_context(timed.timer(stage))
+        return timers
+
+    @contextmanager
+    def get_rows_writer(self, rows):
+        """
+            Function saving a chunk of graded rows, in the writer thread of the pipeline if enabled
+        """
+        if rows is None:
+            yield None
+        elif self.pipeline is None:
+            yield rows.add_chunk
+        else:
+            with self.pipeline.writer(rows.add_chunk) as add_chunk:
+                yield add_chunk
+
+    def count_rows(self, rows):
+        self.rows_processed += rows
+        if self.progress is not None:
+            self.progress.update(rows=self.rows_processed)
+        if self.instrumentation is not None:
+            self.instrumentation.add_rows(rows)
+
+    def log_metrics(self, data):
+        """
+            Log the metrics of the report as a single json line and send them to statsd if configured
+        """
+        metrics = self.instrumentation.get_metrics()
+        metrics.update({
+            'course': data['course'],
+            'block': data.get('block') or data.get('blocks'),
+            'task_id': data.get('task_id'),
+        })
+        logger.info('EolReportAnalytics - Report metrics {}'.format(json.dumps(metrics, sort_keys=True)))
+        self.instrumentation.send_statsd(get_statsd_host(), get_statsd_port(), get_statsd_prefix())
+
+    def write_problem(self, csvwriter, n_total_students, problem, rows, block_key=None):
+        if problem.aux_headers is not None:
+            csvwriter.writerow(_get_utf8_encoded_rows(self.get_header_row(problem.aux_headers)))
+        csvwriter.writerows(rows)
+        self.check_quartiles(block_key, problem.analytics)
+        self.write_analytics(csvwriter, n_total_students, problem.analytics, problem.aux_headers, problem.question_data)
+        if block_key is not None:
+            self.problem_results[str(block_key)] = self.get_problem_json(block_key, n_total_students, problem)
+
+    def check_quartiles(self, block_key, analytics):
+        """
+            Log when more students answered than the quartiles were sized for,
+            the discrimination is then computed over smaller quartiles
+        """
+        if analytics.quartiles.is_truncated(analytics.users):
+            logger.warning('EolReportAnalytics - Quartiles of {} hold {} students, {} answered'.format(
+                block_key, analytics.get_quartile_size(), analytics.users))
+
+    def get_problem_json(self, block_key, n_total_students, problem):
+        """
+            Analytics of a problem and of each of its questions, the same values
+            the analytics section of the csv shows
+        """
+        analytics = problem.analytics
+        result = {
+            'block_id': str(block_key),
+            'enrolled': n_total_students,
+            'answered': analytics.users,
+            'mean': analytics.mean() if analytics.users else None,
+            'pstdev': analytics.pstdev() if analytics.users else None,
+            'alpha': None,
+            'questions': [],
+        }
+        if analytics.users == 0:
+            return result
+        result['alpha'], statistics = analytics.psychometrics.get_statistics()
+        best, worst = analytics.get_discriminatory_index()
+        quartile = analytics.get_quartile_size()
+        for x, answer_id in enumerate(problem.aux_headers or []):
+            question = problem.question_data.get(answer_id, {})
+            psychometrics = statistics.get(answer_id, {})
+            result['questions'].append({
+                'position': x + 1,
+                'answer_id': answer_id,
+                'question': question.get('question', ''),
+                'correct_answer': question.get('correct', ''),
+                'difficulty': analytics.correct.get(answer_id, 0) / analytics.users,
+                'incorrect': analytics.incorrect.get(answer_id, 0) / analytics.users,
+                'discrimination': (best.get(answer_id, 0) - worst.get(answer_id, 0)) / quartile if quartile else None,
+                'point_biserial': psychometrics.get('point_biserial'),
+                'alpha_if_deleted': psychometrics.get('alpha_if_deleted'),
+            })
+        return result
+
+    def get_results_json(self):
+        """
+            Analytics of the problems written by this view, None if there is none
+        """
+        if not self.problem_results:
+            return None
+        return {'problems': list(self.problem_results.values())}
+
+    def get_aggregate_analytics(self, block_key):
+        """
+            (analytics, aux_headers) of the persisted problem aggregate, without
+            discrimination quartiles nor psychometrics, read from its single row.
+            The state and enrollment changes of the students update it, so it
+            counts the same students as the report. None when the aggregates are
+            disabled, the problem was not backfilled with the current enrollment
+            modes or the report does not grade with the correct_map as the
+            aggregates do.
+        """
+        if not get_aggregates_enabled() or get_grading_mode() != GRADING_CORRECT_MAP:
+            return None
+        aggregate = ProblemAggregate.objects.filter(block_id=block_key).first()
+        if aggregate is None or aggregate.enrollment_modes != sorted(get_enrollment_modes()):
+            return None
+        return aggregate.to_analytics(), aggregate.headers or None
+
+    def fan_out_report(self, data, course_id, report_name, mode):
+        """
+            Split the report in parts by problem or by student id range, each part
+            is a celery task and the chord callback writes the csv. When a part or
+            the callback fails the error callback finishes the task as failed.
+        """
+        course_key = CourseKey.from_string(data['course'])
+        block_key = UsageKey.from_string(data['block'])
+        if block_key.block_type == PROBLEM_BLOCK_TYPE:
+            usage_keys = [block_key]
+        else:
+            store = modulestore()
+            with store.bulk_operations(course_key):
+                usage_keys = [x.location for x in self.get_problem_blocks(store.get_item(block_key, depth=None))]
+        # Parts size their quartiles with the whole problem count and read only the
+        # states counted, so merging them is exact
+        counts, last_id = self.count_course_states(course_key, usage_keys)
+        counts = {str(x): y for x, y in counts.items()}
+        parts = get_fanout_parts()
+        if mode == FANOUT_BLOCK:
+            units = [(usage_keys[i::parts], {}) for i in range(min(parts, len(usage_keys)))] or [([], {})]
+        else:
+            units = [(usage_keys, x) for x in StudentDirectory(data['course']).get_id_ranges(parts)]
+        job_path = '{}/{}'.format(PARTS_DIR, uuid4().hex)
+        header = group(
+            build_report_part.s(data, [str(x) for x in keys], counts, '{}/{}'.format(job_path, i), dict(filters, id__lte=last_id))
+            for i, (keys, filters) in enumerate(units)
+        )
+        callback = reduce_report_parts.s(data, str(course_id), report_name).on_error(fail_report_parts.s(data.get('task_id')))
+        return chord(header)(callback)
+
+    def build_report_part(self, data, usage_keys, counts, part_path, filters):
+        """
+            Grade a part of the report, the rows of each problem are saved sorted
+            in the report storage and the analytics are returned as partials
+        """
+        course_key = CourseKey.from_string(data['course'])
+        students = StudentDirectory(data['course'])
+        storage = ReportStore.from_config('GRADES_DOWNLOAD').storage
+        usage_keys = [UsageKey.from_string(x) for x in usage_keys]
+        parts = {}
+        store = modulestore()
+        with store.bulk_operations(course_key):
+            for usage_key, chunks in groupby(self.get_course_states(course_key, usage_keys, **filters), key=itemgetter(0)):
+                rows = SortedRows()
+                problem = self.collect_problem(
+                    students,
+                    usage_key,
+                    store.get_item(usage_key),
+                    (student_states for _, student_states in chunks),
+                    rows,
+                    int(counts.get(str(usage_key), 0) / 4))
+                path = self.save_rows(storage, '{}/{}.jsonl'.format(part_path, usage_key.block_id), rows)
+                problem.rows = [[path, problem.aux_headers]]
+                parts[str(usage_key)] = problem.to_dict()
+        return parts
+
+    def save_rows(self, storage, path, rows):
+        with SpooledTemporaryFile(max_size=get_spool_max_size()) as output_buffer:
+            for row in rows:
+                output_buffer.write(json.dumps(row).encode('utf-8'))
+                output_buffer.write(b'\n')
+            output_buffer.seek(0)
+            return storage.save(path, File(output_buffer))
+
+    def read_rows(self, storage, path, part_headers, aux_headers):
+        """
+            Read the rows of a part, the answers are moved to the report columns
+            when the part found the questions in other order
+        """
+        columns = None
+        if part_headers != aux_headers:
+            columns = [part_headers.index(x) + 4 if x in part_headers else None for x in aux_headers]
+        with storage.open(path) as rows_file:
+            for line in rows_file:
+                row = json.loads(line)
+                if columns is not None:
+                    answers = [row[x] if x is not None else '' for x in columns]
+                    row = row[:4] + answers + row[4 + len(part_headers):]
+                yield row
+
+    def merge_rows(self, storage, problem):
+        return merge(
+            *[self.read_rows(storage, path, part_headers, problem.aux_headers) for path, part_headers in problem.rows],
+            key=itemgetter(0))
+
+    def _build_report_from_parts(self, data, students, block, parts, csvwriter):
+        """
+            Merge the partial results of every part and write the same csv the
+            single worker report writes, the part files are deleted afterwards
+        """
+        storage = ReportStore.from_config('GRADES_DOWNLOAD').storage
+        problems = {}
+        for part in parts:
+            for usage_key, value in part.items():
+                problem = ProblemPartial.from_dict(value)
+                if usage_key in problems:
+                    problems[usage_key].merge(problem)
+                else:
+                    problems[usage_key] = problem
+        block_key = UsageKey.from_string(block)
+        if block_key.block_type == PROBLEM_BLOCK_TYPE:
+            problem = problems.get(str(block_key)) or ProblemPartial(ProblemAnalytics(0))
+            self.write_problem(csvwriter, students.count(), problem, self.merge_rows(storage, problem), block_key)
+        else:
+            course_key = CourseKey.from_string(data['course'])
+            store = modulestore()
+            with store.bulk_operations(course_key):
+                problem_blocks = self.get_problem_blocks(store.get_item(block_key, depth=None))
+            results = {}
+            # Sections in course order, the problems without states have none
+            for position, block_item in enumerate(problem_blocks):
+                usage_key = str(block_item.location)
+                if usage_key not in problems:
+                    continue
+                problem = problems[usage_key]
+                self.write_problem_title(csvwriter, position, block_item, bool(results))
+                self.write_problem(
+                    csvwriter,
+                    students.count(),
+                    problem,
+                    self.merge_rows(storage, problem),
+                    usage_key)
+                results[usage_key] = (problem.analytics, problem.aux_headers)
+            self.write_course_summary(csvwriter, students.count(), problem_blocks, results)
+        for problem in problems.values():
+            for path, _ in problem.rows:
+                storage.delete(path)
+        return csvwriter
+
+    def write_course_summary(self, csvwriter, n_total_students, problems, results):
+        """
+            Write one row per problem, in course order, with its main analytics
+        """
+        csvwriter.writerow([])
+        csvwriter.writerow([])
+        csvwriter.writerow(['Resumen'])
+        csvwriter.writerow([])
+        csvwriter.writerow(['Problema', 'Nombre', 'Bloque', 'Preguntas', 'Cuantos contestaron', '% contestaron', 'Promedio', 'Desviacion estandar'])
+        for i, problem in enumerate(problems):
+            analytics, aux_headers = results.get(str(problem.location), (None, None))
+            row = [
+                'Problema {}'.format(i + 1),
+                problem.display_name,
+                str(problem.location),
+                len(aux_headers) if aux_headers else 0,
+            ]
+            if analytics is None or analytics.users == 0:
+                row.extend([0, 0, '', ''])
+            else:
+                row.extend([
+                    analytics.users,
+                    str(safe_div(analytics.users, n_total_students)).replace(".", ","),
+                    str(analytics.mean()).replace(".", ","),
+                    str(analytics.pstdev()).replace(".", ",")
+                ])
+            csvwriter.writerow(_get_utf8_encoded_rows(row))
+
+    def extract_chunks(self, block_key, block_item, state_chunks):
+        """
+            Extract stage, yield each chunk of states with its human-readable answers
+        """
+        with self.get_extraction_pool(block_key, block_item):
+            for student_states in state_chunks:
+                with self.timed_stage('extract'):
+                    generated_report_data = self.get_report_xblock(block_key, student_states, block_item)
+                if generated_report_data is None:
+                    return
+                yield student_states, generated_report_data
+
+    @contextmanager
+    def get_extraction_pool(self, block_key, block_item):
+        """
+            Set the process pool extracting the answers of the problem while the
+            chunks are extracted, only for problems the AnswerExtractor knows.
+            Each process receives the parsed problem once, when it starts.
+            Daemonic processes, e.g. the prefork celery workers, cannot start
+            processes and extract the answers themselves.
+        """
+        workers = get_extraction_workers()
+        if workers and multiprocessing.current_process().daemon:
+            logger.debug('EolReportAnalytics - Daemonic worker, extracting the answers of {} serially'.format(block_key))
+            workers = 0
+        extractor = None
+        if workers and block_key.block_type == PROBLEM_BLOCK_TYPE:
+            extractor = self.get_answer_extractor(block_item)
+        if extractor is None:
+            yield
+            return
+        self.extraction_pool = ProcessPoolExecutor(workers, initializer=init_extraction_worker, initargs=(extractor.entries,))
+        self.extraction_workers = workers
+        try:
+            yield
+        finally:
+            if self.extraction_pool is not None:
+                self.extraction_pool.shutdown()
+            self.extraction_pool = None
+
+    def extract_parallel(self, responses):
+        """
+            extract_answers of the responses split in batches run by the extraction
+            pool, the results keep the order of the responses. None when the pool
+            breaks, e.g. a process is killed, then the serial path is used.
+            The chunk is split in EXTRACTION_BATCHES_PER_WORKER batches per process,
+            of at least the extraction batch size states.
+        """
+        batches_count = self.extraction_workers * EXTRACTION_BATCHES_PER_WORKER
+        batch_size = max(get_extraction_batch_size(), -(-len(responses) // batches_count))
+        batches = [[x.student_answers for x in responses[i:i + batch_size]] for i in range(0, len(responses), batch_size)]
+        try:
+            return list(chain.from_iterable(self.extraction_pool.map(extract_batch, batches)))
+        except (BrokenProcessPool, OSError):
+            logger.exception('EolReportAnalytics - Extraction pool failed, extracting the answers serially')
+            self.extraction_pool.shutdown()
+            self.extraction_pool = None
+            return None
+
+    def grade_chunk(self, student_states, students, generated_report_data, aux_headers):
+        """
+            Grade stage, yield the csv row and analytics of each enrolled student that answered
+        """
+        for response in student_states:
+            if response.username not in students:
+                continue
+            # A block that has a single state per user can contain multiple responses
+            # within the same state.
+            user_states = generated_report_data.get(response.username)
+            if user_states:
+                responses, aux_analytics = self.set_data(
+                        response,
+                        students,
+                        user_states,
+                        aux_headers
+                        )
+                if responses:
+                    yield responses, aux_analytics
+
+    def get_header_row(self, aux_headers):
+        header = ['Username', 'Email', 'Documento_id', 'Intentos']
+        for i in range(len(aux_headers)):
+            header.append('Pregunta {}'.format(i + 1))
+        header.append('Ptos Obtenidos')
+        header.append('Tolal de la Pregunta')
+        header.append('Nota')
+        return header
+
+    def write_analytics(self, csvwriter, n_total_students, analytics, aux_headers, questions):
+        """
+            Write the analytics section at the end of the report, every value
+            comes from the same analytics
+        """
+        summary = analytics
+        n_students_answered = summary.users
         n_students_not_answered = n_total_students - n_students_answered
         pct_answered = safe_div(n_students_answered, n_total_students)
         pct_not_answered = safe_div(n_students_not_answered, n_total_students)
@@ -323,35 +1806,33 @@ class EolReportAnalyticsView(View):
         csvwriter.writerow(['Cuantos contestaron', n_students_answered, str(pct_answered).replace(".", ",")])
         csvwriter.writerow(['Cuantos no contestaron', n_students_not_answered, str(pct_not_answered).replace(".", ",")])
         # If there are no responses from students (honor users) in the problem xblock, return
-        # before doing further analytics.
-        if analytics['users'] == 0:
-            return csvwriter
-        if analytics['score']:
-            csvwriter.writerow(['Promedio', str(mean(analytics['score'])).replace(".",",")])
-            csvwriter.writerow(['Desviacion estandar', str(pstdev(analytics['score'])).replace(".",",")])
-        else:
-            csvwriter.writerow(['Promedio', 0])
-            csvwriter.writerow(['Desviacion estandar', ''])
+        # before doing further summary.
+        if summary.users == 0:
+            return
+        csvwriter.writerow(['Promedio', str(summary.mean()).replace(".",",")])
+        csvwriter.writerow(['Desviacion estandar', str(summary.pstdev()).replace(".",",")])
         mcq = [[],0]
         lcq = [[],0]
-        for x in analytics['correct']:
-            if mcq[1] > analytics['correct'][x]:
+        # Questions are visited in the report order, so ties are listed the same
+        # way whatever the order the students were processed
+        question_order = {x: i for i, x in enumerate(aux_headers)}
+        for x in sorted(summary.correct, key=lambda x: question_order.get(x, len(question_order))):
+            if mcq[1] > summary.correct[x]:
                 continue
-            if mcq[1] < analytics['correct'][x]:
+            if mcq[1] < summary.correct[x]:
                 mcq[0] = [x]
-                mcq[1] = analytics['correct'][x]
+                mcq[1] = summary.correct[x]
             else:
                 mcq[0].append(x)
-        for x in analytics['incorrect']:
-            if lcq[1] > analytics['incorrect'][x]:
+        for x in sorted(summary.incorrect, key=lambda x: question_order.get(x, len(question_order))):
+            if lcq[1] > summary.incorrect[x]:
                 continue
-            if lcq[1] < analytics['incorrect'][x]:
+            if lcq[1] < summary.incorrect[x]:
                 lcq[0] = [x]
-                lcq[1] = analytics['incorrect'][x]
+                lcq[1] = summary.incorrect[x]
             else:
                 lcq[0].append(x)
 
-        questions = self.get_questions(generated_report_data)
         if questions:
             csvwriter.writerow([])
             csvwriter.writerow(['', 'Pregunta(s)', 'Correctas', '% de Correctas', 'Incorrectas', '% de Incorrectas'])
@@ -360,34 +1841,35 @@ class EolReportAnalyticsView(View):
                 aux[1] = aux[1] + 'P{} - '.format(aux_headers.index(idq) + 1)
             aux[1] = aux[1][:-3]
             aux[2] = mcq[1]
-            aux[3] = str(mcq[1] / analytics['users']).replace(".",",")
+            aux[3] = str(mcq[1] / summary.users).replace(".",",")
             if len(mcq[0]) > 0:
-                aux[4] = analytics['incorrect'][mcq[0][0]] if mcq[0][0] in analytics['incorrect'] else '0'
-                aux[5] = str(analytics['incorrect'][mcq[0][0]] / analytics['users']).replace(".",",") if mcq[0][0] in analytics['incorrect'] else '0'
+                aux[4] = summary.incorrect[mcq[0][0]] if mcq[0][0] in summary.incorrect else '0'
+                aux[5] = str(summary.incorrect[mcq[0][0]] / summary.users).replace(".",",") if mcq[0][0] in summary.incorrect else '0'
             csvwriter.writerow(aux)
             aux = ['Pregunta con menos correctas', '', 0, 0, 0, 0]
             for idq in lcq[0]:
                 aux[1] = aux[1] + 'P{} - '.format(aux_headers.index(idq) + 1)
             aux[1] = aux[1][:-3]
             aux[4] = lcq[1]
-            aux[5] = str(lcq[1] / analytics['users']).replace(".",",")
+            aux[5] = str(lcq[1] / summary.users).replace(".",",")
             if len(lcq[0]) > 0:
-                aux[2] = analytics['correct'][lcq[0][0]] if lcq[0][0] in analytics['correct'] else '0'
-                aux[3] = str(analytics['correct'][lcq[0][0]] / analytics['users']).replace(".",",") if lcq[0][0] in analytics['correct'] else '0'
+                aux[2] = summary.correct[lcq[0][0]] if lcq[0][0] in summary.correct else '0'
+                aux[3] = str(summary.correct[lcq[0][0]] / summary.users).replace(".",",") if lcq[0][0] in summary.correct else '0'
             csvwriter.writerow(aux)
             csvwriter.writerow([])
             csvwriter.writerow([])
             csvwriter.writerow(_get_utf8_encoded_rows(['Preguntas', '', 'Respuesta','Indice de dificultad', '% de correctas', '% de incorrectas', 'Rango indice discriminatorio', 'Indice discriminatorio']))
-            
-            best, worst = self.get_discriminatory_index(best_quartile, best_quartile_list, worst_quartile, worst_quartile_list, quartile, analytics['users'])
+
+            best, worst = analytics.get_discriminatory_index()
+            quartile = analytics.get_quartile_size()
             for x in range(len(aux_headers)):
                 row = [
-                    'Pregunta {}'.format(x + 1), 
+                    'Pregunta {}'.format(x + 1),
                     questions[aux_headers[x]]['question'],
                     questions[aux_headers[x]]['correct']
                 ]
-                if aux_headers[x] in analytics['correct']:
-                    aux = analytics['correct'][aux_headers[x]] / analytics['users']
+                if aux_headers[x] in analytics.correct:
+                    aux = analytics.correct[aux_headers[x]] / analytics.users
                     if aux >= 0.8 and aux <= 1:
                         row.append("Muy fácil")
                     elif aux >= 0.65 and aux < 0.8:
@@ -406,12 +1888,12 @@ class EolReportAnalyticsView(View):
                 else:
                     row.append("Muy dificil")
                     row.append(0)
-                if aux_headers[x] in analytics['incorrect']:
-                    row.append(str(analytics['incorrect'][aux_headers[x]] / analytics['users']).replace(".",","))
+                if aux_headers[x] in analytics.incorrect:
+                    row.append(str(analytics.incorrect[aux_headers[x]] / analytics.users).replace(".",","))
                 else:
                     row.append(0)
-                if int(analytics['users']/4) != 0:
-                    aux = (best.get(aux_headers[x], 0) - worst.get(aux_headers[x], 0)) / int(analytics['users']/4)
+                if quartile != 0:
+                    aux = (best.get(aux_headers[x], 0) - worst.get(aux_headers[x], 0)) / quartile
                     if aux >= 0.4 and aux < 1:
                         row.append("Excelente discriminación")
                     elif aux > 0 and aux < 0.4:
@@ -424,64 +1906,80 @@ class EolReportAnalyticsView(View):
                         row.append("")
                     row.append(str(aux).replace(".",","))
                 csvwriter.writerow(_get_utf8_encoded_rows(row))
-        return csvwriter
+            # The analytics of an aggregate have no per student data
+            if analytics.psychometrics.items:
+                self.write_psychometrics(csvwriter, analytics, aux_headers)
+            self.write_distractors(csvwriter, analytics, aux_headers, questions)
 
-    def get_discriminatory_index(self, best_quartile, best_quartile_list, worst_quartile, worst_quartile_list, quartile, answered):
-        discriminatory_index = {}
-        if quartile != int(answered / 4):
-            q = int(answered / 4)
-            aux = quartile - q
-            for x in range(aux):
-                if len(best_quartile[best_quartile_list[x]]) > 1:
-                    best_quartile[best_quartile_list[x]].pop()
-                else:
-                    best_quartile.pop(best_quartile_list[x])
-                y = x + q
-                if len(worst_quartile[worst_quartile_list[y]]) > 1:
-                    worst_quartile[worst_quartile_list[y]].pop()
-                else:
-                    worst_quartile.pop(worst_quartile_list[y])
+    def write_psychometrics(self, csvwriter, analytics, aux_headers):
+        """
+            Write the reliability of the problem and the point-biserial
+            correlation and alpha if deleted of each question
+        """
+        def format_value(value):
+            return str(value).replace(".", ",") if value is not None else ''
 
-        best = Counter(x for xs in best_quartile.values() for xq in xs for x in xq)
-        worst = Counter(x for xs in worst_quartile.values() for xq in xs for x in xq)
-        return best, worst
+        alpha, statistics = analytics.psychometrics.get_statistics()
+        csvwriter.writerow([])
+        csvwriter.writerow([])
+        csvwriter.writerow(['Psicometria'])
+        csvwriter.writerow([])
+        csvwriter.writerow(['Alfa de Cronbach (KR-20)', format_value(alpha)])
+        csvwriter.writerow([])
+        csvwriter.writerow(['Preguntas', 'Indice de dificultad', 'Correlacion punto biserial', 'Alfa si se elimina'])
+        for x in range(len(aux_headers)):
+            question = statistics.get(aux_headers[x], {})
+            csvwriter.writerow([
+                'Pregunta {}'.format(x + 1),
+                format_value(question.get('difficulty')),
+                format_value(question.get('point_biserial')),
+                format_value(question.get('alpha_if_deleted')),
+            ])
 
-    def order_best_quartile(self, best_quartile, best_quartile_list, quartile, aux_analytics):
-        if len(best_quartile_list) < quartile:
-            best_quartile_list.append(aux_analytics['score'])
-            best_quartile[aux_analytics['score']].append(aux_analytics['correct'])
-        else:
-            if quartile != 0 and best_quartile_list[0] < aux_analytics['score']:
-                if len(best_quartile[best_quartile_list[0]]) > 1:
-                    best_quartile[best_quartile_list[0]].pop()
-                else:
-                    best_quartile.pop(best_quartile_list[0])
-                best_quartile_list[0] = aux_analytics['score']
-                best_quartile[aux_analytics['score']].append(aux_analytics['correct'])
-        best_quartile_list.sort()
-        return best_quartile, best_quartile_list
-
-    def order_worst_quartile(self, worst_quartile, worst_quartile_list, quartile, aux_analytics):
-        if len(worst_quartile_list) < quartile:
-            worst_quartile_list.append(aux_analytics['score'])
-            worst_quartile[aux_analytics['score']].append(aux_analytics['correct'])
-        else:
-            if quartile != 0 and worst_quartile_list[-1] > aux_analytics['score']:
-                if len(worst_quartile[worst_quartile_list[-1]]) > 1:
-                    worst_quartile[worst_quartile_list[-1]].pop()
+    def write_distractors(self, csvwriter, analytics, aux_headers, questions):
+        """
+            Write how many students chose each answer of every question, in total
+            and in the best and worst quartile. Free text questions are skipped,
+            and the section when the answers were not read.
+        """
+        options, best, worst = analytics.get_distractors()
+        if not options:
+            return
+        csvwriter.writerow([])
+        csvwriter.writerow([])
+        csvwriter.writerow(['Analisis de distractores'])
+        csvwriter.writerow([])
+        csvwriter.writerow(_get_utf8_encoded_rows(['Preguntas', 'Respuesta', 'Correcta', 'Estudiantes', '% de estudiantes', 'Cuartil superior', 'Cuartil inferior']))
+        for x in range(len(aux_headers)):
+            answer_id = aux_headers[x]
+            if answer_id not in options:
+                continue
+            correct_answer = questions.get(answer_id, {}).get('correct')
+            # Choices are correct by name, other answers when their text is the correct answer
+            correct_choices = questions.get(answer_id, {}).get('correct_choices')
+            texts = analytics.option_texts.get(answer_id, {})
+            counts = [(analytics.get_option_text(answer_id, answer), answer, count) for answer, count in options[answer_id].items()]
+            # Most chosen answers first, ties by answer text so the order does not depend on the students order
+            for text, answer, count in sorted(counts, key=lambda item: (-item[2], item[0], item[1])):
+                if answer in texts and correct_choices is not None:
+                    correct = answer in correct_choices
                 else:
-                    worst_quartile.pop(worst_quartile_list[-1])
-                worst_quartile_list[-1] = aux_analytics['score']
-                worst_quartile[aux_analytics['score']].append(aux_analytics['correct'])
-        worst_quartile_list.sort()
-        return worst_quartile, worst_quartile_list
+                    correct = text == correct_answer
+                csvwriter.writerow(_get_utf8_encoded_rows([
+                    'Pregunta {}'.format(x + 1),
+                    text,
+                    'Si' if correct else 'No',
+                    count,
+                    str(count / analytics.users).replace(".", ","),
+                    best.get((answer_id, answer), 0),
+                    worst.get((answer_id, answer), 0),
+                ]))
 
     def get_headers(self, student_states):
         for response in student_states:
-            raw_state = json.loads(response['state'])
-            if 'attempts' not in raw_state:
+            if not response.has_attempts:
                 continue
-            return list(raw_state['input_state'].keys())
+            return response.input_keys
         return None
     
     def get_questions(self, generated_report_data):
@@ -494,6 +1992,8 @@ class EolReportAnalyticsView(View):
                     questions[user_state["Answer ID"]] = {'question':user_state["Question"].replace(";",""), 'correct':user_state["Correct Answer"].replace(";","")}
                 else:
                     questions[user_state["Answer ID"]] = {'question':user_state["Question"].replace(";",""), 'correct':''}
+                if "Correct Choices" in user_state:
+                    questions[user_state["Answer ID"]]['correct_choices'] = user_state["Correct Choices"]
         return questions
 
     def set_data(self, response, students, user_states, questions_ids):
@@ -502,53 +2002,76 @@ class EolReportAnalyticsView(View):
             ['Username', 'Email', 'Documento_id', 'Intentos', 'preg1', 'preg2, ... 'pregN' , 'Nota']
         """
         aux_analytics = defaultdict(list)
-        raw_state = json.loads(response['state'])
-        if 'attempts' not in raw_state:
+        if not response.has_attempts:
             return [], aux_analytics
 
+        aux_response, aux_analytics = self.grade_answers(response, user_states)
         # For each response in the block, copy over the basic data like the
         # title, location, block_key and state, and add in the responses
-        pts_question = int(raw_state['score']['raw_possible']) / len(user_states)
         responses = [
-                response['username'], 
-                students[response['username']]['email'], 
-                students[response['username']]['indiv_id'],
-                raw_state['attempts']
+                response.username,
+                students[response.username]['email'],
+                students[response.username]['indiv_id'],
+                response.attempts
                 ]
+        for x in questions_ids:
+            responses.append(aux_response[x])
+        responses.append(response.score_earned)
+        responses.append(response.score_possible)
+        responses.append(str(aux_analytics['score']).replace(".",","))
+        return responses, aux_analytics
+
+    def grade_answers(self, response, user_states):
+        """
+            Return the answer text by answer id and the analytics of the student:
+            correct and incorrect answer ids, score and the answer by answer id,
+            the [[name, text], ...] of the chosen choices for choice answers
+        """
+        aux_analytics = defaultdict(list)
         aux_response = {}
+        answers = {}
+        graded = None
+        if get_grading_mode() == GRADING_CORRECT_MAP:
+            graded = self.grade_state(response, [user_state["Answer ID"] for user_state in user_states])
+        if graded is not None:
+            aux_analytics['correct'], aux_analytics['incorrect'] = graded
         for user_state in user_states:
+            aux_response[user_state["Answer ID"]] = user_state["Answer"].replace(";","")
+            if "Choices" in user_state:
+                answers[user_state["Answer ID"]] = [[name, text.replace(";","")] for name, text in user_state["Choices"]]
+            else:
+                answers[user_state["Answer ID"]] = aux_response[user_state["Answer ID"]]
+            if graded is not None:
+                continue
             correct_answer = ''
             if "Correct Answer" in user_state:
                 correct_answer = user_state["Correct Answer"].replace(";","")
-            aux_response[user_state["Answer ID"]] = user_state["Answer"].replace(";","")
             if user_state["Answer"].replace(";","") == correct_answer:
                 aux_analytics['correct'].append(user_state["Answer ID"])
             else:
                 aux_analytics['incorrect'].append(user_state["Answer ID"])
-        for x in questions_ids:
-            responses.append(aux_response[x])
-        responses.append(raw_state['score']['raw_earned'])
-        responses.append(raw_state['score']['raw_possible'])
-        aux_analytics['score'] = float(raw_state['score']['raw_earned'])/float(raw_state['score']['raw_possible'])
-        responses.append(str(float(raw_state['score']['raw_earned'])/float(raw_state['score']['raw_possible'])).replace(".",","))
-        return responses, aux_analytics
+        aux_analytics['score'] = float(response.score_earned)/float(response.score_possible)
+        aux_analytics['answers'] = answers
+        return aux_response, aux_analytics
+
+    def grade_state(self, response, answer_ids=None):
+        """
+            Split the answer ids in correct and incorrect using the correct_map
+            of the state, without rendering any text.
+            Return None if the correct_map does not grade every answer id.
+        """
+        return grade_correct_map(response, answer_ids)
 
     def get_all_enrolled_users(self, course_key):
         """
             Get all enrolled student 
         """
         students = OrderedDict()
-        enrolled_students = User.objects.filter(
-            courseenrollment__course_id=course_key,
-            courseenrollment__is_active=1,
-            courseenrollment__mode='honor'
-        ).order_by('username').values('id', 'username', 'email')
-        user_id_list = enrolled_students.values_list('id', flat=True)
-        user_indiv_id_list = get_user_id_with_indiv_id_list(user_id_list)
-        user_indiv_id_dict = {id: indiv_id for id, indiv_id in user_indiv_id_list}
+        directory = StudentDirectory(course_key)
+        enrolled_students = list(directory.get_enrolled_users().order_by('username').values('id', 'username', 'email'))
+        user_indiv_id_dict = directory.get_indiv_ids([user['id'] for user in enrolled_students])
         for user in enrolled_students:
-            indiv_id = user_indiv_id_dict.get(user['id'], '')
-            students[user['username']] = {'email': user['email'], 'indiv_id': indiv_id}
+            students[user['username']] = {'email': user['email'], 'indiv_id': user_indiv_id_dict[user['id']]}
         return students
 
     def get_report_xblock(self, block_key, user_states, block):
@@ -589,7 +2112,43 @@ class EolReportAnalyticsView(View):
         if block.category != 'problem':
             raise NotImplementedError()
 
-        capa_system = LoncapaSystem(
+        i18n = block.runtime.service(block, "i18n")
+        # Common response types are answered with plain lookups, capa is only
+        # used for the answers the lightweight extractor does not recognize
+        extractor = self.get_answer_extractor(block, i18n)
+        capa_system = None
+        templates = {}
+        seed_independent = self.is_seed_independent(block)
+        responses = [x for x in user_states if x.student_answers is not None]
+        extracted = None
+        if self.extraction_pool is not None and extractor is not None and len(responses) > get_extraction_batch_size():
+            extracted = self.extract_parallel(responses)
+        if extracted is None:
+            extracted = (extract_answers(extractor, x.student_answers) for x in responses)
+        for response, answers in zip(responses, extracted):
+            for answer_id, report in answers:
+                if report is None:
+                    # Question labels and correct answers only depend on the seed, so the
+                    # problem is parsed once per distinct seed and reused for every student.
+                    seed = 1 if seed_independent else response.seed
+                    if seed not in templates:
+                        if capa_system is None:
+                            capa_system = self.get_capa_system(block, i18n)
+                        templates[seed] = ProblemTemplate(block, capa_system, seed)
+                    report = get_answer_report(templates[seed], answer_id, response.student_answers[answer_id])
+                yield (response.username, report)
+
+    def get_answer_extractor(self, block, i18n=None):
+        """
+            Parsed question labels, correct answers and choices of the problem,
+            cached by usage key and content version
+        """
+        if i18n is None:
+            i18n = block.runtime.service(block, "i18n")
+        return get_answer_extractor(block, getattr(i18n, 'gettext', None), get_metadata_cache_timeout())
+
+    def get_capa_system(self, block, i18n):
+        return LoncapaSystem(
             ajax_url=None,
             # TODO set anonymous_student_id to the anonymous ID of the user which answered each problem
             # Anonymous ID is required for Matlab, CodeResponse, and some custom problems that include
@@ -601,7 +2160,7 @@ class EolReportAnalyticsView(View):
             get_python_lib_zip=None,
             DEBUG=None,
             filestore=block.runtime.resources_fs,
-            i18n=block.runtime.service(block, "i18n"),
+            i18n=i18n,
             node_path=None,
             render_template=None,
             seed=1,
@@ -610,47 +2169,139 @@ class EolReportAnalyticsView(View):
             matlab_api_key=None,
         )
 
-        for response in user_states:
-            user_state = json.loads(response['state'])
-            if 'student_answers' not in user_state:
-                continue
+    def is_seed_independent(self, block):
+        """
+            Return True when the problem renders the same for every seed,
+            so a single parsed problem can be shared by all students
+        """
+        if getattr(block, 'rerandomize', None) not in (None, 'never', 'false'):
+            return False
+        problem_text = block.data or ''
+        return not any(marker in problem_text for marker in SEED_DEPENDENT_MARKERS)
 
-            lcp = LoncapaProblem(
-                problem_text=block.data,
-                id=block.location.html_id(),
-                capa_system=capa_system,
-                # We choose to run without a fully initialized CapaModule
-                capa_module=None,
-                state={
-                    'done': user_state.get('done'),
-                    'correct_map': user_state.get('correct_map'),
-                    'student_answers': user_state.get('student_answers'),
-                    'has_saved_answers': user_state.get('has_saved_answers'),
-                    'input_state': user_state.get('input_state'),
-                    'seed': user_state.get('seed'),
-                },
-                seed=user_state.get('seed'),
-                # extract_tree=False allows us to work without a fully initialized CapaModule
-                # We'll still be able to find particular data in the XML when we need it
-                extract_tree=False,
-            )
 
-            for answer_id, orig_answers in lcp.student_answers.items():
-                # Some types of problems have data in lcp.student_answers that isn't in lcp.problem_data.
-                # E.g. formulae do this to store the MathML version of the answer.
-                # We exclude these rows from the report because we only need the text-only answer.
-                if answer_id.endswith('_dynamath'):
-                    continue
+class EolReportAnalyticsBatchView(EolReportAnalyticsView):
+    """
+        Return a csv with the report of several blocks of a course, built by a single task
+    """
+    def get(self, request, **kwargs):
+        if request.user.is_anonymous:
+            logger.error("EolReportAnalytics - User is Anonymous")
+            raise Http404()
+        data = self.validate_and_get_batch_data(request)
+        if data['course'] is None:
+            logger.error("EolReportAnalytics - Falta parametro course o parametro incorrecto, user: {}, course: {}, blocks: {}".format(request.user, request.GET.get('course', ''), request.GET.getlist('block')))
+            return JsonResponse({'error': 'Falta parametro course o parametro incorrecto'})
+        elif data['blocks'] is None:
+            logger.error("EolReportAnalytics - Falta parametro block o parametro incorrecto, user: {}, course: {}, blocks: {}".format(request.user, request.GET.get('course', ''), request.GET.getlist('block')))
+            return JsonResponse({'error': 'Falta parametro block o parametro incorrecto'})
+        elif data['blocks'] is False:
+            logger.error("EolReportAnalytics - El bloque no pertenece al curso, user: {}, course: {}, blocks: {}".format(request.user, request.GET.get('course', ''), request.GET.getlist('block')))
+            return JsonResponse({'error': 'El bloque no pertenece al curso'})
+        elif not self.have_permission(request.user, data['course']):
+            logger.error("EolReportAnalytics - Usuario no tiene rol para esta funcionalidad, user: {}, course: {}, blocks: {}".format(request.user, request.GET.get('course', ''), request.GET.getlist('block')))
+            return JsonResponse({'error': 'Usuario no tiene rol para esta funcionalidad'})
+        data['base_url'] = request.build_absolute_uri('')
+        return self.get_context(request, data)
+
+    def validate_and_get_batch_data(self, request):
+        """
+            Verify the course and every block id, repeated blocks are requested once
+        """
+        data = {'course': None, 'block': None, 'blocks': None}
+        if request.GET.get("course", "") != "" and self.validate_course(request.GET.get("course", "")):
+            data['course'] = request.GET.get("course", "")
+        blocks = list(OrderedDict.fromkeys(x for x in request.GET.getlist("block") if x != ""))
+        if not blocks or not all(self.validate_block(x) for x in blocks):
+            return data
+        data['blocks'] = blocks
+        if data['course'] and any(UsageKey.from_string(x).course_key != CourseKey.from_string(data['course']) for x in blocks):
+            data['blocks'] = False
+        return data
+
+
+class EolReportAnalyticsJsonView(EolReportAnalyticsView):
+    """
+        Return the per question analytics of the last report of a problem, or of
+        a course when no block is given, as json. The ETag is the fingerprint of
+        the report, so polling with If-None-Match costs a single indexed lookup.
+    """
+    def get(self, request, **kwargs):
+        if request.user.is_anonymous:
+            logger.error("EolReportAnalytics - User is Anonymous")
+            raise Http404()
+        course = request.GET.get('course', '')
+        if course == '' or not self.validate_course(course):
+            return JsonResponse({'error': 'Falta parametro course o parametro incorrecto'})
+        course_key = CourseKey.from_string(course)
+        try:
+            block_key = UsageKey.from_string(request.GET['block']) if request.GET.get('block', '') != '' else course_key.make_usage_key('course', 'course')
+        except InvalidKeyError:
+            return JsonResponse({'error': 'Falta parametro block o parametro incorrecto'})
+        if block_key.course_key != course_key:
+            return JsonResponse({'error': 'El bloque no pertenece al curso'})
+        if not self.have_permission(request.user, course):
+            logger.error("EolReportAnalytics - Usuario no tiene rol para esta funcionalidad, user: {}, course: {}, block: {}".format(request.user, course, str(block_key)))
+            return JsonResponse({'error': 'Usuario no tiene rol para esta funcionalidad'})
+        # The analytics are only read when the client does not have them already
+        indexed = ReportFingerprint.objects.filter(block_id=block_key, analytics__isnull=False).\
+            defer('analytics').order_by('-created').first()
+        if indexed is None:
+            return JsonResponse({'error': 'No hay analitica calculada para el bloque'})
+        etag = quote_etag(indexed.fingerprint)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = [x[2:] if x.startswith('W/') else x for x in parse_etags(if_none_match)]
+            if etag in etags or '*' in etags:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+        response = JsonResponse({
+            'block_id': str(block_key),
+            'report_name': indexed.report_name,
+            'created': indexed.created.isoformat(),
+            'problems': indexed.analytics['problems'],
+        })
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
-                question_text = lcp.find_question_label(answer_id)
-                answer_text = lcp.find_answer_text(answer_id, current_answer=orig_answers)
-                correct_answer_text = lcp.find_correct_answer_text(answer_id)
-
-                report = {
-                    "Answer ID": answer_id,
-                    "Question": question_text,
-                    "Answer": answer_text,
-                }
-                if correct_answer_text is not None:
-                    report["Correct Answer"] = correct_answer_text
-                yield (response['username'], report)
+
+class EolReportAnalyticsStatusView(EolReportAnalyticsView):
+    """
+        Return the state, current step, rows processed and report urls of a report
+        task from its progress record in the cache. A request with the version it
+        last read waits a few seconds for a change of the record, while the task
+        runs the response carries the seconds to wait before the next request.
+    """
+    def get(self, request, **kwargs):
+        if request.user.is_anonymous:
+            logger.error("EolReportAnalytics - User is Anonymous")
+            raise Http404()
+        task_id = request.GET.get('task_id', '')
+        if task_id == '':
+            return JsonResponse({'error': 'Falta parametro task_id'})
+        record = get_progress(task_id)
+        if record is None:
+            return JsonResponse({'error': 'Tarea no encontrada'})
+        # The requester is checked from the record, other users need a role in the course
+        if record.get('user_id') != request.user.id and not self.have_permission(request.user, record.get('course')):
+            return JsonResponse({'error': 'Usuario no tiene rol para esta funcionalidad'})
+        version = request.GET.get('version', '')
+        if version.isdigit() and int(version) == record.get('version') and record.get('state') not in FINAL_STATES:
+            record = wait_progress(task_id, record.get('version'), get_status_max_wait()) or record
+        retry_after = None if record.get('state') in FINAL_STATES else get_status_poll_interval()
+        response = JsonResponse({
+            'task_id': task_id,
+            'state': record.get('state'),
+            'step': record.get('step'),
+            'rows': record.get('rows', 0),
+            'report_name': record.get('report_name'),
+            'report_url': record.get('report_url'),
+            'summary_report_url': record.get('summary_report_url'),
+            'version': record.get('version'),
+            'retry_after': retry_after,
+        })
+        if retry_after is not None:
+            response['Retry-After'] = str(retry_after)
+        return response